@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Optional, Type
+
+from pydantic import BaseModel
+
+from ai_code_reviewer.review import FileDiffComments
+
+CACHE_ENTRY_SUFFIX = ".json"
+
+
+def hash_cache_key(**key_parts: Any) -> str:
+    serialized_key_parts = json.dumps(key_parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized_key_parts.encode("utf-8")).hexdigest()
+
+
+class ReviewCache(BaseModel):
+    cache_dir: Path
+    max_size_bytes: int = 100 * 1024 * 1024
+    max_age_seconds: float = 30 * 24 * 60 * 60
+    hits: int = 0
+    misses: int = 0
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{CACHE_ENTRY_SUFFIX}"
+
+    def _is_expired(self, modification_time: float) -> bool:
+        return time.time() - modification_time > self.max_age_seconds
+
+    def get(self, key: str, comments_class: Type[FileDiffComments] = FileDiffComments) -> Optional[FileDiffComments]:
+        entry_path = self._entry_path(key)
+        try:
+            if self._is_expired(entry_path.stat().st_mtime):
+                raise FileNotFoundError(entry_path)
+            comments = comments_class.model_validate_json(entry_path.read_text(encoding="utf-8"))
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return comments
+
+    def put(self, key: str, comments: FileDiffComments):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(key)
+        temporary_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+        temporary_path.write_text(comments.model_dump_json(), encoding="utf-8")
+        temporary_path.replace(entry_path)
+
+    def evict(self):
+        if not self.cache_dir.is_dir():
+            return
+        entries = []
+        for entry_path in self.cache_dir.glob(f"*{CACHE_ENTRY_SUFFIX}"):
+            try:
+                entry_stat = entry_path.stat()
+            except OSError:
+                continue
+            if self._is_expired(entry_stat.st_mtime):
+                entry_path.unlink(missing_ok=True)
+            else:
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+
+        total_size = 0
+        for _, entry_size, entry_path in sorted(entries, key=lambda entry: entry[0], reverse=True):
+            total_size += entry_size
+            if total_size > self.max_size_bytes:
+                entry_path.unlink(missing_ok=True)
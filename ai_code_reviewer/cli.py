@@ -2,19 +2,65 @@ import argparse
 import asyncio
 import logging
 import os
+import sys
 import time
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import List, Collection
+from typing import (
+    Any, Callable, List, Collection, Optional, Dict, Tuple, Iterator, AsyncIterator, Union, TextIO, TYPE_CHECKING
+)
 
 import colorlog
-from langchain_community.callbacks import get_openai_callback
-
-from ai_code_reviewer.containers import Container, AppConfig
-from ai_code_reviewer.review import FileDiffComment
-from ai_code_reviewer.run_review import FileDiffReview, get_reviews
-from ai_code_reviewer.utils import (
-    get_repo_diff, get_all_files,
-    suppress_irrelevant_comments, suppress_not_changed_lines_comments, suppress_noqa_line_comments
+
+from ai_code_reviewer.cache import ReviewCache, hash_cache_key
+from ai_code_reviewer.diff_windows import DiffChunker, DEFAULT_CHUNK_OVERLAP_LINES
+from ai_code_reviewer.estimate import (
+    ReviewCostEstimate, DEFAULT_EXPECTED_OUTPUT_TOKENS, estimate_review_tasks, select_files_to_drop, format_estimate
+)
+from ai_code_reviewer.line_index import DiffLineIndex
+from ai_code_reviewer.llms.backends import LLM_BACKENDS, DEFAULT_AZURE_API_VERSION
+from ai_code_reviewer.metrics import RunMetrics
+from ai_code_reviewer.output import OutputFormat, ReviewWriter, TextReviewWriter, build_review_writer
+from ai_code_reviewer.incremental import (
+    IncrementalState, read_blob_hashes, read_index_blob_hashes, split_reviewed_files, build_incremental_state
+)
+from ai_code_reviewer.repo_scan import (
+    iterate_repo_files, iterate_in_thread, DEFAULT_MAX_FILE_SIZE_BYTES, DEFAULT_SCAN_WORKERS
+)
+from ai_code_reviewer.principles import PrincipleValidationError, list_principle_paths, load_principles
+from ai_code_reviewer.prompts import (
+    PromptSource, ReviewMode, PRINCIPLE_CHECKING_HUB_PROMPT_NAME, REASONING_HUB_PROMPT_NAME
+)
+from ai_code_reviewer.reviewers.base import Reviewer, ReviewerBatcher
+from ai_code_reviewer.run_review import FileDiffReview, iterate_reviews, build_review_tasks
+from ai_code_reviewer.scheduler import ReviewScheduler, STRONG_ROUTE, FAST_ROUTE
+from ai_code_reviewer.server import get_default_socket_path, serve, request_review
+from ai_code_reviewer.sharding import (
+    Shard, select_shard_work, build_shard_result, ShardResult, get_missing_shards, merge_shard_results
+)
+from ai_code_reviewer.staged import (
+    STAGED_STATE_FILE_NAME, StagedReviewState, build_staged_review_state, get_staged_diff, get_staged_fingerprint
+)
+from ai_code_reviewer.symbol_index import build_project_context, update_symbol_index
+from ai_code_reviewer.tokens import count_tokens
+from ai_code_reviewer.utils import get_git_dir, get_repo_diff, suppress_comments, map_comments_to_file_lines
+
+if TYPE_CHECKING:
+    from ai_code_reviewer.containers import AppConfig, Container
+
+
+MERGE_COMMAND = "merge"
+PRINCIPLES_BUNDLE_FILE_NAME = "principles_bundle.json"
+SYMBOL_INDEX_FILE_NAME = "symbol_index.json"
+MAX_CACHED_CONTAINERS = 8
+CACHE_STATE_DIR_NAME = "state"
+REVIEW_SETTINGS_ARGUMENTS = (
+    "file_extensions_to_review", "context_lines", "openai_model_name", "llm_backend", "llm_base_url",
+    "fast_llm_backend", "fast_llm_model_name", "fast_llm_base_url", "max_fast_diff_tokens", "context_window_tokens",
+    "max_chunk_tokens", "chunk_overlap_lines", "principles_per_call", "review_mode", "verification_window_lines",
+    "prompt_source", "principle_checking_hub_prompt", "reasoning_hub_prompt", "project_context_tokens", "staged"
 )
 
 
@@ -27,27 +73,45 @@ def get_logger() -> logging.Logger:
     return logger
 
 
-def format_report(file_name: str, reviewer_name: str, review: FileDiffComment) -> str:
-    return f"""./{file_name}:{review.line_number + 1}: {reviewer_name} warning:
-what is violated: {review.citation_from_principle}
-how it is violated: {review.how_citation_violated}
-comment: {review.comment}
-suggested fix: {review.suggestion}
-suggestion implementation:
-```
-{review.implementation}
-```
-
-"""
-
-
-def report_reviews(
+def report_failed_reviews(
         reviews: List[FileDiffReview],
         logger: logging.Logger
 ):
-    for review in reviews:
-        for comment in review.comments:
-            logger.warning(format_report(review.file_name, review.author.name, comment))
+    failed_reviews = [review for review in reviews if review.error is not None]
+    if len(failed_reviews) == 0:
+        return
+    logger.error(f"{len(failed_reviews)} of {len(reviews)} reviews failed:")
+    for review in failed_reviews:
+        logger.error(f"./{review.file_name}: {review.author.name}: {review.error}")
+
+
+class ReviewReporter:
+    def __init__(
+            self,
+            per_file_diff: Dict[str, str],
+            args: argparse.Namespace,
+            review_writer: ReviewWriter,
+            is_diff: bool = True
+    ):
+        self.per_file_diff = per_file_diff
+        self.args = args
+        self.review_writer = review_writer
+        self.is_diff = is_diff
+        self.line_indexes: Dict[str, DiffLineIndex] = {}
+
+    def report(self, review: FileDiffReview) -> int:
+        if review.file_name not in self.line_indexes:
+            self.line_indexes[review.file_name] = DiffLineIndex.from_diff(
+                self.per_file_diff[review.file_name], self.is_diff)
+        line_index = self.line_indexes[review.file_name]
+        review = suppress_comments(
+            review, line_index,
+            allow_irrelevant=self.args.allow_irrelevant,
+            suppress_not_changed_lines=self.args.suppress_not_changed_lines,
+            suppress_noqa_lines=self.args.suppress_noqa_lines
+        )
+        self.review_writer.write(map_comments_to_file_lines(review, line_index))
+        return len(review.comments)
 
 
 def report_files_to_review(
@@ -59,74 +123,613 @@ def report_files_to_review(
         logger.info(file_path)
 
 
-def main():
-    logger = get_logger()
-    parser = argparse.ArgumentParser(description="Review code against programming principles.")
+def get_default_max_chunk_tokens(context_window_tokens: int) -> int:
+    return context_window_tokens // 2
+
+
+def get_missing_api_keys(args: argparse.Namespace) -> List[str]:
+    backends = [args.llm_backend] if args.fast_llm_backend is None else [args.llm_backend, args.fast_llm_backend]
+    api_key_env_vars = [LLM_BACKENDS[backend].api_key_env_var for backend in backends]
+    return [
+        api_key_env_var for api_key_env_var in dict.fromkeys(api_key_env_vars)
+        if api_key_env_var is not None and api_key_env_var not in os.environ
+    ]
+
+
+def get_route_concurrency(args: argparse.Namespace) -> Dict[str, int]:
+    route_concurrency = {STRONG_ROUTE: args.max_concurrent_strong_reviews, FAST_ROUTE: args.max_concurrent_fast_reviews}
+    return {route: concurrency for route, concurrency in route_concurrency.items() if concurrency is not None}
+
+
+def get_context_lines(args: argparse.Namespace) -> Optional[int]:
+    return None if args.include_not_changed_files else args.context_lines
+
+
+def fit_into_budget(
+        estimate: ReviewCostEstimate,
+        files_to_review: Dict[str, str],
+        max_cost: float,
+        logger: logging.Logger
+) -> Dict[str, str]:
+    if estimate.cost is None:
+        logger.warning(f"Price of {estimate.model_name} is unknown, --max_cost is not applied.")
+        return files_to_review
+    files_to_drop = select_files_to_drop(estimate, files_to_review, max_cost)
+    if len(files_to_drop) == 0:
+        return files_to_review
+    logger.warning(f"Estimated cost exceeds --max_cost {max_cost}$, {len(files_to_drop)} files will not be reviewed:")
+    for file_name in files_to_drop:
+        logger.warning(file_name)
+    logger.info(format_estimate(estimate.without_files(files_to_drop)))
+    dropped_files = set(files_to_drop)
+    return {file_name: file_diff for file_name, file_diff in files_to_review.items() if file_name not in dropped_files}
+
+
+async def iterate_scanned_files(
+        scanned_files: Iterator[Tuple[str, str]],
+        per_file_diff: Dict[str, str],
+        logger: logging.Logger
+) -> AsyncIterator[Tuple[str, str]]:
+    logger.info("Files will be reviewed as they are scanned:")
+    async for file_name, file_content in iterate_in_thread(scanned_files):
+        logger.info(file_name)
+        per_file_diff[file_name] = file_content
+        yield file_name, file_content
+    logger.info(f"{len(per_file_diff)} files scanned")
+
+
+async def stream_reviews(
+        files_to_review: Union[Dict[str, str], AsyncIterator[Tuple[str, str]]],
+        reviewers: List[Reviewer],
+        reviewer_batcher: Optional[ReviewerBatcher],
+        diff_chunker: Optional[DiffChunker],
+        scheduler: ReviewScheduler,
+        args: argparse.Namespace,
+        logger: logging.Logger,
+        per_file_diff: Dict[str, str],
+        reused_reviews: List[FileDiffReview],
+        metrics: Optional[RunMetrics] = None,
+        report_progress: bool = True,
+        review_writer: Optional[ReviewWriter] = None,
+        reviewer_filter: Optional[Callable[[str, Reviewer], bool]] = None,
+        context_builder: Optional[Callable[[str, str], str]] = None
+) -> Tuple[List[FileDiffReview], bool]:
+    metrics = metrics or RunMetrics()
+    is_diff = not args.include_not_changed_files
+    review_reporter = ReviewReporter(per_file_diff, args, review_writer or TextReviewWriter(logger), is_diff)
+    reviews = []
+    violations_count = 0
+
+    def report_review(review: FileDiffReview) -> bool:
+        nonlocal violations_count
+        reviews.append(review)
+        with metrics.stage("report"):
+            violations_count += review_reporter.report(review)
+        if args.fail_fast is not None and violations_count >= args.fail_fast:
+            logger.error(f"Found {violations_count} violations, stopping the review (--fail_fast).")
+            return False
+        return True
+
+    for reused_review in reused_reviews:
+        if not report_review(reused_review):
+            return reviews, False
+    review_stream = iterate_reviews(
+        files_to_review, reviewers, report_progress=report_progress, scheduler=scheduler,
+        context_lines=get_context_lines(args),
+        reviewer_batcher=reviewer_batcher,
+        metrics=metrics,
+        diff_chunker=diff_chunker,
+        reviewer_filter=reviewer_filter,
+        context_builder=context_builder,
+        is_diff=is_diff
+    )
+    try:
+        async for review in review_stream:
+            if not report_review(review):
+                return reviews, False
+    finally:
+        await review_stream.aclose()
+    return reviews, True
+
+
+@contextmanager
+def open_review_writer(
+        args: argparse.Namespace,
+        logger: logging.Logger,
+        output_stream: Optional[TextIO] = None
+) -> Iterator[ReviewWriter]:
+    output_file = open(args.output_file, "w", encoding="utf-8") if args.output_file is not None \
+        else nullcontext(output_stream or sys.stdout)
+    with output_file as stream:
+        review_writer = build_review_writer(OutputFormat(args.output_format), stream, logger)
+        try:
+            yield review_writer
+        finally:
+            review_writer.close()
+
+
+def get_cache_dir(repo_path: Path, custom_cache_dir: Optional[str]) -> Optional[Path]:
+    if custom_cache_dir is not None:
+        return Path(custom_cache_dir)
+    git_dir = get_git_dir(repo_path)
+    if git_dir is None:
+        return None
+    return git_dir / "ai_code_reviewer_cache"
+
+
+def get_state_file(repo_path: Path, custom_state_file: Optional[str]) -> Optional[Path]:
+    if custom_state_file is not None:
+        return Path(custom_state_file)
+    git_dir = get_git_dir(repo_path)
+    if git_dir is None:
+        return None
+    return git_dir / "ai_code_reviewer_state.json"
+
+
+def get_cache_state_file(cache_dir: Optional[Path], file_name: str) -> Optional[Path]:
+    if cache_dir is None:
+        return None
+    return cache_dir / CACHE_STATE_DIR_NAME / file_name
+
+
+def get_review_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    return {argument: getattr(args, argument) for argument in REVIEW_SETTINGS_ARGUMENTS}
+
+
+def format_cache_stats(review_cache: Optional[ReviewCache], initial_hits: int = 0, initial_misses: int = 0) -> str:
+    if review_cache is None:
+        return ""
+    return f" (cache hits: {review_cache.hits - initial_hits}, cache misses: {review_cache.misses - initial_misses})"
+
+
+def add_report_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--allow_irrelevant', action='store_true',
+                        help='Allow reporting problems not mentioned in principle files')
+    parser.add_argument('--suppress_not_changed_lines', action='store_true',
+                        help='Forbid reviewing not changed lines')
+    parser.add_argument('--suppress_noqa_lines', action='store_true',
+                        help='Forbid reviewing lines with noqa comment')
+    parser.add_argument("--output_format", type=str, choices=[output_format.value for output_format in OutputFormat],
+                        default=OutputFormat.TEXT.value,
+                        help="Report comments as colored text log (text), JSON lines (jsonl), SARIF document (sarif)"
+                             " or GitHub Actions annotations (github). Machine-readable formats are written to"
+                             " stdout or --output_file, logs stay in stderr.")
+    parser.add_argument("--output_file", type=str, required=False, default=None,
+                        help="Write comments in --output_format to this file instead of stdout.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Review code against programming principles.",
+        epilog=f"Run '{MERGE_COMMAND} --help' to see how to merge results of --shard runs."
+    )
     parser.add_argument("--repo_path", type=str, required=False, default=".",
                         help="Path to the repository to review.")
     parser.add_argument("--compare_with", type=str, required=False, default="HEAD",
                         help="Base version to compare with. May be git hash or tag of source branch")
+    parser.add_argument("--staged", action="store_true",
+                        help="Review only changes staged for commit (for pre-commit hooks). File contents are read from"
+                             " git index, not from working tree, and --compare_with is ignored.")
     parser.add_argument("--custom_principles_path", type=str, required=False, default=None,
                         help="If your programming principles stored not within repo/.coding_principles,"
                              " you can provide path to your principles here.")
     parser.add_argument("--openai_model_name", type=str, required=False, default="gpt-4-0125-preview",
                         help="Name of openai gpt model that will review you code.")
+    parser.add_argument("--llm_backend", type=str, choices=list(LLM_BACKENDS), default="openai",
+                        help="LLM backend to review with: openai, azure (--openai_model_name is the deployment name),"
+                             " local OpenAI-compatible endpoint such as llama.cpp or vLLM (needs --llm_base_url)."
+                             " 'fake' returns deterministic synthetic reviews without network calls, for testing and"
+                             " benchmarking.")
+    parser.add_argument("--llm_base_url", type=str, required=False, default=None,
+                        help="Endpoint of the LLM backend: url of local OpenAI-compatible server or azure endpoint.")
+    parser.add_argument("--azure_api_version", type=str, required=False, default=DEFAULT_AZURE_API_VERSION,
+                        help="API version of azure backend.")
+    parser.add_argument("--fast_llm_backend", type=str, choices=list(LLM_BACKENDS), required=False, default=None,
+                        help="Route small diffs and low priority principles to a fast and cheap model of this backend."
+                             " Large diffs and high priority principles are reviewed by --openai_model_name.")
+    parser.add_argument("--fast_llm_model_name", type=str, required=False, default="gpt-3.5-turbo-0125",
+                        help="Model name of the fast backend.")
+    parser.add_argument("--fast_llm_base_url", type=str, required=False, default=None,
+                        help="Endpoint of the fast backend.")
+    parser.add_argument("--max_fast_diff_tokens", type=int, required=False, default=2000,
+                        help="Diffs (or diff windows) up to this many tokens are routed to the fast backend.")
     parser.add_argument('--file_extensions_to_review', type=str, nargs='+', default=['.py'],
                         help='List of file extensions to review')
-    parser.add_argument('--allow_irrelevant', action='store_true',
-                        help='Allow reporting problems not mentioned in principle files')
-    parser.add_argument('--suppress_not_changed_lines', action='store_true',
-                        help='Forbid reviewing not changed lines')
-    parser.add_argument('--suppress_noqa_lines', action='store_true',
-                        help='Forbid reviewing lines with noqa comment')
+    add_report_arguments(parser)
     parser.add_argument('--include_not_changed_files', action='store_true',
                         help='Review all files, not only changed ones.')
-    args = parser.parse_args()
+    parser.add_argument("--max_file_size_bytes", type=int, required=False, default=DEFAULT_MAX_FILE_SIZE_BYTES,
+                        help="With --include_not_changed_files, skip files larger than this.")
+    parser.add_argument("--scan_workers", type=int, required=False, default=DEFAULT_SCAN_WORKERS,
+                        help="With --include_not_changed_files, number of threads reading repository files.")
+    parser.add_argument("--cache_dir", type=str, required=False, default=None,
+                        help="Where to store cached reviews. Default is .git/ai_code_reviewer_cache of the repo.")
+    parser.add_argument('--no_cache', action='store_true',
+                        help='Do not use cached reviews and do not store new ones.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Review only files changed since the previous incremental run,'
+                             ' re-report stored comments for the other files.')
+    parser.add_argument("--state_file", type=str, required=False, default=None,
+                        help="Where to store incremental review state. Default is .git/ai_code_reviewer_state.json.")
+    parser.add_argument("--context_lines", type=int, required=False, default=None,
+                        help="Review only changed hunks with this many lines of context around them,"
+                             " instead of whole changed files.")
+    parser.add_argument("--max_chunk_tokens", type=int, required=False, default=None,
+                        help="Files (or --context_lines windows) larger than this are reviewed in chunks split at"
+                             " top-level definitions. Default is half of --context_window_tokens.")
+    parser.add_argument("--chunk_overlap_lines", type=int, required=False, default=DEFAULT_CHUNK_OVERLAP_LINES,
+                        help="How many lines of context chunks include from their neighbours.")
+    parser.add_argument("--principles_per_call", type=int, required=False, default=1,
+                        help="Review file against up to this many principles in a single LLM call.")
+    parser.add_argument("--review_mode", type=str, choices=[mode.value for mode in ReviewMode],
+                        default=ReviewMode.SINGLE_PASS.value,
+                        help="two_stage first asks only for suspicious lines with short reasons and then verifies"
+                             " each of them in a separate call, saving output tokens on clean diffs.")
+    parser.add_argument("--verification_window_lines", type=int, required=False, default=10,
+                        help="Diff lines around suspicious line sent to verification call in two_stage mode.")
+    parser.add_argument("--project_context_tokens", type=int, required=False, default=0,
+                        help="Add to every review prompt up to this many tokens of related symbols from other python"
+                             " files of the repo: definitions of used names, callers of changed definitions and"
+                             " same-named definitions. 0 disables project context.")
+    parser.add_argument("--context_window_tokens", type=int, required=False, default=128000,
+                        help="Context window size of the review model. Principles batches are fitted into it.")
+    parser.add_argument("--fail_fast", type=int, required=False, default=None,
+                        help="Stop review and cancel pending LLM requests after this many violations reported.")
+    parser.add_argument("--prompt_source", type=str, choices=[source.value for source in PromptSource],
+                        default=PromptSource.LOCAL.value,
+                        help="Use review prompts bundled with the package (local) or pull them from langchain hub.")
+    parser.add_argument("--principle_checking_hub_prompt", type=str, required=False,
+                        default=PRINCIPLE_CHECKING_HUB_PROMPT_NAME,
+                        help="Hub name of principle checking prompt for --prompt_source hub."
+                             " Pin version as owner/name:commit to cache pulled prompt locally.")
+    parser.add_argument("--reasoning_hub_prompt", type=str, required=False, default=REASONING_HUB_PROMPT_NAME,
+                        help="Hub name of reasoning prompt for --prompt_source hub."
+                             " Pin version as owner/name:commit to cache pulled prompt locally.")
+    parser.add_argument("--max_concurrent_reviews", type=int, required=False, default=16,
+                        help="Maximum number of LLM requests in flight at the same time.")
+    parser.add_argument("--max_concurrent_strong_reviews", type=int, required=False, default=None,
+                        help="With --fast_llm_backend, maximum number of requests in flight to the strong model.")
+    parser.add_argument("--max_concurrent_fast_reviews", type=int, required=False, default=None,
+                        help="With --fast_llm_backend, maximum number of requests in flight to the fast model.")
+    parser.add_argument("--tokens_per_minute", type=int, required=False, default=None,
+                        help="Token budget per minute of your openai account. Reviews are delayed to stay within it.")
+    parser.add_argument("--metrics_out", type=str, required=False, default=None,
+                        help="Write per-call token, cost, latency and retries metrics to this file"
+                             " (.csv for a table of calls, JSON otherwise) and log the most expensive"
+                             " principles and files.")
+    parser.add_argument('--dry_run', action='store_true',
+                        help='Estimate number of LLM calls, tokens and cost of the review locally and exit.')
+    parser.add_argument("--max_cost", type=float, required=False, default=None,
+                        help="Review budget in $. If estimated cost exceeds it, files with fewest changed lines"
+                             " and largest prompts are not reviewed.")
+    parser.add_argument("--expected_output_tokens", type=int, required=False, default=DEFAULT_EXPECTED_OUTPUT_TOKENS,
+                        help="Expected number of output tokens per LLM call, used for cost estimation.")
+    parser.add_argument("--max_retries", type=int, required=False, default=5,
+                        help="How many times to retry review on rate limit or server errors.")
+    parser.add_argument("--shard", type=str, required=False, default=None,
+                        help="Review only i-th of N parts of the file-principle reviews, in i/N format (1 <= i <= N)."
+                             " Parts are balanced by estimated tokens and are the same in every shard run.")
+    parser.add_argument("--shard_out", type=str, required=False, default=None,
+                        help="With --shard, save not suppressed reviews of the shard to this JSON file for"
+                             f" '{MERGE_COMMAND}'.")
+    parser.add_argument('--serve', action='store_true',
+                        help='Run a local review server that keeps loaded principles, LLM clients and cache warm'
+                             ' between reviews.')
+    parser.add_argument('--use_server', action='store_true',
+                        help='Send this review to the local review server started with --serve.'
+                             ' Falls back to reviewing in this process if the server is not running.')
+    parser.add_argument("--socket_path", type=str, required=False, default=str(get_default_socket_path()),
+                        help="Unix socket of the local review server.")
+    return parser
+
+
+def build_merge_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog=f"ai_code_reviewer {MERGE_COMMAND}",
+        description="Merge JSON results of --shard runs into one report."
+    )
+    parser.add_argument("shard_results", type=str, nargs="+", help="--shard_out files of all shards.")
+    add_report_arguments(parser)
+    return parser
+
+
+def get_container(app_config: "AppConfig", containers: Dict[str, "Container"]) -> "Container":
+    from ai_code_reviewer.containers import Container
+
+    config_key = hash_cache_key(config=app_config.model_dump(mode="json"))
+    container_key = config_key + hash_cache_key(
+        principles_mtime=[os.stat(principle_path).st_mtime_ns for principle_path in app_config.principles_path]
+    )
+    if container_key in containers:
+        containers[container_key] = containers.pop(container_key)
+        return containers[container_key]
+    for stale_key in [key for key in containers if key.startswith(config_key)]:
+        del containers[stale_key]
+    while len(containers) >= MAX_CACHED_CONTAINERS:
+        del containers[next(iter(containers))]
+    containers[container_key] = Container.from_config(app_config)
+    return containers[container_key]
+
+
+async def run_review(
+        args: argparse.Namespace,
+        logger: logging.Logger,
+        containers: Dict[str, "Container"],
+        report_progress: bool = True,
+        output_stream: Optional[TextIO] = None
+):
+    metrics = RunMetrics()
 
     more_info_link = "More information: https://github.com/dimitree54/ai_code_reviewer/blob/main/README.md"
-    if "OPENAI_API_KEY" not in os.environ:
-        logger.error(f"No OPENAI_API_KEY found. {more_info_link}")
+    missing_api_keys = [] if args.dry_run else get_missing_api_keys(args)
+    if len(missing_api_keys) > 0:
+        logger.error(f"No {', '.join(missing_api_keys)} found. {more_info_link}")
+        return
+    try:
+        shard = Shard.parse(args.shard) if args.shard is not None else None
+    except ValueError as error:
+        logger.error(str(error))
+        return
+
+    if args.staged and args.include_not_changed_files:
+        logger.error("--staged can not be used with --include_not_changed_files.")
         return
+    if args.incremental and (args.include_not_changed_files or shard is not None):
+        logger.warning("--incremental is ignored with --include_not_changed_files and --shard.")
+    if args.context_lines is not None and args.include_not_changed_files:
+        logger.warning("--context_lines is ignored with --include_not_changed_files.")
 
     repo_path = Path(args.repo_path)
     allowed_extensions = set(args.file_extensions_to_review)
     coding_principles_path = Path(args.custom_principles_path) if args.custom_principles_path \
         else repo_path / ".coding_principles"
 
-    all_principles_path = [
-        coding_principles_path / principle_path for principle_path in os.listdir(coding_principles_path)
-        if os.path.splitext(principle_path)[1] == ".yaml"
-    ]
+    all_principles_path = list_principle_paths(coding_principles_path)
     if len(all_principles_path) == 0:
         logger.error(
             f"No review principles found. You need to populate '{coding_principles_path}' dir with review principles."
             f" {more_info_link}")
         return
-    container = Container.from_config(
-            AppConfig(
-                principles_path=all_principles_path,
-                llm_model_name=args.openai_model_name
-            )
+    cache_dir = None if args.no_cache else get_cache_dir(repo_path, args.cache_dir)
+    if cache_dir is None and not args.no_cache:
+        logger.warning(f"No git directory found for {repo_path}, caching is off. Use --cache_dir to enable it.")
+    principles_bundle_path = get_cache_state_file(cache_dir, PRINCIPLES_BUNDLE_FILE_NAME)
+    try:
+        compiled_principles = load_principles(all_principles_path, principles_bundle_path)
+    except PrincipleValidationError as error:
+        logger.error(f"{error}\n{more_info_link}")
+        return
+    if args.include_not_changed_files:
+        scanned_files = iterate_repo_files(repo_path, allowed_extensions, args.max_file_size_bytes, args.scan_workers)
+        first_scanned_file = await asyncio.to_thread(next, scanned_files, None)
+        if first_scanned_file is None:
+            report_files_to_review([], logger)
+            return
+        if args.dry_run or args.max_cost is not None or shard is not None:
+            files_to_review = await asyncio.to_thread(dict, chain([first_scanned_file], scanned_files))
+            report_files_to_review(files_to_review.keys(), logger)
+            pending_files = files_to_review
+        else:
+            files_to_review: Dict[str, str] = {}
+            pending_files = iterate_scanned_files(
+                chain([first_scanned_file], scanned_files), files_to_review, logger)
+    else:
+        with metrics.stage("git diff"):
+            if args.staged:
+                files_to_review = await asyncio.to_thread(get_staged_diff, repo_path, allowed_extensions)
+            else:
+                files_to_review = await asyncio.to_thread(
+                    get_repo_diff, repo_path, args.compare_with, allowed_extensions)
+        report_files_to_review(files_to_review.keys(), logger)
+        if len(files_to_review) == 0:
+            return
+        pending_files = files_to_review
+
+    staged_state_file = get_cache_state_file(cache_dir, STAGED_STATE_FILE_NAME) \
+        if args.staged and not args.dry_run and shard is None else None
+    if staged_state_file is not None:
+        staged_fingerprint = get_staged_fingerprint(
+            files_to_review,
+            {compiled_principle.path: compiled_principle.content_hash for compiled_principle in compiled_principles},
+            get_review_settings(args)
         )
+        staged_state = StagedReviewState.load(staged_state_file)
+        if staged_state is not None and staged_state.fingerprint == staged_fingerprint:
+            logger.info("Staged changes were already reviewed, reporting previous review results.")
+            report_stored_reviews(files_to_review, staged_state.get_reviews(), args, logger, output_stream)
+            return
 
-    files_to_review = get_all_files(repo_path, allowed_extensions) if args.include_not_changed_files \
-        else get_repo_diff(repo_path, args.compare_with, allowed_extensions)
-    report_files_to_review(files_to_review.keys(), logger)
+    with metrics.stage("setup"):
+        from langchain_community.callbacks import get_openai_callback
+        from tqdm.contrib.logging import logging_redirect_tqdm
+        from ai_code_reviewer.containers import AppConfig
 
+        container = get_container(
+                AppConfig(
+                    principles_path=all_principles_path,
+                    principles_bundle_path=principles_bundle_path,
+                    llm_model_name=args.openai_model_name,
+                    llm_backend="fake" if args.dry_run else args.llm_backend,
+                    llm_base_url=args.llm_base_url,
+                    azure_api_version=args.azure_api_version,
+                    fast_llm_backend="fake" if args.dry_run and args.fast_llm_backend else args.fast_llm_backend,
+                    fast_llm_model_name=args.fast_llm_model_name,
+                    fast_llm_base_url=args.fast_llm_base_url,
+                    max_fast_diff_tokens=args.max_fast_diff_tokens,
+                    llm_max_retries=0,
+                    llm_context_window_tokens=args.context_window_tokens,
+                    max_principles_per_call=args.principles_per_call,
+                    review_mode=args.review_mode,
+                    verification_window_lines=args.verification_window_lines,
+                    project_context_tokens=args.project_context_tokens,
+                    cache_dir=cache_dir,
+                    prompt_source=args.prompt_source,
+                    principle_checking_hub_prompt_name=args.principle_checking_hub_prompt,
+                    reasoning_hub_prompt_name=args.reasoning_hub_prompt
+                ),
+                containers
+            )
+
+        scheduler = ReviewScheduler(
+            max_concurrency=args.max_concurrent_reviews,
+            route_concurrency=get_route_concurrency(args),
+            tokens_per_minute=args.tokens_per_minute,
+            max_retries=args.max_retries
+        )
+        reviewers = container.reviewers()
+        reviewer_batcher = container.reviewer_batcher()
+        diff_chunker = DiffChunker(
+            max_tokens=args.max_chunk_tokens or get_default_max_chunk_tokens(args.context_window_tokens),
+            overlap_lines=args.chunk_overlap_lines
+        )
+    context_builder = None
+    if args.project_context_tokens > 0:
+        with metrics.stage("symbol index"):
+            symbol_index = await asyncio.to_thread(
+                update_symbol_index, repo_path, get_cache_state_file(cache_dir, SYMBOL_INDEX_FILE_NAME),
+                args.max_file_size_bytes)
+        context_builder = partial(
+            build_project_context, symbol_index, max_tokens=args.project_context_tokens,
+            is_diff=not args.include_not_changed_files, repo_path=repo_path)
+    reviewer_filter = None
+    if shard is not None:
+        shard_assignment = select_shard_work(files_to_review, reviewers, shard)
+        logger.info(f"Shard {shard}: {len(shard_assignment.work)} of {shard_assignment.total_work_items}"
+                    f" file-principle reviews, ~{shard_assignment.tokens} tokens")
+        shard_files = shard_assignment.get_file_names()
+        pending_files = {
+            file_name: file_diff for file_name, file_diff in pending_files.items() if file_name in shard_files
+        }
+        reviewer_filter = shard_assignment.includes
+    is_incremental = args.incremental and not args.include_not_changed_files and shard is None
+    state_file = get_state_file(repo_path, args.state_file) if is_incremental else None
+    if is_incremental and state_file is None:
+        logger.error(f"No git directory found for {repo_path}, use --state_file to review incrementally.")
+    reused_reviews: List[FileDiffReview] = []
+    if state_file is not None:
+        blob_hashes = await asyncio.to_thread(
+            read_index_blob_hashes if args.staged else read_blob_hashes, repo_path, list(files_to_review.keys()))
+        review_settings_hash = hash_cache_key(**get_review_settings(args))
+        state = IncrementalState.load(state_file)
+        if state is not None and not state.is_compatible(args.compare_with, review_settings_hash):
+            logger.info("Review settings changed since previous review, reviewing all files")
+            state = None
+        reused_reviews, pending_files = split_reviewed_files(state, files_to_review, blob_hashes, reviewers)
+        logger.info(f"{len(files_to_review) - len(pending_files)} files were not changed since previous review")
+    if args.dry_run or args.max_cost is not None:
+        with metrics.stage("estimate"):
+            review_tasks = await asyncio.to_thread(
+                build_review_tasks, pending_files, reviewers, get_context_lines(args), reviewer_batcher, diff_chunker,
+                reviewer_filter, context_builder, not args.include_not_changed_files)
+            estimate = estimate_review_tasks(
+                review_tasks,
+                args.openai_model_name,
+                call_overhead_tokens=count_tokens(container.call_overhead_text(), args.openai_model_name),
+                expected_output_tokens=args.expected_output_tokens
+            )
+        logger.info(format_estimate(estimate))
+        if args.dry_run:
+            return
+        pending_files = fit_into_budget(estimate, pending_files, args.max_cost, logger)
+        if len(pending_files) == 0:
+            logger.error(f"No files can be reviewed within --max_cost {args.max_cost}$")
+            return
+    review_cache = container.review_cache()
+    initial_cache_stats = (review_cache.hits, review_cache.misses) if review_cache is not None else (0, 0)
     with get_openai_callback() as cb:  # noqa
         start_time = time.time()
-        reviews = asyncio.run(
-            get_reviews(files_to_review, container.reviewers())
-        )
-        if not args.allow_irrelevant:
-            reviews = [suppress_irrelevant_comments(review) for review in reviews]
-        if args.suppress_not_changed_lines:
-            reviews = [suppress_not_changed_lines_comments(review, files_to_review) for review in reviews]
-        if args.suppress_noqa_lines:
-            reviews = [suppress_noqa_line_comments(review, files_to_review) for review in reviews]
-        report_reviews(reviews, logger)
+        progress_logging = logging_redirect_tqdm(loggers=[logger]) if report_progress else nullcontext()
+        with progress_logging, metrics.stage("review"), open_review_writer(args, logger, output_stream) as writer:
+            reviews, is_completed = await stream_reviews(
+                pending_files, reviewers, reviewer_batcher, diff_chunker, scheduler, args, logger,
+                per_file_diff=files_to_review, reused_reviews=reused_reviews, metrics=metrics,
+                report_progress=report_progress, review_writer=writer, reviewer_filter=reviewer_filter,
+                context_builder=context_builder)
+        report_failed_reviews(reviews, logger)
+        if shard is not None and args.shard_out is not None:
+            build_shard_result(shard, files_to_review, reviews, not args.include_not_changed_files).save(
+                Path(args.shard_out))
+        if state_file is not None and is_completed:
+            try:
+                build_incremental_state(
+                    args.compare_with, review_settings_hash, files_to_review, blob_hashes, reviews, reviewers
+                ).save(state_file)
+            except OSError as error:
+                logger.error(f"Failed to save incremental review state to {state_file}: {error}")
+        if staged_state_file is not None and is_completed and all(review.error is None for review in reviews):
+            build_staged_review_state(staged_fingerprint, reviews).save(staged_state_file)
+        if review_cache is not None:
+            review_cache.evict()
         time_spent = time.time() - start_time
-        logger.info(f"Review completed in {round(time_spent, 2)}s and {round(cb.total_cost, 2)}$")
+        logger.info(f"Review completed in {round(time_spent, 2)}s and {round(cb.total_cost, 2)}$"
+                    f"{format_cache_stats(review_cache, *initial_cache_stats)}")
+        if metrics.triage_skipped_calls > 0:
+            logger.info(metrics.format_triage_summary())
+    if args.metrics_out is not None:
+        metrics.save(Path(args.metrics_out))
+        logger.info(metrics.format_summary())
+
+
+def report_stored_reviews(
+        per_file_diff: Dict[str, str],
+        reviews: List[FileDiffReview],
+        args: argparse.Namespace,
+        logger: logging.Logger,
+        output_stream: Optional[TextIO] = None,
+        is_diff: bool = True
+) -> int:
+    violations_count = 0
+    with open_review_writer(args, logger, output_stream) as writer:
+        review_reporter = ReviewReporter(per_file_diff, args, writer, is_diff)
+        for review in reviews:
+            violations_count += review_reporter.report(review)
+    report_failed_reviews(reviews, logger)
+    return violations_count
+
+
+def load_shard_results(shard_result_paths: List[str], logger: logging.Logger) -> List[ShardResult]:
+    shard_results = []
+    for shard_result_path in shard_result_paths:
+        try:
+            shard_results.append(ShardResult.load(Path(shard_result_path)))
+        except (OSError, ValueError) as error:
+            logger.error(f"Can not read shard result {shard_result_path}: {error}")
+    return shard_results
+
+
+def merge_shards(
+        args: argparse.Namespace,
+        logger: logging.Logger,
+        output_stream: Optional[TextIO] = None
+):
+    shard_results = load_shard_results(args.shard_results, logger)
+    if len(shard_results) == 0:
+        logger.error("No shard results to merge.")
+        return
+    try:
+        missing_shards = get_missing_shards(shard_results)
+    except ValueError as error:
+        logger.error(str(error))
+        return
+    if len(missing_shards) > 0:
+        logger.warning(f"Results of shards {', '.join(str(shard) for shard in missing_shards)} are missing,"
+                       f" merged report is incomplete.")
+    per_file_diff, reviews = merge_shard_results(shard_results)
+    is_diff = all(shard_result.is_diff for shard_result in shard_results)
+    violations_count = report_stored_reviews(per_file_diff, reviews, args, logger, output_stream, is_diff)
+    logger.info(f"Merged {len(shard_results)} shards: {violations_count} violations in {len(per_file_diff)} files")
+
+
+def main():
+    logger = get_logger()
+    if sys.argv[1:2] == [MERGE_COMMAND]:
+        merge_shards(build_merge_parser().parse_args(sys.argv[2:]), logger)
+        return
+    args = build_parser().parse_args()
+    if args.serve:
+        asyncio.run(serve(Path(args.socket_path), logger))
+    elif not args.use_server or not asyncio.run(request_review(Path(args.socket_path), args, logger)):
+        asyncio.run(run_review(args, logger, {}))
 
 
 if __name__ == '__main__':
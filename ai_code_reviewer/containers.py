@@ -1,41 +1,164 @@
+import json
 from pathlib import Path
-from typing import Dict, List, Type
+from typing import Callable as CallableType, Dict, List, Type, Optional
 
-import yaml
 from dependency_injector.containers import DeclarativeContainer
-from dependency_injector.providers import Factory, Singleton, Callable, Configuration
-from langchain import hub
+from dependency_injector.providers import (
+    Factory, Singleton, Callable, Configuration, List as ProvidersList
+)
 from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSerializable, Runnable
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 from yid_langchain_extensions.llm.tools_llm_with_thought import build_tools_llm_with_thought
 from yid_langchain_extensions.output_parser.pydantic_from_tool import PydanticOutputParser
 from yid_langchain_extensions.utils import convert_to_openai_tool_v2
 
-from ai_code_reviewer.review import FileDiffComments
-from ai_code_reviewer.reviewers.base import Reviewer
-from ai_code_reviewer.reviewers.programming_principle import ProgrammingPrincipleReviewer, ProgrammingPrinciple
+from ai_code_reviewer.cache import ReviewCache, hash_cache_key
+from ai_code_reviewer.llms.backends import LlmSettings, build_llm, DEFAULT_AZURE_API_VERSION
+from ai_code_reviewer.prompts import (
+    PromptSource, ReviewMode, PRINCIPLE_CHECKING_PROMPT_NAME, REASONING_PROMPT_NAME, BATCHED_PRINCIPLES_PROMPT_NAME,
+    CANDIDATE_PROMPT_NAME, VERIFICATION_PROMPT_NAME, PRINCIPLE_CHECKING_HUB_PROMPT_NAME, REASONING_HUB_PROMPT_NAME
+)
+from ai_code_reviewer.principles import ProgrammingPrinciple, load_principles
+from ai_code_reviewer.prompts.loading import load_prompt, get_prompt_text, with_project_context
+from ai_code_reviewer.review import CandidateComments, FileDiffComments, PrincipleFileDiffComments
+from ai_code_reviewer.reviewers.base import Reviewer, ReviewerBatcher
+from ai_code_reviewer.reviewers.batched_principles import PrincipleBatcher
+from ai_code_reviewer.reviewers.programming_principle import ProgrammingPrincipleReviewer
+from ai_code_reviewer.reviewers.routing import ReviewRouter
+from ai_code_reviewer.reviewers.two_stage import TwoStageReviewChain
+from ai_code_reviewer.tokens import estimate_tokens
 
 
-def load_principle_reviewer(
-        principle_yaml_path: Path, diff_review_chain: RunnableSerializable[Dict, FileDiffComments]
+def build_principle_reviewer(
+        programming_principle: ProgrammingPrinciple,
+        diff_review_chain: RunnableSerializable[Dict, FileDiffComments],
+        review_cache: Optional[ReviewCache] = None,
+        cache_namespace: str = "",
+        review_router: Optional[ReviewRouter] = None
 ) -> ProgrammingPrincipleReviewer:
-    with open(principle_yaml_path, "r") as file:
-        programming_principle_dict = yaml.safe_load(file)
-        programming_principle = ProgrammingPrinciple(**programming_principle_dict)
-    reviewer = ProgrammingPrincipleReviewer(
+    return ProgrammingPrincipleReviewer(
         programming_principle=programming_principle,
-        diff_review_chain=diff_review_chain
+        diff_review_chain=diff_review_chain,
+        review_cache=review_cache,
+        cache_namespace=cache_namespace,
+        review_router=review_router
     )
-    return reviewer
+
+
+def build_principle_reviewers(
+        principles_path: List[Path],
+        principles_bundle_path: Optional[Path],
+        diff_review_chain: RunnableSerializable[Dict, FileDiffComments],
+        review_cache: Optional[ReviewCache],
+        cache_namespace: str,
+        review_router: Optional[ReviewRouter]
+) -> List[Reviewer]:
+    return [
+        build_principle_reviewer(
+            compiled_principle.principle, diff_review_chain, review_cache, cache_namespace, review_router)
+        for compiled_principle in load_principles(principles_path, principles_bundle_path)
+    ]
 
 
 class AppConfig(BaseModel):
     principles_path: List[Path]
+    principles_bundle_path: Optional[Path] = None
     llm_model_name: str
+    llm_backend: str = "openai"
+    llm_base_url: Optional[str] = None
+    azure_api_version: str = DEFAULT_AZURE_API_VERSION
+    fast_llm_backend: Optional[str] = None
+    fast_llm_model_name: Optional[str] = None
+    fast_llm_base_url: Optional[str] = None
+    max_fast_diff_tokens: int = 2000
+    fake_llm_latency_seconds: float = 0.0
+    fake_llm_failure_rate: float = 0.0
+    fake_llm_comments_per_review: int = 1
     llm_model_temperature: float = 0.0
+    llm_max_retries: int = 2
+    llm_context_window_tokens: int = 128000
+    llm_max_output_tokens: int = 4096
+    max_principles_per_call: int = 1
+    review_mode: ReviewMode = ReviewMode.SINGLE_PASS
+    verification_window_lines: int = 10
+    project_context_tokens: int = 0
+    cache_dir: Optional[Path] = None
+    cache_max_size_bytes: int = 100 * 1024 * 1024
+    cache_max_age_seconds: float = 30 * 24 * 60 * 60
+    prompt_source: PromptSource = PromptSource.LOCAL
+    principle_checking_hub_prompt_name: str = PRINCIPLE_CHECKING_HUB_PROMPT_NAME
+    reasoning_hub_prompt_name: str = REASONING_HUB_PROMPT_NAME
+
+
+def build_review_cache(
+        cache_dir: Optional[Path], max_size_bytes: int, max_age_seconds: float
+) -> Optional[ReviewCache]:
+    if cache_dir is None:
+        return None
+    return ReviewCache(cache_dir=cache_dir, max_size_bytes=max_size_bytes, max_age_seconds=max_age_seconds)
+
+
+def build_reviewer_batcher(
+        diff_review_chain: Runnable,
+        max_principles_per_call: int,
+        llm_context_window_tokens: int,
+        llm_max_output_tokens: int,
+        prompt: ChatPromptTemplate,
+        review_cache: Optional[ReviewCache],
+        cache_namespace: str,
+        review_router: Optional[ReviewRouter] = None,
+        project_context_tokens: int = 0
+) -> Optional[ReviewerBatcher]:
+    if max_principles_per_call <= 1:
+        return None
+    return PrincipleBatcher(
+        diff_review_chain=diff_review_chain,
+        max_principles_per_call=max_principles_per_call,
+        max_prompt_tokens=llm_context_window_tokens - llm_max_output_tokens,
+        prompt_overhead_tokens=estimate_tokens(get_prompt_text(prompt)) + project_context_tokens,
+        review_cache=review_cache,
+        cache_namespace=cache_namespace,
+        review_router=review_router
+    )
+
+
+def build_review_router(
+        fast_llm_backend: Optional[str],
+        fast_diff_review_chain: CallableType[[], Runnable],
+        fast_batched_diff_review_chain: CallableType[[], Runnable],
+        fast_cache_namespace: str,
+        max_fast_diff_tokens: int
+) -> Optional[ReviewRouter]:
+    if fast_llm_backend is None:
+        return None
+    return ReviewRouter(
+        fast_diff_review_chain=fast_diff_review_chain(),
+        fast_batched_diff_review_chain=fast_batched_diff_review_chain(),
+        fast_cache_namespace=fast_cache_namespace,
+        max_fast_diff_tokens=max_fast_diff_tokens
+    )
+
+
+def build_cache_namespace(
+        llm_backend: Optional[str],
+        llm_model_name: Optional[str],
+        llm_model_temperature: float,
+        prompts: List[ChatPromptTemplate],
+        review_mode: ReviewMode = ReviewMode.SINGLE_PASS,
+        two_stage_prompts: Optional[List[ChatPromptTemplate]] = None,
+        verification_window_lines: Optional[int] = None
+) -> str:
+    prompts_version = hash_cache_key(prompts=[dumps(prompt) for prompt in prompts])
+    cache_namespace = f"{llm_backend}:{llm_model_name}:{llm_model_temperature}:{prompts_version}"
+    if review_mode != ReviewMode.TWO_STAGE:
+        return cache_namespace
+    two_stage_version = hash_cache_key(
+        prompts=[dumps(prompt) for prompt in two_stage_prompts], window_lines=verification_window_lines)
+    return f"{cache_namespace}:{ReviewMode.TWO_STAGE.value}:{two_stage_version}"
 
 
 class ReasoningThought(BaseModel):
@@ -43,7 +166,7 @@ class ReasoningThought(BaseModel):
 
 
 def build_diff_review_chain(
-        tools_llm: ChatOpenAI,
+        tools_llm: BaseChatModel,
         review_class: Type[BaseModel],
         reasoning_class: Type[BaseModel],
         prompt: ChatPromptTemplate,
@@ -59,6 +182,42 @@ def build_diff_review_chain(
     return prompt | llm_with_review_tool_and_reasoning | pydantic_output_parser
 
 
+def build_candidate_review_chain(
+        tools_llm: BaseChatModel,
+        review_class: Type[BaseModel],
+        prompt: ChatPromptTemplate
+) -> Runnable:
+    review_tool = convert_to_openai_tool_v2(review_class)
+    llm_with_review_tool = tools_llm.bind(
+        tools=[review_tool],
+        tool_choice={"type": "function", "function": {"name": review_tool["function"]["name"]}}
+    )
+    pydantic_output_parser = PydanticOutputParser(
+        pydantic_class=review_class,
+        base_parser=OpenAIToolsAgentOutputParser()
+    )
+    return prompt | llm_with_review_tool | pydantic_output_parser
+
+
+def build_principle_review_chain(
+        review_mode: ReviewMode,
+        diff_review_chain: CallableType[[], Runnable],
+        two_stage_diff_review_chain: CallableType[[], Runnable]
+) -> Runnable:
+    if review_mode == ReviewMode.TWO_STAGE:
+        return two_stage_diff_review_chain()
+    return diff_review_chain()
+
+
+def build_call_overhead_text(
+        reasoning_prompt: ChatPromptTemplate,
+        review_class: Type[BaseModel],
+        reasoning_class: Type[BaseModel]
+) -> str:
+    tools = [convert_to_openai_tool_v2(review_class), convert_to_openai_tool_v2(reasoning_class)]
+    return get_prompt_text(reasoning_prompt) + json.dumps(tools)
+
+
 class Container(DeclarativeContainer):
     @staticmethod
     def from_config(app_config: AppConfig) -> "Container":
@@ -68,13 +227,53 @@ class Container(DeclarativeContainer):
 
     config = Configuration()
 
-    llm: Factory[ChatOpenAI] = Factory(
-        ChatOpenAI, model_name=config.llm_model_name, temperature=config.llm_model_temperature)
+    llm: Factory[BaseChatModel] = Factory(
+        build_llm,
+        settings=Factory(
+            LlmSettings,
+            backend=config.llm_backend,
+            model_name=config.llm_model_name,
+            temperature=config.llm_model_temperature,
+            max_retries=config.llm_max_retries,
+            base_url=config.llm_base_url,
+            azure_api_version=config.azure_api_version,
+            fake_latency_seconds=config.fake_llm_latency_seconds,
+            fake_failure_rate=config.fake_llm_failure_rate,
+            fake_comments_per_review=config.fake_llm_comments_per_review
+        )
+    )
+    fast_llm: Factory[BaseChatModel] = Factory(
+        build_llm,
+        settings=Factory(
+            LlmSettings,
+            backend=config.fast_llm_backend,
+            model_name=config.fast_llm_model_name,
+            temperature=config.llm_model_temperature,
+            max_retries=config.llm_max_retries,
+            base_url=config.fast_llm_base_url,
+            azure_api_version=config.azure_api_version,
+            fake_latency_seconds=config.fake_llm_latency_seconds,
+            fake_failure_rate=config.fake_llm_failure_rate,
+            fake_comments_per_review=config.fake_llm_comments_per_review
+        )
+    )
     principle_checking_template: Singleton[ChatPromptTemplate] = Singleton(
-        lambda: hub.pull("dimitree54/code_review_single_responsibility"),
+        with_project_context,
+        prompt=Singleton(
+            load_prompt,
+            prompt_source=config.prompt_source,
+            local_prompt_name=PRINCIPLE_CHECKING_PROMPT_NAME,
+            hub_prompt_name=config.principle_checking_hub_prompt_name,
+            cache_dir=config.cache_dir
+        ),
+        project_context_tokens=config.project_context_tokens
     )
     reasoning_template: Singleton[ChatPromptTemplate] = Singleton(
-        lambda: hub.pull("dimitree54/introduce_thought_tool"),
+        load_prompt,
+        prompt_source=config.prompt_source,
+        local_prompt_name=REASONING_PROMPT_NAME,
+        hub_prompt_name=config.reasoning_hub_prompt_name,
+        cache_dir=config.cache_dir
     )
     diff_review_chain: Callable[RunnableSerializable[Dict, FileDiffComments]] = Factory(
         build_diff_review_chain,
@@ -84,9 +283,136 @@ class Container(DeclarativeContainer):
         prompt=principle_checking_template,
         reasoning_prompt=reasoning_template
     )
+    candidate_template: Singleton[ChatPromptTemplate] = Singleton(
+        with_project_context,
+        prompt=Singleton(
+            load_prompt,
+            prompt_source=PromptSource.LOCAL,
+            local_prompt_name=CANDIDATE_PROMPT_NAME
+        ),
+        project_context_tokens=config.project_context_tokens
+    )
+    verification_template: Singleton[ChatPromptTemplate] = Singleton(
+        with_project_context,
+        prompt=Singleton(
+            load_prompt,
+            prompt_source=PromptSource.LOCAL,
+            local_prompt_name=VERIFICATION_PROMPT_NAME
+        ),
+        project_context_tokens=config.project_context_tokens
+    )
+    two_stage_diff_review_chain: Callable[TwoStageReviewChain] = Factory(
+        TwoStageReviewChain,
+        candidate_review_chain=Factory(
+            build_candidate_review_chain,
+            tools_llm=llm,
+            review_class=CandidateComments,
+            prompt=candidate_template
+        ),
+        verification_chain=Factory(
+            build_diff_review_chain,
+            tools_llm=llm,
+            review_class=FileDiffComments,
+            reasoning_class=ReasoningThought,
+            prompt=verification_template,
+            reasoning_prompt=reasoning_template
+        ),
+        window_lines=config.verification_window_lines
+    )
+    principle_review_chain: Callable[Runnable] = Callable(
+        build_principle_review_chain,
+        review_mode=config.review_mode,
+        diff_review_chain=diff_review_chain.provider,
+        two_stage_diff_review_chain=two_stage_diff_review_chain.provider
+    )
+    batched_principles_template: Singleton[ChatPromptTemplate] = Singleton(
+        with_project_context,
+        prompt=Singleton(
+            load_prompt,
+            prompt_source=PromptSource.LOCAL,
+            local_prompt_name=BATCHED_PRINCIPLES_PROMPT_NAME
+        ),
+        project_context_tokens=config.project_context_tokens
+    )
+    batched_diff_review_chain: Callable[RunnableSerializable[Dict, PrincipleFileDiffComments]] = Factory(
+        build_diff_review_chain,
+        tools_llm=llm,
+        review_class=PrincipleFileDiffComments,
+        reasoning_class=ReasoningThought,
+        prompt=batched_principles_template,
+        reasoning_prompt=reasoning_template
+    )
+    fast_diff_review_chain: Callable[RunnableSerializable[Dict, FileDiffComments]] = Factory(
+        build_diff_review_chain,
+        tools_llm=fast_llm,
+        review_class=FileDiffComments,
+        reasoning_class=ReasoningThought,
+        prompt=principle_checking_template,
+        reasoning_prompt=reasoning_template
+    )
+    fast_batched_diff_review_chain: Callable[RunnableSerializable[Dict, PrincipleFileDiffComments]] = Factory(
+        build_diff_review_chain,
+        tools_llm=fast_llm,
+        review_class=PrincipleFileDiffComments,
+        reasoning_class=ReasoningThought,
+        prompt=batched_principles_template,
+        reasoning_prompt=reasoning_template
+    )
+    call_overhead_text: Callable[str] = Callable(
+        build_call_overhead_text,
+        reasoning_prompt=reasoning_template,
+        review_class=FileDiffComments,
+        reasoning_class=ReasoningThought
+    )
+    review_cache: Singleton[Optional[ReviewCache]] = Singleton(
+        build_review_cache,
+        cache_dir=config.cache_dir,
+        max_size_bytes=config.cache_max_size_bytes,
+        max_age_seconds=config.cache_max_age_seconds
+    )
+    cache_namespace: Callable[str] = Callable(
+        build_cache_namespace,
+        llm_backend=config.llm_backend,
+        llm_model_name=config.llm_model_name,
+        llm_model_temperature=config.llm_model_temperature,
+        prompts=ProvidersList(principle_checking_template, reasoning_template, batched_principles_template),
+        review_mode=config.review_mode,
+        two_stage_prompts=ProvidersList(candidate_template, verification_template),
+        verification_window_lines=config.verification_window_lines
+    )
+    fast_cache_namespace: Callable[str] = Callable(
+        build_cache_namespace,
+        llm_backend=config.fast_llm_backend,
+        llm_model_name=config.fast_llm_model_name,
+        llm_model_temperature=config.llm_model_temperature,
+        prompts=ProvidersList(principle_checking_template, reasoning_template, batched_principles_template)
+    )
+    review_router: Singleton[Optional[ReviewRouter]] = Singleton(
+        build_review_router,
+        fast_llm_backend=config.fast_llm_backend,
+        fast_diff_review_chain=fast_diff_review_chain.provider,
+        fast_batched_diff_review_chain=fast_batched_diff_review_chain.provider,
+        fast_cache_namespace=fast_cache_namespace,
+        max_fast_diff_tokens=config.max_fast_diff_tokens
+    )
     reviewers: Singleton[List[Reviewer]] = Singleton(
-        lambda principles_path, diff_review_chain: [
-            load_principle_reviewer(principle_path, diff_review_chain) for principle_path in principles_path],
+        build_principle_reviewers,
         principles_path=config.principles_path,
-        diff_review_chain=diff_review_chain
+        principles_bundle_path=config.principles_bundle_path,
+        diff_review_chain=principle_review_chain,
+        review_cache=review_cache,
+        cache_namespace=cache_namespace,
+        review_router=review_router
+    )
+    reviewer_batcher: Singleton[Optional[ReviewerBatcher]] = Singleton(
+        build_reviewer_batcher,
+        diff_review_chain=batched_diff_review_chain,
+        max_principles_per_call=config.max_principles_per_call,
+        llm_context_window_tokens=config.llm_context_window_tokens,
+        llm_max_output_tokens=config.llm_max_output_tokens,
+        prompt=batched_principles_template,
+        review_cache=review_cache,
+        cache_namespace=cache_namespace,
+        review_router=review_router,
+        project_context_tokens=config.project_context_tokens
     )
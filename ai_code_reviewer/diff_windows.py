@@ -0,0 +1,140 @@
+import ast
+import bisect
+import math
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from ai_code_reviewer.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+CHANGED_LINE_PREFIXES = ("+", "-")
+NO_NEWLINE_MARKER_PREFIX = "\\"
+NOT_NEW_FILE_LINE_PREFIXES = ("-", NO_NEWLINE_MARKER_PREFIX)
+PYTHON_FILE_SUFFIX = ".py"
+PYTHON_TOP_LEVEL_BLOCK_PREFIXES = ("def ", "async def ", "class ", "@")
+DEFAULT_CHUNK_OVERLAP_LINES = 20
+
+
+class DiffWindow(BaseModel):
+    first_line_number: int
+    diff: str
+    owned_line_range: Optional[Tuple[int, int]] = None
+    is_diff: bool = True
+
+    def owns_line(self, line_number: int) -> bool:
+        if self.owned_line_range is None:
+            return True
+        return self.owned_line_range[0] <= line_number < self.owned_line_range[1]
+
+
+def get_changed_line_numbers(diff_lines: List[str]) -> List[int]:
+    return [line_number for line_number, line in enumerate(diff_lines) if line.startswith(CHANGED_LINE_PREFIXES)]
+
+
+def merge_line_ranges(line_ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged_ranges: List[Tuple[int, int]] = []
+    for start, end in sorted(line_ranges):
+        if merged_ranges and start <= merged_ranges[-1][1]:
+            merged_ranges[-1] = (merged_ranges[-1][0], max(merged_ranges[-1][1], end))
+        else:
+            merged_ranges.append((start, end))
+    return merged_ranges
+
+
+def split_diff_into_windows(diff: str, context_lines: Optional[int], is_diff: bool = True) -> List[DiffWindow]:
+    if context_lines is None or len(diff) == 0 or not is_diff:
+        return [DiffWindow(first_line_number=0, diff=diff, is_diff=is_diff)]
+    diff_lines = diff.splitlines()
+    changed_line_numbers = get_changed_line_numbers(diff_lines)
+    if len(changed_line_numbers) == 0:
+        return [DiffWindow(first_line_number=0, diff=diff)]
+    line_ranges = [
+        (max(0, line_number - context_lines), min(len(diff_lines), line_number + context_lines + 1))
+        for line_number in changed_line_numbers
+    ]
+    return [
+        DiffWindow(first_line_number=start, diff="\n".join(diff_lines[start:end]))
+        for start, end in merge_line_ranges(line_ranges)
+    ]
+
+
+def get_new_file_lines(diff_lines: List[str], is_diff: bool = True) -> List[Tuple[int, str]]:
+    if not is_diff:
+        return list(enumerate(diff_lines))
+    return [
+        (line_number, line[1:]) for line_number, line in enumerate(diff_lines)
+        if not line.startswith(NOT_NEW_FILE_LINE_PREFIXES)
+    ]
+
+
+def get_python_statement_starts(new_file_lines: List[Tuple[int, str]]) -> Optional[List[int]]:
+    try:
+        module = ast.parse("\n".join(line for _, line in new_file_lines))
+    except (SyntaxError, ValueError):
+        return None
+    statement_starts = []
+    for statement in module.body:
+        decorators = getattr(statement, "decorator_list", [])
+        first_line = min([statement.lineno] + [decorator.lineno for decorator in decorators])
+        statement_starts.append(new_file_lines[first_line - 1][0])
+    return statement_starts
+
+
+def get_chunk_boundaries(diff_lines: List[str], file_name: str, is_diff: bool = True) -> List[int]:
+    new_file_lines = get_new_file_lines(diff_lines, is_diff)
+    if not file_name.endswith(PYTHON_FILE_SUFFIX):
+        return [line_number for line_number, line in new_file_lines if len(line.strip()) == 0]
+    statement_starts = get_python_statement_starts(new_file_lines)
+    if statement_starts is not None:
+        return statement_starts
+    return [
+        line_number for line_number, line in new_file_lines if line.startswith(PYTHON_TOP_LEVEL_BLOCK_PREFIXES)
+    ]
+
+
+class DiffChunker(BaseModel):
+    max_tokens: int
+    overlap_lines: int = DEFAULT_CHUNK_OVERLAP_LINES
+
+    def _get_chunk_tokens(self, prefix_chars: List[int], start: int, end: int) -> int:
+        context_start = max(0, start - self.overlap_lines)
+        context_end = min(len(prefix_chars) - 1, end + self.overlap_lines)
+        return math.ceil((prefix_chars[context_end] - prefix_chars[context_start]) / CHARS_PER_TOKEN)
+
+    def _get_chunk_end(self, prefix_chars: List[int], boundaries: List[int], start: int) -> int:
+        chunk_end = None
+        for boundary_index in range(bisect.bisect_right(boundaries, start), len(boundaries)):
+            if self._get_chunk_tokens(prefix_chars, start, boundaries[boundary_index]) > self.max_tokens:
+                break
+            chunk_end = boundaries[boundary_index]
+        if chunk_end is not None:
+            return chunk_end
+        lines_count = len(prefix_chars) - 1
+        chunk_end = start + 1
+        while chunk_end < lines_count and self._get_chunk_tokens(prefix_chars, start, chunk_end + 1) <= self.max_tokens:
+            chunk_end += 1
+        return chunk_end
+
+    def split(self, diff_window: DiffWindow, file_name: str) -> List[DiffWindow]:
+        if estimate_tokens(diff_window.diff) <= self.max_tokens:
+            return [diff_window]
+        diff_lines = diff_window.diff.splitlines()
+        prefix_chars = [0]
+        for line_number, line in enumerate(diff_lines, start=diff_window.first_line_number):
+            prefix_chars.append(prefix_chars[-1] + len(f"{line_number}: {line}\n"))
+        boundaries = sorted(
+            set(get_chunk_boundaries(diff_lines, file_name, diff_window.is_diff)) | {len(diff_lines)})
+        chunks = []
+        start = 0
+        while start < len(diff_lines):
+            end = self._get_chunk_end(prefix_chars, boundaries, start)
+            context_start = max(0, start - self.overlap_lines)
+            context_end = min(len(diff_lines), end + self.overlap_lines)
+            chunks.append(DiffWindow(
+                first_line_number=diff_window.first_line_number + context_start,
+                diff="\n".join(diff_lines[context_start:context_end]),
+                owned_line_range=(diff_window.first_line_number + start, diff_window.first_line_number + end),
+                is_diff=diff_window.is_diff
+            ))
+            start = end
+        return chunks
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from ai_code_reviewer.diff_windows import get_changed_line_numbers
+from ai_code_reviewer.run_review import ReviewTask
+
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 400
+TOKENS_PER_PRICE_UNIT = 1000
+
+
+class ReviewTaskEstimate(BaseModel):
+    file_name: str
+    principle_names: List[str]
+    input_tokens: int
+    output_tokens: int
+
+
+class ReviewCostEstimate(BaseModel):
+    model_name: str
+    tasks: List[ReviewTaskEstimate]
+    input_token_price: Optional[float] = None
+    output_token_price: Optional[float] = None
+    skipped_calls: int = 0
+
+    @property
+    def calls(self) -> int:
+        return len(self.tasks)
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(task.input_tokens for task in self.tasks)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(task.output_tokens for task in self.tasks)
+
+    def get_task_cost(self, task: ReviewTaskEstimate) -> Optional[float]:
+        if self.input_token_price is None or self.output_token_price is None:
+            return None
+        return (task.input_tokens * self.input_token_price + task.output_tokens * self.output_token_price) \
+            / TOKENS_PER_PRICE_UNIT
+
+    @property
+    def cost(self) -> Optional[float]:
+        if self.input_token_price is None or self.output_token_price is None:
+            return None
+        return sum(self.get_task_cost(task) for task in self.tasks)
+
+    def get_files_cost(self) -> Dict[str, float]:
+        files_cost: Dict[str, float] = {}
+        for task in self.tasks:
+            files_cost[task.file_name] = files_cost.get(task.file_name, 0.0) + (self.get_task_cost(task) or 0.0)
+        return files_cost
+
+    def without_files(self, file_names: List[str]) -> "ReviewCostEstimate":
+        dropped_files = set(file_names)
+        return self.model_copy(update={"tasks": [task for task in self.tasks if task.file_name not in dropped_files]})
+
+
+def get_model_token_prices(model_name: str) -> Tuple[Optional[float], Optional[float]]:
+    from langchain_community.callbacks.openai_info import get_openai_token_cost_for_model
+
+    try:
+        return (
+            get_openai_token_cost_for_model(model_name, TOKENS_PER_PRICE_UNIT),
+            get_openai_token_cost_for_model(model_name, TOKENS_PER_PRICE_UNIT, is_completion=True)
+        )
+    except ValueError:
+        return None, None
+
+
+def estimate_review_tasks(
+        review_tasks: List[ReviewTask],
+        model_name: str,
+        call_overhead_tokens: int = 0,
+        expected_output_tokens: int = DEFAULT_EXPECTED_OUTPUT_TOKENS
+) -> ReviewCostEstimate:
+    input_token_price, output_token_price = get_model_token_prices(model_name)
+    return ReviewCostEstimate(
+        model_name=model_name,
+        tasks=[
+            ReviewTaskEstimate(
+                file_name=review_task.file_name,
+                principle_names=[author.name for author in review_task.reviewer.authors],
+                input_tokens=call_overhead_tokens + review_task.reviewer.count_prompt_tokens(
+                    review_task.diff_window.diff,
+                    first_line_number=review_task.diff_window.first_line_number,
+                    model_name=model_name,
+                    project_context=review_task.project_context
+                ),
+                output_tokens=expected_output_tokens
+            )
+            for review_task in review_tasks if not review_task.is_skipped
+        ],
+        input_token_price=input_token_price,
+        output_token_price=output_token_price,
+        skipped_calls=sum(review_task.is_skipped for review_task in review_tasks)
+    )
+
+
+def select_files_to_drop(
+        estimate: ReviewCostEstimate,
+        per_file_diff: Dict[str, str],
+        max_cost: float
+) -> List[str]:
+    files_cost = estimate.get_files_cost()
+    drop_order = sorted(
+        files_cost,
+        key=lambda file_name: (len(get_changed_line_numbers(per_file_diff[file_name].splitlines())),
+                               -files_cost[file_name])
+    )
+    total_cost = sum(files_cost.values())
+    files_to_drop = []
+    for file_name in drop_order:
+        if total_cost <= max_cost:
+            break
+        files_to_drop.append(file_name)
+        total_cost -= files_cost[file_name]
+    return files_to_drop
+
+
+def format_estimate(estimate: ReviewCostEstimate) -> str:
+    cost = "unknown cost" if estimate.cost is None else f"~{round(estimate.cost, 2)}$"
+    skipped = f" ({estimate.skipped_calls} calls skipped by triage)" if estimate.skipped_calls > 0 else ""
+    return f"Estimated {estimate.calls} calls to {estimate.model_name}{skipped}: {estimate.input_tokens} input" \
+           f" tokens, ~{estimate.output_tokens} output tokens, {cost}"
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from ai_code_reviewer.cache import hash_cache_key
+from ai_code_reviewer.line_index import DiffLineIndex
+from ai_code_reviewer.review import FileDiffComments
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import FileDiffReview, merge_reviews
+
+
+class StoredReview(FileDiffComments):
+    reviewer_name: str
+    reviewer_fingerprint: str
+
+
+class StoredFileState(BaseModel):
+    blob_hash: str
+    diff: str
+    reviews: List[StoredReview]
+
+
+class IncrementalState(BaseModel):
+    compare_with: str
+    review_settings_hash: str = ""
+    files: Dict[str, StoredFileState] = {}
+
+    @staticmethod
+    def load(state_path: Path) -> Optional["IncrementalState"]:
+        try:
+            return IncrementalState.model_validate_json(state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def is_compatible(self, compare_with: str, review_settings_hash: str) -> bool:
+        return self.compare_with == compare_with and self.review_settings_hash == review_settings_hash
+
+    def save(self, state_path: Path):
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = state_path.with_suffix(".tmp")
+        temporary_path.write_text(self.model_dump_json(), encoding="utf-8")
+        temporary_path.replace(state_path)
+
+
+def compute_blob_hash(content: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def read_blob_hashes(repo_path: Path, file_names: List[str]) -> Dict[str, str]:
+    return {file_name: compute_blob_hash((repo_path / file_name).read_bytes()) for file_name in file_names}
+
+
+def read_index_blob_hashes(repo_path: Path, file_names: List[str]) -> Dict[str, str]:
+    if len(file_names) == 0:
+        return {}
+    result = subprocess.run(
+        ["git", "-C", str(repo_path), "ls-files", "--stage", "-z", "--", *file_names],
+        capture_output=True, check=True
+    )
+    blob_hashes = {}
+    for entry in result.stdout.split(b"\0"):
+        if not entry:
+            continue
+        metadata, file_name = entry.split(b"\t", 1)
+        blob_hashes[os.fsdecode(file_name)] = metadata.split()[1].decode("ascii")
+    return blob_hashes
+
+
+def get_reviewer_fingerprint(reviewer: Reviewer) -> str:
+    programming_principle = getattr(reviewer, "programming_principle", None)
+    review_router = getattr(reviewer, "review_router", None)
+    return hash_cache_key(
+        name=reviewer.name,
+        principle=programming_principle.model_dump() if programming_principle is not None else None,
+        cache_namespace=getattr(reviewer, "cache_namespace", None),
+        fast_cache_namespace=review_router.fast_cache_namespace if review_router is not None else None
+    )
+
+
+def get_position_key(line_index: DiffLineIndex, line_number: int) -> Tuple[int, bool, Optional[str]]:
+    is_removed = line_index.is_removed(line_number)
+    return line_index.new_file_positions[line_number], is_removed, \
+        line_index.get_line(line_number) if is_removed else None
+
+
+def remap_line_numbers(old_diff: str, new_diff: str, comments: FileDiffComments) -> FileDiffComments:
+    old_line_index = DiffLineIndex.from_diff(old_diff)
+    new_line_index = DiffLineIndex.from_diff(new_diff)
+    new_diff_line_numbers = {
+        get_position_key(new_line_index, line_number): line_number
+        for line_number in range(new_line_index.lines_count)
+    }
+    remapped_comments = []
+    for comment in comments.comments:
+        if not old_line_index.has_line(comment.line_number):
+            continue
+        new_line_number = new_diff_line_numbers.get(get_position_key(old_line_index, comment.line_number))
+        if new_line_number is not None:
+            remapped_comments.append(comment.model_copy(update={"line_number": new_line_number}))
+    return FileDiffComments(comments=remapped_comments)
+
+
+def split_reviewed_files(
+        state: Optional[IncrementalState],
+        per_file_diff: Dict[str, str],
+        blob_hashes: Dict[str, str],
+        reviewers: List[Reviewer]
+) -> Tuple[List[FileDiffReview], Dict[str, str]]:
+    reused_reviews: List[FileDiffReview] = []
+    files_to_review: Dict[str, str] = {}
+    for file_name, file_diff in per_file_diff.items():
+        file_state = state.files.get(file_name) if state is not None else None
+        stored_reviews = {} if file_state is None else {
+            stored_review.reviewer_fingerprint: stored_review for stored_review in file_state.reviews
+        }
+        reviewers_fingerprints = [get_reviewer_fingerprint(reviewer) for reviewer in reviewers]
+        is_file_reviewed = file_state is not None and file_state.blob_hash == blob_hashes[file_name] \
+            and all(fingerprint in stored_reviews for fingerprint in reviewers_fingerprints)
+        if not is_file_reviewed:
+            files_to_review[file_name] = file_diff
+            continue
+        for reviewer, fingerprint in zip(reviewers, reviewers_fingerprints):
+            remapped_comments = remap_line_numbers(file_state.diff, file_diff, stored_reviews[fingerprint])
+            reused_reviews.append(FileDiffReview(
+                comments=remapped_comments.comments,
+                author=reviewer,
+                file_name=file_name
+            ))
+    return reused_reviews, files_to_review
+
+
+def build_incremental_state(
+        compare_with: str,
+        review_settings_hash: str,
+        per_file_diff: Dict[str, str],
+        blob_hashes: Dict[str, str],
+        reviews: List[FileDiffReview],
+        reviewers: List[Reviewer]
+) -> IncrementalState:
+    per_file_reviews: Dict[str, List[FileDiffReview]] = {}
+    for review in merge_reviews(reviews):
+        per_file_reviews.setdefault(review.file_name, []).append(review)
+    files = {}
+    for file_name, file_reviews in per_file_reviews.items():
+        is_fully_reviewed = len(file_reviews) == len(reviewers) \
+            and all(review.error is None for review in file_reviews)
+        if file_name not in per_file_diff or not is_fully_reviewed:
+            continue
+        files[file_name] = StoredFileState(
+            blob_hash=blob_hashes[file_name],
+            diff=per_file_diff[file_name],
+            reviews=[
+                StoredReview(
+                    comments=review.comments,
+                    reviewer_name=review.author.name,
+                    reviewer_fingerprint=get_reviewer_fingerprint(review.author)
+                )
+                for review in file_reviews
+            ]
+        )
+    return IncrementalState(compare_with=compare_with, review_settings_hash=review_settings_hash, files=files)
@@ -0,0 +1,74 @@
+from enum import Enum
+from itertools import accumulate
+from typing import List, Set
+
+from pydantic import BaseModel
+
+NOQA_MARKER = "noqa"
+
+
+class LineKind(str, Enum):
+    ADDED = "+"
+    REMOVED = "-"
+    CONTEXT = " "
+    MARKER = "\\"
+
+
+LINE_KINDS_BY_PREFIX = {line_kind.value: line_kind for line_kind in LineKind}
+
+
+def get_line_kinds(diff_lines: List[str], is_diff: bool = True) -> List[LineKind]:
+    if not is_diff:
+        return [LineKind.CONTEXT] * len(diff_lines)
+    return [LINE_KINDS_BY_PREFIX.get(line[:1], LineKind.CONTEXT) for line in diff_lines]
+
+
+class DiffLineIndex(BaseModel):
+    diff: str
+    line_offsets: List[int]
+    line_kinds: List[LineKind]
+    noqa_line_numbers: Set[int]
+    old_file_positions: List[int]
+    new_file_positions: List[int]
+
+    @staticmethod
+    def from_diff(diff: str, is_diff: bool = True) -> "DiffLineIndex":
+        diff_lines = diff.splitlines()
+        line_kinds = get_line_kinds(diff_lines, is_diff)
+        old_file_positions = list(accumulate(
+            (kind in (LineKind.REMOVED, LineKind.CONTEXT) for kind in line_kinds), initial=0))
+        new_file_positions = list(accumulate(
+            (kind in (LineKind.ADDED, LineKind.CONTEXT) for kind in line_kinds), initial=0))
+        return DiffLineIndex(
+            diff=diff,
+            line_offsets=list(accumulate(map(len, diff.splitlines(keepends=True)), initial=0)),
+            line_kinds=line_kinds,
+            noqa_line_numbers={line_number for line_number, line in enumerate(diff_lines) if NOQA_MARKER in line},
+            old_file_positions=old_file_positions[:-1],
+            new_file_positions=new_file_positions[:-1]
+        )
+
+    @property
+    def lines_count(self) -> int:
+        return len(self.line_kinds)
+
+    def has_line(self, line_number: int) -> bool:
+        return 0 <= line_number < self.lines_count
+
+    def get_line(self, line_number: int) -> str:
+        line = self.diff[self.line_offsets[line_number]:self.line_offsets[line_number + 1]]
+        return line.splitlines()[0] if line else line
+
+    def is_added(self, line_number: int) -> bool:
+        return self.has_line(line_number) and self.line_kinds[line_number] == LineKind.ADDED
+
+    def is_removed(self, line_number: int) -> bool:
+        return self.has_line(line_number) and self.line_kinds[line_number] == LineKind.REMOVED
+
+    def has_noqa(self, line_number: int) -> bool:
+        return line_number in self.noqa_line_numbers
+
+    def get_new_file_line_number(self, line_number: int) -> int:
+        if not self.has_line(line_number):
+            return line_number
+        return self.new_file_positions[line_number]
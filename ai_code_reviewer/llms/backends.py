@@ -0,0 +1,99 @@
+import os
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+LOCAL_ENDPOINT_API_KEY = "EMPTY"
+LOCAL_ENDPOINT_API_KEY_ENV_VAR = "LOCAL_LLM_API_KEY"
+DEFAULT_AZURE_API_VERSION = "2024-02-01"
+
+
+class LlmSettings(BaseModel):
+    backend: str
+    model_name: str
+    temperature: float = 0.0
+    max_retries: int = 2
+    base_url: Optional[str] = None
+    azure_api_version: str = DEFAULT_AZURE_API_VERSION
+    fake_latency_seconds: float = 0.0
+    fake_failure_rate: float = 0.0
+    fake_comments_per_review: int = 1
+
+
+LlmBuilder = Callable[[LlmSettings], Any]
+
+
+class LlmBackend(BaseModel):
+    build: LlmBuilder
+    api_key_env_var: Optional[str] = None
+
+
+LLM_BACKENDS: Dict[str, LlmBackend] = {}
+
+
+def register_llm_backend(name: str, api_key_env_var: Optional[str] = None):
+    def register(build: LlmBuilder) -> LlmBuilder:
+        LLM_BACKENDS[name] = LlmBackend(build=build, api_key_env_var=api_key_env_var)
+        return build
+    return register
+
+
+@register_llm_backend("openai", api_key_env_var="OPENAI_API_KEY")
+def build_openai_llm(settings: LlmSettings) -> "BaseChatModel":
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model_name=settings.model_name,
+        temperature=settings.temperature,
+        max_retries=settings.max_retries,
+        base_url=settings.base_url
+    )
+
+
+@register_llm_backend("azure", api_key_env_var="AZURE_OPENAI_API_KEY")
+def build_azure_llm(settings: LlmSettings) -> "BaseChatModel":
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
+        azure_deployment=settings.model_name,
+        api_version=settings.azure_api_version,
+        azure_endpoint=settings.base_url,
+        temperature=settings.temperature,
+        max_retries=settings.max_retries
+    )
+
+
+@register_llm_backend("local")
+def build_local_llm(settings: LlmSettings) -> "BaseChatModel":
+    from langchain_openai import ChatOpenAI
+
+    if settings.base_url is None:
+        raise ValueError("Local LLM backend requires base url of OpenAI-compatible endpoint")
+    return ChatOpenAI(
+        model_name=settings.model_name,
+        temperature=settings.temperature,
+        max_retries=settings.max_retries,
+        base_url=settings.base_url,
+        api_key=os.environ.get(LOCAL_ENDPOINT_API_KEY_ENV_VAR, LOCAL_ENDPOINT_API_KEY)
+    )
+
+
+@register_llm_backend("fake")
+def build_fake_llm(settings: LlmSettings) -> "BaseChatModel":
+    from ai_code_reviewer.llms.fake import FakeReviewChatModel
+
+    return FakeReviewChatModel(
+        model_name=settings.model_name,
+        latency_seconds=settings.fake_latency_seconds,
+        failure_rate=settings.fake_failure_rate,
+        comments_per_review=settings.fake_comments_per_review
+    )
+
+
+def build_llm(settings: LlmSettings) -> "BaseChatModel":
+    if settings.backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend {settings.backend}, available: {', '.join(LLM_BACKENDS)}")
+    return LLM_BACKENDS[settings.backend].build(settings)
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+
+from ai_code_reviewer.tokens import estimate_tokens
+
+ENUMERATED_LINE_PATTERN = re.compile(r"^(\d+): ", re.MULTILINE)
+PRINCIPLE_NAME_PATTERN = re.compile(r"^# Principle: (.+)$", re.MULTILINE)
+PRINCIPLE_NAME_FIELD = "principle_name"
+CANDIDATE_REASON_FIELD = "reason"
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeReviewChatModel(BaseChatModel):
+    model_name: str = "fake-review-model"
+    latency_seconds: float = 0.0
+    failure_rate: float = 0.0
+    comments_per_review: int = 1
+    seed: int = 0
+    _calls_per_prompt: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-review"
+
+    def _get_random(self, prompt: str) -> random.Random:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        attempt = self._calls_per_prompt.get(prompt_hash, 0)
+        self._calls_per_prompt[prompt_hash] = attempt + 1
+        return random.Random(f"{self.seed}:{prompt_hash}:{attempt}")
+
+    def _build_comment(
+            self,
+            line_number: int,
+            principle_names: List[str],
+            is_tagged: bool,
+            is_candidate: bool
+    ) -> Dict[str, Any]:
+        if is_candidate:
+            return {"line_number": line_number, CANDIDATE_REASON_FIELD: "fake reason"}
+        comment = {
+            "line_number": line_number,
+            "comment": "fake review comment",
+            "suggestion": "fake suggestion",
+            "implementation": "fake implementation",
+            "citation_from_principle": "fake citation",
+            "how_citation_violated": "fake violation",
+            "on_the_other_hand": "fake opposition",
+            "is_violating_principle": True
+        }
+        if is_tagged:
+            comment[PRINCIPLE_NAME_FIELD] = principle_names[line_number % len(principle_names)] \
+                if principle_names else ""
+        return comment
+
+    def _build_result(self, messages: List[BaseMessage], tools: List[Dict[str, Any]]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = self._get_random(prompt)
+        if rng.random() < self.failure_rate:
+            raise FakeRateLimitError("Fake rate limit exceeded")
+        diff_message = next((message for message in reversed(messages) if isinstance(message, HumanMessage)), None)
+        diff_prompt = str(diff_message.content) if diff_message is not None else ""
+        line_numbers = [int(line_number) for line_number in ENUMERATED_LINE_PATTERN.findall(diff_prompt)]
+        review_tool = tools[-1]["function"]
+        review_tool_parameters = review_tool["parameters"]["properties"]["comments"]["items"]
+        is_tagged = PRINCIPLE_NAME_FIELD in json.dumps(review_tool_parameters)
+        is_candidate = CANDIDATE_REASON_FIELD in json.dumps(review_tool_parameters)
+        principle_names = PRINCIPLE_NAME_PATTERN.findall(prompt)
+        comments = [
+            self._build_comment(line_number, principle_names, is_tagged, is_candidate)
+            for line_number in sorted(rng.sample(line_numbers, min(self.comments_per_review, len(line_numbers))))
+        ]
+        arguments = json.dumps({"comments": comments})
+        message = AIMessage(content="", additional_kwargs={"tool_calls": [{
+            "id": f"call_{rng.getrandbits(32)}",
+            "type": "function",
+            "function": {"name": review_tool["name"], "arguments": arguments}
+        }]})
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(arguments)
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={
+                "model_name": self.model_name,
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            }
+        )
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs: Any
+    ) -> ChatResult:
+        return self._build_result(messages, kwargs.get("tools", []))
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return self._build_result(messages, kwargs.get("tools", []))
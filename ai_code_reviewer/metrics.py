@@ -0,0 +1,138 @@
+import csv
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+CSV_SUFFIX = ".csv"
+SUMMARY_TOP_COUNT = 5
+
+usage_callback_var: ContextVar[Optional[Any]] = ContextVar("ai_code_reviewer_usage_callback", default=None)
+
+
+@lru_cache(maxsize=None)
+def register_usage_callback_hook():
+    from langchain_core.tracers.context import register_configure_hook
+    register_configure_hook(usage_callback_var, True)
+
+
+@contextmanager
+def track_llm_usage() -> Iterator[Any]:
+    from langchain_community.callbacks.openai_info import OpenAICallbackHandler
+    register_usage_callback_hook()
+    usage_callback = OpenAICallbackHandler()
+    token = usage_callback_var.set(usage_callback)
+    try:
+        yield usage_callback
+    finally:
+        usage_callback_var.reset(token)
+
+
+class ReviewCallMetrics(BaseModel):
+    file_name: str
+    principle_names: List[str]
+    first_line_number: int = 0
+    latency_seconds: float
+    llm_seconds: float
+    retries: int
+    llm_requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+    error: Optional[str] = None
+
+
+class UsageSummary(BaseModel):
+    name: str
+    calls: float = 0
+    prompt_tokens: float = 0
+    completion_tokens: float = 0
+    cost: float = 0
+    llm_seconds: float = 0
+
+    def add(self, call: ReviewCallMetrics, share: float = 1.0):
+        self.calls += share
+        self.prompt_tokens += call.prompt_tokens * share
+        self.completion_tokens += call.completion_tokens * share
+        self.cost += call.cost * share
+        self.llm_seconds += call.llm_seconds * share
+
+
+def rank_usage(usage_summaries: Dict[str, UsageSummary], top_count: int) -> List[UsageSummary]:
+    return sorted(
+        usage_summaries.values(), key=lambda summary: (summary.cost, summary.prompt_tokens), reverse=True
+    )[:top_count]
+
+
+def format_usage_table(title: str, usage_summaries: List[UsageSummary]) -> str:
+    rows = [f"{title:<60} {'calls':>7} {'prompt tokens':>13} {'completion tokens':>17} {'llm, s':>8} {'cost, $':>8}"]
+    for summary in usage_summaries:
+        rows.append(f"{summary.name[-60:]:<60} {summary.calls:>7.1f} {summary.prompt_tokens:>13.0f}"
+                    f" {summary.completion_tokens:>17.0f} {summary.llm_seconds:>8.2f} {summary.cost:>8.4f}")
+    return "\n".join(rows)
+
+
+class RunMetrics(BaseModel):
+    stage_seconds: Dict[str, float] = {}
+    calls: List[ReviewCallMetrics] = []
+    triage_skipped_calls: int = 0
+    triage_saved_prompt_tokens: int = 0
+
+    @contextmanager
+    def stage(self, stage_name: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[stage_name] = \
+                self.stage_seconds.get(stage_name, 0.0) + time.perf_counter() - start_time
+
+    def add_call(self, call: ReviewCallMetrics):
+        self.calls.append(call)
+
+    def add_skipped_call(self, saved_prompt_tokens: int):
+        self.triage_skipped_calls += 1
+        self.triage_saved_prompt_tokens += saved_prompt_tokens
+
+    def format_triage_summary(self) -> str:
+        total_calls = len(self.calls) + self.triage_skipped_calls
+        return f"Triage skipped {self.triage_skipped_calls} of {total_calls} review calls," \
+               f" saving ~{self.triage_saved_prompt_tokens} prompt tokens"
+
+    def get_principles_usage(self) -> Dict[str, UsageSummary]:
+        principles_usage: Dict[str, UsageSummary] = {}
+        for call in self.calls:
+            for principle_name in call.principle_names:
+                principles_usage.setdefault(principle_name, UsageSummary(name=principle_name)).add(
+                    call, share=1 / len(call.principle_names))
+        return principles_usage
+
+    def get_files_usage(self) -> Dict[str, UsageSummary]:
+        files_usage: Dict[str, UsageSummary] = {}
+        for call in self.calls:
+            files_usage.setdefault(call.file_name, UsageSummary(name=call.file_name)).add(call)
+        return files_usage
+
+    def format_summary(self, top_count: int = SUMMARY_TOP_COUNT) -> str:
+        stages = ", ".join(f"{stage_name}: {seconds:.2f}s" for stage_name, seconds in self.stage_seconds.items())
+        return "\n\n".join([
+            f"Stages: {stages}",
+            self.format_triage_summary(),
+            format_usage_table("Most expensive principles", rank_usage(self.get_principles_usage(), top_count)),
+            format_usage_table("Most expensive files", rank_usage(self.get_files_usage(), top_count))
+        ])
+
+    def save(self, metrics_path: Path):
+        metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        if metrics_path.suffix != CSV_SUFFIX:
+            metrics_path.write_text(self.model_dump_json(indent=2), encoding="utf-8")
+            return
+        with open(metrics_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=list(ReviewCallMetrics.model_fields))
+            writer.writeheader()
+            for call in self.calls:
+                writer.writerow(dict(call.model_dump(), principle_names=";".join(call.principle_names)))
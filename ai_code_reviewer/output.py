@@ -0,0 +1,155 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, TextIO, Tuple
+
+from ai_code_reviewer.review import FileDiffComment
+from ai_code_reviewer.run_review import FileDiffReview
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_VERSION = "2.1.0"
+TOOL_NAME = "ai_code_reviewer"
+TOOL_INFORMATION_URI = "https://github.com/dimitree54/ai_code_reviewer"
+GITHUB_MESSAGE_ESCAPES = (("%", "%25"), ("\r", "%0D"), ("\n", "%0A"))
+GITHUB_PROPERTY_ESCAPES = GITHUB_MESSAGE_ESCAPES + ((":", "%3A"), (",", "%2C"))
+
+
+class OutputFormat(str, Enum):
+    TEXT = "text"
+    JSONL = "jsonl"
+    SARIF = "sarif"
+    GITHUB = "github"
+
+
+def format_report(file_name: str, reviewer_name: str, review: FileDiffComment) -> str:
+    return f"""./{file_name}:{review.line_number + 1}: {reviewer_name} warning:
+what is violated: {review.citation_from_principle}
+how it is violated: {review.how_citation_violated}
+comment: {review.comment}
+suggested fix: {review.suggestion}
+suggestion implementation:
+```
+{review.implementation}
+```
+
+"""
+
+
+def format_comment_message(comment: FileDiffComment) -> str:
+    return f"{comment.comment}\nWhat is violated: {comment.citation_from_principle}" \
+           f"\nSuggested fix: {comment.suggestion}"
+
+
+def escape_github_value(value: str, escapes: Tuple[Tuple[str, str], ...]) -> str:
+    for character, escaped_character in escapes:
+        value = value.replace(character, escaped_character)
+    return value
+
+
+def format_github_annotation(file_name: str, reviewer_name: str, comment: FileDiffComment) -> str:
+    properties = ",".join(
+        f"{key}={escape_github_value(str(value), GITHUB_PROPERTY_ESCAPES)}"
+        for key, value in (("file", file_name), ("line", comment.line_number + 1), ("title", reviewer_name))
+    )
+    return f"::warning {properties}::{escape_github_value(format_comment_message(comment), GITHUB_MESSAGE_ESCAPES)}\n"
+
+
+def get_artifact_uri(file_name: str) -> str:
+    file_path = Path(file_name)
+    return file_path.as_uri() if file_path.is_absolute() else file_path.as_posix()
+
+
+class ReviewWriter(ABC):
+    @abstractmethod
+    def write(self, review: FileDiffReview):
+        pass
+
+    def close(self):
+        pass
+
+
+class TextReviewWriter(ReviewWriter):
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def write(self, review: FileDiffReview):
+        if len(review.comments) == 0:
+            return
+        self.logger.warning("\n".join(
+            format_report(review.file_name, review.author.name, comment) for comment in review.comments))
+
+
+class StreamReviewWriter(ReviewWriter, ABC):
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    @abstractmethod
+    def format_comment(self, file_name: str, reviewer_name: str, comment: FileDiffComment) -> str:
+        pass
+
+    def write(self, review: FileDiffReview):
+        if len(review.comments) == 0:
+            return
+        self.stream.write("".join(
+            self.format_comment(review.file_name, review.author.name, comment) for comment in review.comments))
+        self.stream.flush()
+
+
+class JsonlReviewWriter(StreamReviewWriter):
+    def format_comment(self, file_name: str, reviewer_name: str, comment: FileDiffComment) -> str:
+        return json.dumps(dict(
+            comment.model_dump(), line_number=comment.line_number + 1, file_name=file_name,
+            principle_name=reviewer_name
+        )) + "\n"
+
+
+class GithubReviewWriter(StreamReviewWriter):
+    def format_comment(self, file_name: str, reviewer_name: str, comment: FileDiffComment) -> str:
+        return format_github_annotation(file_name, reviewer_name, comment)
+
+
+class SarifReviewWriter(ReviewWriter):
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.rule_ids: Dict[str, None] = {}
+        self.results: List[Dict[str, Any]] = []
+
+    def write(self, review: FileDiffReview):
+        for comment in review.comments:
+            self.rule_ids.setdefault(review.author.name)
+            self.results.append({
+                "ruleId": review.author.name,
+                "level": "warning",
+                "message": {"text": format_comment_message(comment)},
+                "locations": [{"physicalLocation": {
+                    "artifactLocation": {"uri": get_artifact_uri(review.file_name)},
+                    "region": {"startLine": comment.line_number + 1}
+                }}]
+            })
+
+    def close(self):
+        self.stream.write(json.dumps({
+            "$schema": SARIF_SCHEMA,
+            "version": SARIF_VERSION,
+            "runs": [{
+                "tool": {"driver": {
+                    "name": TOOL_NAME,
+                    "informationUri": TOOL_INFORMATION_URI,
+                    "rules": [{"id": rule_id, "name": rule_id} for rule_id in self.rule_ids]
+                }},
+                "results": self.results
+            }]
+        }, indent=2) + "\n")
+        self.stream.flush()
+
+
+def build_review_writer(output_format: OutputFormat, stream: TextIO, logger: logging.Logger) -> ReviewWriter:
+    if output_format == OutputFormat.JSONL:
+        return JsonlReviewWriter(stream)
+    if output_format == OutputFormat.SARIF:
+        return SarifReviewWriter(stream)
+    if output_format == OutputFormat.GITHUB:
+        return GithubReviewWriter(stream)
+    return TextReviewWriter(logger)
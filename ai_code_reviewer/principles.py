@@ -0,0 +1,150 @@
+import ast
+import hashlib
+from enum import Enum
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+from pydantic import BaseModel, Field, ValidationError
+
+from ai_code_reviewer.tokens import estimate_tokens
+
+PRINCIPLE_FILE_SUFFIX = ".yaml"
+PRINCIPLES_BUNDLE_VERSION = 1
+REVIEW_SETTINGS_FIELD_NAMES = {"file_globs", "keywords", "node_types", "priority"}
+
+
+class PrinciplePriority(str, Enum):
+    LOW = "low"
+    NORMAL = "normal"
+    HIGH = "high"
+
+
+class ProgrammingPrinciple(BaseModel):
+    name: str = Field(alias="principle_name")
+    description: str = Field(alias="principle_description")
+    review_required_examples: str
+    review_not_required_examples: str
+    file_globs: Optional[List[str]] = None
+    keywords: Optional[List[str]] = None
+    node_types: Optional[List[str]] = None
+    priority: PrinciplePriority = PrinciplePriority.NORMAL
+
+    def dump_review_fields(self) -> Dict:
+        return self.model_dump(exclude=REVIEW_SETTINGS_FIELD_NAMES)
+
+    @cached_property
+    def rendered(self) -> str:
+        return f"""# Principle: {self.name}
+{self.description}
+## Examples when review is required:
+{self.review_required_examples}
+## Examples when review is not required:
+{self.review_not_required_examples}
+"""
+
+    @cached_property
+    def rendered_tokens(self) -> int:
+        return estimate_tokens(self.rendered)
+
+
+class CompiledPrinciple(BaseModel):
+    path: str
+    mtime_ns: int
+    size: int
+    content_hash: str
+    principle: ProgrammingPrinciple
+
+
+class PrinciplesBundle(BaseModel):
+    version: int = PRINCIPLES_BUNDLE_VERSION
+    principles: List[CompiledPrinciple] = []
+
+    @staticmethod
+    def load(bundle_path: Path) -> Optional["PrinciplesBundle"]:
+        try:
+            bundle = PrinciplesBundle.model_validate_json(bundle_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return bundle if bundle.version == PRINCIPLES_BUNDLE_VERSION else None
+
+    def save(self, bundle_path: Path):
+        bundle_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = bundle_path.with_suffix(".tmp")
+        temporary_path.write_text(self.model_dump_json(by_alias=True), encoding="utf-8")
+        temporary_path.replace(bundle_path)
+
+
+class PrincipleValidationError(ValueError):
+    def __init__(self, errors: Dict[str, str]):
+        self.errors = errors
+        super().__init__("Invalid review principles:\n" + "\n".join(
+            f"{path}: {error}" for path, error in errors.items()))
+
+
+def list_principle_paths(principles_dir: Path) -> List[Path]:
+    if not principles_dir.is_dir():
+        return []
+    return sorted(path for path in principles_dir.iterdir() if path.suffix == PRINCIPLE_FILE_SUFFIX)
+
+
+def parse_principle(content: bytes) -> ProgrammingPrinciple:
+    try:
+        principle_dict = yaml.safe_load(content)
+    except yaml.YAMLError as error:
+        raise ValueError(f"malformed yaml: {error}")
+    if not isinstance(principle_dict, dict):
+        raise ValueError("principle file must contain a yaml mapping")
+    try:
+        principle = ProgrammingPrinciple(**principle_dict)
+    except ValidationError as error:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in details['loc'])}: {details['msg']}" for details in error.errors()))
+    unknown_node_types = [node_type for node_type in principle.node_types or [] if not hasattr(ast, node_type)]
+    if unknown_node_types:
+        raise ValueError(f"unknown node_types: {', '.join(unknown_node_types)}")
+    return principle
+
+
+def compile_principle(principle_path: Path, cached_principle: Optional[CompiledPrinciple]) -> CompiledPrinciple:
+    stat = principle_path.stat()
+    if cached_principle is not None and cached_principle.mtime_ns == stat.st_mtime_ns \
+            and cached_principle.size == stat.st_size:
+        return cached_principle
+    content = principle_path.read_bytes()
+    content_hash = hashlib.sha256(content).hexdigest()
+    principle = cached_principle.principle if cached_principle is not None \
+        and cached_principle.content_hash == content_hash else parse_principle(content)
+    return CompiledPrinciple(
+        path=str(principle_path),
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        content_hash=content_hash,
+        principle=principle
+    )
+
+
+def load_principles(principle_paths: List[Path], bundle_path: Optional[Path] = None) -> List[CompiledPrinciple]:
+    bundle = PrinciplesBundle.load(bundle_path) if bundle_path is not None else None
+    cached_principles = {} if bundle is None else {
+        compiled_principle.path: compiled_principle for compiled_principle in bundle.principles
+    }
+    compiled_principles: List[CompiledPrinciple] = []
+    errors: Dict[str, str] = {}
+    for principle_path in principle_paths:
+        try:
+            compiled_principles.append(compile_principle(principle_path, cached_principles.get(str(principle_path))))
+        except (OSError, ValueError) as error:
+            errors[str(principle_path)] = str(error)
+    principle_paths_by_name: Dict[str, str] = {}
+    for compiled_principle in compiled_principles:
+        name = compiled_principle.principle.name
+        used_by_path = principle_paths_by_name.setdefault(name, compiled_principle.path)
+        if used_by_path != compiled_principle.path:
+            errors[compiled_principle.path] = f"principle_name '{name}' is already used by {used_by_path}"
+    if errors:
+        raise PrincipleValidationError(errors)
+    if bundle_path is not None and (bundle is None or bundle.principles != compiled_principles):
+        PrinciplesBundle(principles=compiled_principles).save(bundle_path)
+    return compiled_principles
@@ -0,0 +1,20 @@
+from enum import Enum
+
+PRINCIPLE_CHECKING_PROMPT_NAME = "code_review_principle"
+REASONING_PROMPT_NAME = "introduce_thought_tool"
+BATCHED_PRINCIPLES_PROMPT_NAME = "batched_principles"
+CANDIDATE_PROMPT_NAME = "candidate_principle"
+VERIFICATION_PROMPT_NAME = "verify_candidate"
+PROJECT_CONTEXT_PROMPT_NAME = "project_context"
+PRINCIPLE_CHECKING_HUB_PROMPT_NAME = "dimitree54/code_review_single_responsibility"
+REASONING_HUB_PROMPT_NAME = "dimitree54/introduce_thought_tool"
+
+
+class PromptSource(str, Enum):
+    LOCAL = "local"
+    HUB = "hub"
+
+
+class ReviewMode(str, Enum):
+    SINGLE_PASS = "single_pass"
+    TWO_STAGE = "two_stage"
@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import Optional
+
+import yaml
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from ai_code_reviewer.prompts import PROJECT_CONTEXT_PROMPT_NAME, PromptSource
+
+PROMPTS_DIR = Path(__file__).parent
+PLACEHOLDER_ROLE = "placeholder"
+HUB_PROMPT_VERSION_SEPARATOR = ":"
+
+
+def load_local_prompt(prompt_name: str) -> ChatPromptTemplate:
+    with open(PROMPTS_DIR / f"{prompt_name}.yaml", "r") as file:
+        prompt_dict = yaml.safe_load(file)
+    messages = [
+        MessagesPlaceholder(variable_name=message["variable_name"]) if message["role"] == PLACEHOLDER_ROLE
+        else (message["role"], message["template"])
+        for message in prompt_dict["messages"]
+    ]
+    return ChatPromptTemplate.from_messages(messages)
+
+
+def get_hub_prompt_cache_path(hub_prompt_name: str, cache_dir: Path) -> Path:
+    return cache_dir / "prompts" / f"{hub_prompt_name.replace('/', '__').replace(':', '@')}.json"
+
+
+def pull_hub_prompt(hub_prompt_name: str, cache_dir: Optional[Path] = None) -> ChatPromptTemplate:
+    from langchain import hub
+    from langchain_core.load import dumps, loads
+
+    is_version_pinned = HUB_PROMPT_VERSION_SEPARATOR in hub_prompt_name
+    cache_path = get_hub_prompt_cache_path(hub_prompt_name, cache_dir) if cache_dir is not None else None
+    if is_version_pinned and cache_path is not None and cache_path.is_file():
+        return loads(cache_path.read_text(encoding="utf-8"))
+    prompt = hub.pull(hub_prompt_name)
+    if is_version_pinned and cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(dumps(prompt), encoding="utf-8")
+    return prompt
+
+
+def load_prompt(
+        prompt_source: PromptSource,
+        local_prompt_name: str,
+        hub_prompt_name: Optional[str] = None,
+        cache_dir: Optional[Path] = None
+) -> ChatPromptTemplate:
+    if prompt_source == PromptSource.HUB and hub_prompt_name is not None:
+        return pull_hub_prompt(hub_prompt_name, cache_dir)
+    return load_local_prompt(local_prompt_name)
+
+
+def with_project_context(prompt: ChatPromptTemplate, project_context_tokens: int = 0) -> ChatPromptTemplate:
+    if project_context_tokens <= 0:
+        return prompt
+    context_prompt = load_local_prompt(PROJECT_CONTEXT_PROMPT_NAME)
+    return ChatPromptTemplate.from_messages([*prompt.messages[:-1], *context_prompt.messages, prompt.messages[-1]])
+
+
+def get_prompt_text(prompt: ChatPromptTemplate) -> str:
+    return "\n".join(
+        message.prompt.template for message in prompt.messages if hasattr(message, "prompt")
+    )
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import AsyncIterator, Deque, Iterator, List, Optional, Set, Tuple, TypeVar
+
+DEFAULT_MAX_FILE_SIZE_BYTES = 1024 * 1024
+DEFAULT_SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+READ_AHEAD_PER_WORKER = 4
+BINARY_SNIFF_BYTES = 8192
+IGNORED_DIR_NAMES = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".tox", "build", "dist"}
+
+T = TypeVar("T")
+
+
+def list_git_files(repo_path: Path) -> Optional[List[Path]]:
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(repo_path), "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return [repo_path / os.fsdecode(file_name) for file_name in result.stdout.split(b"\0") if file_name]
+
+
+def walk_files(repo_path: Path) -> Iterator[Path]:
+    for dir_path, dir_names, file_names in os.walk(repo_path):
+        dir_names[:] = [dir_name for dir_name in dir_names if dir_name not in IGNORED_DIR_NAMES]
+        for file_name in file_names:
+            yield Path(dir_path) / file_name
+
+
+def list_repo_files(repo_path: Path) -> Iterator[Path]:
+    git_files = list_git_files(repo_path)
+    return iter(git_files) if git_files is not None else walk_files(repo_path)
+
+
+def read_text_file(file_path: Path, max_file_size_bytes: int) -> Optional[str]:
+    try:
+        if file_path.stat().st_size > max_file_size_bytes:
+            return None
+        content = file_path.read_bytes()
+    except OSError:
+        return None
+    if b"\0" in content[:BINARY_SNIFF_BYTES]:
+        return None
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def pop_read_file(pending_reads: Deque[Tuple[Path, Future]]) -> Iterator[Tuple[str, str]]:
+    file_path, read_future = pending_reads.popleft()
+    content = read_future.result()
+    if content is not None:
+        yield str(file_path.absolute()), content
+
+
+def iterate_repo_files(
+        repo_path: Path,
+        allowed_extensions: Set[str],
+        max_file_size_bytes: int = DEFAULT_MAX_FILE_SIZE_BYTES,
+        max_workers: int = DEFAULT_SCAN_WORKERS
+) -> Iterator[Tuple[str, str]]:
+    file_paths = (file_path for file_path in list_repo_files(repo_path) if file_path.suffix in allowed_extensions)
+    pending_reads: Deque[Tuple[Path, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for file_path in file_paths:
+            pending_reads.append((file_path, executor.submit(read_text_file, file_path, max_file_size_bytes)))
+            if len(pending_reads) >= max_workers * READ_AHEAD_PER_WORKER:
+                yield from pop_read_file(pending_reads)
+        while pending_reads:
+            yield from pop_read_file(pending_reads)
+
+
+async def iterate_in_thread(iterator: Iterator[T]) -> AsyncIterator[T]:
+    exhausted = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, exhausted)
+        if item is exhausted:
+            return
+        yield item
@@ -20,3 +20,20 @@ class FileDiffComment(BaseModel):
 
 class FileDiffComments(BaseModel):
     comments: List[FileDiffComment]
+
+
+class PrincipleFileDiffComment(FileDiffComment):
+    principle_name: str = Field(description="exact name of the principle this comment is about")
+
+
+class PrincipleFileDiffComments(FileDiffComments):
+    comments: List[PrincipleFileDiffComment]
+
+
+class CandidateComment(BaseModel):
+    line_number: int
+    reason: str = Field(description="one short sentence, why this line may violate the principle")
+
+
+class CandidateComments(BaseModel):
+    comments: List[CandidateComment]
@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
+from typing import List, Optional
 
 from pydantic import BaseModel as BaseModelV2
 
 from ai_code_reviewer.review import FileDiffComments
+from ai_code_reviewer.tokens import count_tokens
 
 
 class Reviewer(BaseModelV2, ABC):
@@ -13,3 +15,48 @@ class Reviewer(BaseModelV2, ABC):
 
     async def review_file_diff(self, diff: str) -> FileDiffComments:
         pass
+
+    async def review_diff_window(
+            self,
+            diff: str,
+            first_line_number: int = 0,
+            project_context: str = ""
+    ) -> FileDiffComments:
+        review = await self.review_file_diff(diff)
+        if first_line_number == 0:
+            return review
+        return review.model_copy(update={"comments": [
+            comment.model_copy(update={"line_number": comment.line_number + first_line_number})
+            for comment in review.comments
+        ]})
+
+    def is_relevant(self, file_name: str, diff: str, is_diff: bool = True) -> bool:
+        return True
+
+    def get_route(self, diff: str) -> Optional[str]:
+        return None
+
+    def render_prompt(self, diff: str, first_line_number: int = 0, project_context: str = "") -> str:
+        return diff
+
+    def count_prompt_tokens(
+            self,
+            diff: str,
+            first_line_number: int = 0,
+            model_name: Optional[str] = None,
+            project_context: str = ""
+    ) -> int:
+        return count_tokens(self.render_prompt(diff, first_line_number, project_context), model_name)
+
+    @property
+    def authors(self) -> List["Reviewer"]:
+        return [self]
+
+    def split_comments(self, comments: FileDiffComments) -> List[FileDiffComments]:
+        return [comments]
+
+
+class ReviewerBatcher(BaseModelV2, ABC):
+    @abstractmethod
+    def batch(self, reviewers: List[Reviewer], diff: str) -> List[Reviewer]:
+        pass
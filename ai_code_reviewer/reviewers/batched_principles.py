@@ -0,0 +1,159 @@
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable
+
+from ai_code_reviewer.cache import ReviewCache, hash_cache_key
+from ai_code_reviewer.review import FileDiffComments, FileDiffComment, PrincipleFileDiffComments
+from ai_code_reviewer.reviewers.base import Reviewer, ReviewerBatcher
+from ai_code_reviewer.reviewers.routing import ReviewRouter
+from ai_code_reviewer.reviewers.programming_principle import ProgrammingPrincipleReviewer, render_chain_prompt
+from ai_code_reviewer.scheduler import FAST_ROUTE
+from ai_code_reviewer.tokens import estimate_tokens
+from ai_code_reviewer.utils import add_line_numbers
+
+
+def normalize_principle_name(principle_name: str) -> str:
+    return principle_name.strip().lower()
+
+
+class BatchedPrinciplesReviewer(Reviewer):
+    principle_reviewers: List[ProgrammingPrincipleReviewer]
+    diff_review_chain: Runnable
+    review_cache: Optional[ReviewCache] = None
+    cache_namespace: str = ""
+    review_router: Optional[ReviewRouter] = None
+
+    @property
+    def name(self) -> str:
+        return ", ".join(reviewer.name for reviewer in self.principle_reviewers)
+
+    @property
+    def authors(self) -> List[Reviewer]:
+        return list(self.principle_reviewers)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_cache_key(
+            self,
+            enumerated_diff: str,
+            cache_namespace: Optional[str] = None,
+            project_context: str = ""
+    ) -> str:
+        context_key_parts = {"project_context": project_context} if project_context else {}
+        return hash_cache_key(
+            namespace=self.cache_namespace if cache_namespace is None else cache_namespace,
+            principles=[reviewer.programming_principle.dump_review_fields() for reviewer in self.principle_reviewers],
+            enumerated_diff=enumerated_diff,
+            **context_key_parts
+        )
+
+    def _get_chain_input(self, enumerated_diff: str, project_context: str = "") -> Dict[str, str]:
+        return {
+            "enumerated_diff": enumerated_diff,
+            "project_context": project_context,
+            "principles": "\n".join(
+                reviewer.programming_principle.rendered for reviewer in self.principle_reviewers)
+        }
+
+    def get_route(self, diff: str) -> Optional[str]:
+        if self.review_router is None:
+            return None
+        return self.review_router.select_route(
+            diff, [reviewer.programming_principle.priority for reviewer in self.principle_reviewers])
+
+    def _get_routed_chain(self, diff: str) -> Tuple[Runnable, str]:
+        if self.get_route(diff) == FAST_ROUTE:
+            return self.review_router.fast_batched_diff_review_chain, self.review_router.fast_cache_namespace
+        return self.diff_review_chain, self.cache_namespace
+
+    def render_prompt(self, diff: str, first_line_number: int = 0, project_context: str = "") -> str:
+        enumerated_diff = add_line_numbers(diff, first_line_number)
+        return render_chain_prompt(self.diff_review_chain, self._get_chain_input(enumerated_diff, project_context))
+
+    async def review_file_diff(self, diff: str) -> FileDiffComments:
+        return await self.review_diff_window(diff)
+
+    async def review_diff_window(
+            self,
+            diff: str,
+            first_line_number: int = 0,
+            project_context: str = ""
+    ) -> FileDiffComments:
+        if len(diff) == 0:
+            return PrincipleFileDiffComments(comments=[])
+        enumerated_diff = add_line_numbers(diff, first_line_number)
+        diff_review_chain, cache_namespace = self._get_routed_chain(diff)
+        cache_key = None
+        if self.review_cache is not None:
+            cache_key = self._get_cache_key(enumerated_diff, cache_namespace, project_context)
+            cached_review = self.review_cache.get(cache_key, PrincipleFileDiffComments)
+            if cached_review is not None:
+                return cached_review
+        review: PrincipleFileDiffComments = await diff_review_chain.ainvoke(
+            input=self._get_chain_input(enumerated_diff, project_context)
+        )
+        if cache_key is not None:
+            self.review_cache.put(cache_key, review)
+        return review
+
+    def split_comments(self, comments: FileDiffComments) -> List[FileDiffComments]:
+        per_principle_comments = {
+            normalize_principle_name(reviewer.name): [] for reviewer in self.principle_reviewers
+        }
+        for comment in comments.comments:
+            principle_comments = per_principle_comments.get(normalize_principle_name(comment.principle_name))
+            if principle_comments is not None:
+                principle_comments.append(FileDiffComment(**comment.model_dump(exclude={"principle_name"})))
+        return [
+            FileDiffComments(comments=per_principle_comments[normalize_principle_name(reviewer.name)])
+            for reviewer in self.principle_reviewers
+        ]
+
+
+class PrincipleBatcher(ReviewerBatcher):
+    diff_review_chain: Runnable
+    max_principles_per_call: int
+    max_prompt_tokens: int
+    prompt_overhead_tokens: int = 0
+    review_cache: Optional[ReviewCache] = None
+    cache_namespace: str = ""
+    review_router: Optional[ReviewRouter] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_principles_tokens_budget(self, diff: str) -> int:
+        return self.max_prompt_tokens - self.prompt_overhead_tokens - estimate_tokens(add_line_numbers(diff))
+
+    def _build_reviewer(self, principle_reviewers: List[ProgrammingPrincipleReviewer]) -> Reviewer:
+        if len(principle_reviewers) == 1:
+            return principle_reviewers[0]
+        return BatchedPrinciplesReviewer(
+            principle_reviewers=principle_reviewers,
+            diff_review_chain=self.diff_review_chain,
+            review_cache=self.review_cache,
+            cache_namespace=self.cache_namespace,
+            review_router=self.review_router
+        )
+
+    def batch(self, reviewers: List[Reviewer], diff: str) -> List[Reviewer]:
+        principles_tokens_budget = self._get_principles_tokens_budget(diff)
+        batched_reviewers: List[Reviewer] = []
+        current_batch: List[ProgrammingPrincipleReviewer] = []
+        current_batch_tokens = 0
+        for reviewer in reviewers:
+            if not isinstance(reviewer, ProgrammingPrincipleReviewer):
+                batched_reviewers.append(reviewer)
+                continue
+            principle_tokens = reviewer.programming_principle.rendered_tokens
+            batch_is_full = len(current_batch) >= self.max_principles_per_call
+            batch_overflows = current_batch_tokens + principle_tokens > principles_tokens_budget
+            if current_batch and (batch_is_full or batch_overflows):
+                batched_reviewers.append(self._build_reviewer(current_batch))
+                current_batch, current_batch_tokens = [], 0
+            current_batch.append(reviewer)
+            current_batch_tokens += principle_tokens
+        if current_batch:
+            batched_reviewers.append(self._build_reviewer(current_batch))
+        return batched_reviewers
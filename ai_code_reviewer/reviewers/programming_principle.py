@@ -1,21 +1,38 @@
+from typing import Dict, Optional, Tuple
+
+from langchain_core.prompts import BasePromptTemplate
 from langchain_core.runnables import Runnable
-from pydantic import BaseModel as BaseModelV2, Field
+from pydantic import PrivateAttr
 
+from ai_code_reviewer.cache import ReviewCache, hash_cache_key
+from ai_code_reviewer.principles import ProgrammingPrinciple
 from ai_code_reviewer.review import FileDiffComments
 from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.reviewers.routing import ReviewRouter
+from ai_code_reviewer.scheduler import FAST_ROUTE
+from ai_code_reviewer.tokens import count_tokens
+from ai_code_reviewer.triage import is_diff_relevant
 from ai_code_reviewer.utils import add_line_numbers
 
+PROMPT_DIFF_PLACEHOLDER = "\0enumerated_diff\0"
+PROMPT_CONTEXT_PLACEHOLDER = "\0project_context\0"
+
 
-class ProgrammingPrinciple(BaseModelV2):
-    name: str = Field(alias="principle_name")
-    description: str = Field(alias="principle_description")
-    review_required_examples: str
-    review_not_required_examples: str
+def render_chain_prompt(diff_review_chain: Runnable, chain_input: Dict[str, str]) -> str:
+    prompt = getattr(diff_review_chain, "first", diff_review_chain)
+    if isinstance(prompt, BasePromptTemplate):
+        return prompt.format(**chain_input)
+    return "\n".join(chain_input.values())
 
 
 class ProgrammingPrincipleReviewer(Reviewer):
     programming_principle: ProgrammingPrinciple
     diff_review_chain: Runnable
+    review_cache: Optional[ReviewCache] = None
+    cache_namespace: str = ""
+    review_router: Optional[ReviewRouter] = None
+    _prompt_template: Optional[str] = PrivateAttr(default=None)
+    _prompt_template_tokens: Dict[Optional[str], int] = PrivateAttr(default_factory=dict)
 
     @property
     def name(self) -> str:
@@ -24,17 +41,100 @@ class ProgrammingPrincipleReviewer(Reviewer):
     class Config:
         arbitrary_types_allowed = True
 
+    def _get_cache_key(
+            self,
+            enumerated_diff: str,
+            cache_namespace: Optional[str] = None,
+            project_context: str = ""
+    ) -> str:
+        context_key_parts = {"project_context": project_context} if project_context else {}
+        return hash_cache_key(
+            namespace=self.cache_namespace if cache_namespace is None else cache_namespace,
+            principle=self.programming_principle.dump_review_fields(),
+            enumerated_diff=enumerated_diff,
+            **context_key_parts
+        )
+
+    def _get_chain_input(self, enumerated_diff: str, project_context: str = "") -> Dict[str, str]:
+        return {
+            "enumerated_diff": enumerated_diff,
+            "project_context": project_context,
+            "principle_name": self.programming_principle.name,
+            "principle_description": self.programming_principle.description,
+            "review_required_examples": self.programming_principle.review_required_examples,
+            "review_not_required_examples": self.programming_principle.review_not_required_examples
+        }
+
+    def is_relevant(self, file_name: str, diff: str, is_diff: bool = True) -> bool:
+        return is_diff_relevant(
+            file_name,
+            diff,
+            file_globs=self.programming_principle.file_globs,
+            keywords=self.programming_principle.keywords,
+            node_types=self.programming_principle.node_types,
+            is_diff=is_diff
+        )
+
+    def get_route(self, diff: str) -> Optional[str]:
+        if self.review_router is None:
+            return None
+        return self.review_router.select_route(diff, [self.programming_principle.priority])
+
+    def _get_routed_chain(self, diff: str) -> Tuple[Runnable, str]:
+        if self.get_route(diff) == FAST_ROUTE:
+            return self.review_router.fast_diff_review_chain, self.review_router.fast_cache_namespace
+        return self.diff_review_chain, self.cache_namespace
+
+    def _get_prompt_template(self) -> str:
+        if self._prompt_template is None:
+            self._prompt_template = render_chain_prompt(
+                self.diff_review_chain, self._get_chain_input(PROMPT_DIFF_PLACEHOLDER, PROMPT_CONTEXT_PLACEHOLDER))
+        return self._prompt_template
+
+    def render_prompt(self, diff: str, first_line_number: int = 0, project_context: str = "") -> str:
+        return self._get_prompt_template() \
+            .replace(PROMPT_CONTEXT_PLACEHOLDER, project_context) \
+            .replace(PROMPT_DIFF_PLACEHOLDER, add_line_numbers(diff, first_line_number))
+
+    def count_prompt_tokens(
+            self,
+            diff: str,
+            first_line_number: int = 0,
+            model_name: Optional[str] = None,
+            project_context: str = ""
+    ) -> int:
+        prompt_template = self._get_prompt_template()
+        if model_name not in self._prompt_template_tokens:
+            self._prompt_template_tokens[model_name] = count_tokens(
+                prompt_template.replace(PROMPT_CONTEXT_PLACEHOLDER, "").replace(PROMPT_DIFF_PLACEHOLDER, ""),
+                model_name)
+        context_tokens = count_tokens(project_context, model_name) \
+            if project_context and PROMPT_CONTEXT_PLACEHOLDER in prompt_template else 0
+        enumerated_diff = add_line_numbers(diff, first_line_number)
+        return self._prompt_template_tokens[model_name] + context_tokens + count_tokens(enumerated_diff, model_name)
+
     async def review_file_diff(self, diff: str) -> FileDiffComments:
+        return await self.review_diff_window(diff)
+
+    async def review_diff_window(
+            self,
+            diff: str,
+            first_line_number: int = 0,
+            project_context: str = ""
+    ) -> FileDiffComments:
         if len(diff) == 0:
             return FileDiffComments(comments=[])
-        enumerated_diff = add_line_numbers(diff)
-        review: FileDiffComments = await self.diff_review_chain.ainvoke(
-            input={
-                "enumerated_diff": enumerated_diff,
-                "principle_name": self.programming_principle.name,
-                "principle_description": self.programming_principle.description,
-                "review_required_examples": self.programming_principle.review_required_examples,
-                "review_not_required_examples": self.programming_principle.review_not_required_examples
-            }
+        enumerated_diff = add_line_numbers(diff, first_line_number)
+        diff_review_chain, cache_namespace = self._get_routed_chain(diff)
+        cache_key = None
+        if self.review_cache is not None:
+            cache_key = self._get_cache_key(enumerated_diff, cache_namespace, project_context)
+            cached_review = self.review_cache.get(cache_key)
+            if cached_review is not None:
+                return cached_review
+        review: FileDiffComments = await diff_review_chain.ainvoke(
+            input=self._get_chain_input(enumerated_diff, project_context)
         )
+        if cache_key is not None:
+            self.review_cache.put(cache_key, review)
         return review
@@ -0,0 +1,25 @@
+from typing import List
+
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel as BaseModelV2
+
+from ai_code_reviewer.principles import PrinciplePriority
+from ai_code_reviewer.scheduler import FAST_ROUTE, STRONG_ROUTE
+from ai_code_reviewer.tokens import estimate_tokens
+
+
+class ReviewRouter(BaseModelV2):
+    fast_diff_review_chain: Runnable
+    fast_batched_diff_review_chain: Runnable
+    fast_cache_namespace: str
+    max_fast_diff_tokens: int
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def select_route(self, diff: str, priorities: List[PrinciplePriority]) -> str:
+        if PrinciplePriority.HIGH in priorities:
+            return STRONG_ROUTE
+        if all(priority == PrinciplePriority.LOW for priority in priorities):
+            return FAST_ROUTE
+        return FAST_ROUTE if estimate_tokens(diff) <= self.max_fast_diff_tokens else STRONG_ROUTE
@@ -0,0 +1,98 @@
+from functools import partial
+from typing import Dict, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from ai_code_reviewer.review import CandidateComment, CandidateComments, FileDiffComments
+from ai_code_reviewer.scheduler import SCHEDULED_JOB
+from ai_code_reviewer.tokens import estimate_tokens
+
+ENUMERATED_LINE_SEPARATOR = ": "
+
+
+def get_enumerated_line_numbers(enumerated_diff: str) -> List[int]:
+    return [int(line.split(ENUMERATED_LINE_SEPARATOR, 1)[0]) for line in enumerated_diff.splitlines()]
+
+
+def get_unique_candidates(candidates: CandidateComments, line_numbers: List[int]) -> List[CandidateComment]:
+    known_line_numbers = set(line_numbers)
+    unique_candidates: Dict[int, CandidateComment] = {}
+    for candidate in candidates.comments:
+        if candidate.line_number in known_line_numbers:
+            unique_candidates.setdefault(candidate.line_number, candidate)
+    return list(unique_candidates.values())
+
+
+class TwoStageReviewChain(Runnable[Dict[str, str], FileDiffComments]):
+    def __init__(self, candidate_review_chain: Runnable, verification_chain: Runnable, window_lines: int):
+        self.candidate_review_chain = candidate_review_chain
+        self.verification_chain = verification_chain
+        self.window_lines = window_lines
+
+    @property
+    def first(self) -> Runnable:
+        return getattr(self.candidate_review_chain, "first", self.candidate_review_chain)
+
+    def _build_verification_inputs(
+            self,
+            chain_input: Dict[str, str],
+            candidates: CandidateComments
+    ) -> List[Dict[str, str]]:
+        enumerated_lines = chain_input["enumerated_diff"].splitlines()
+        line_numbers = get_enumerated_line_numbers(chain_input["enumerated_diff"])
+        verification_inputs = []
+        for candidate in get_unique_candidates(candidates, line_numbers):
+            line_index = line_numbers.index(candidate.line_number)
+            window_start = max(0, line_index - self.window_lines)
+            verification_inputs.append({
+                **chain_input,
+                "enumerated_diff": "\n".join(enumerated_lines[window_start:line_index + self.window_lines + 1]),
+                "line_number": str(candidate.line_number),
+                "candidate_reason": candidate.reason
+            })
+        return verification_inputs
+
+    def _merge_verified(
+            self,
+            verification_inputs: List[Dict[str, str]],
+            verified_reviews: List[FileDiffComments]
+    ) -> FileDiffComments:
+        comments = []
+        for verification_input, verified_review in zip(verification_inputs, verified_reviews):
+            window_line_numbers = set(get_enumerated_line_numbers(verification_input["enumerated_diff"]))
+            comments.extend(
+                comment for comment in verified_review.comments if comment.line_number in window_line_numbers)
+        return FileDiffComments(comments=comments)
+
+    def invoke(self, input: Dict[str, str], config: Optional[RunnableConfig] = None) -> FileDiffComments:  # noqa
+        candidates: CandidateComments = self.candidate_review_chain.invoke(input, config)
+        verification_inputs = self._build_verification_inputs(input, candidates)
+        if len(verification_inputs) == 0:
+            return FileDiffComments(comments=[])
+        return self._merge_verified(verification_inputs, self.verification_chain.batch(verification_inputs, config))
+
+    async def ainvoke(
+            self,
+            input: Dict[str, str],  # noqa
+            config: Optional[RunnableConfig] = None,
+            **kwargs
+    ) -> FileDiffComments:
+        candidates: CandidateComments = await self.candidate_review_chain.ainvoke(input, config)
+        verification_inputs = self._build_verification_inputs(input, candidates)
+        if len(verification_inputs) == 0:
+            return FileDiffComments(comments=[])
+        scheduled_job = SCHEDULED_JOB.get()
+        if scheduled_job is None:
+            return self._merge_verified(
+                verification_inputs, await self.verification_chain.abatch(verification_inputs, config))
+        verified_reviews = await scheduled_job.run_nested(
+            [
+                partial(self.verification_chain.ainvoke, verification_input, config)
+                for verification_input in verification_inputs
+            ],
+            [
+                sum(estimate_tokens(value) for value in verification_input.values())
+                for verification_input in verification_inputs
+            ]
+        )
+        return self._merge_verified(verification_inputs, verified_reviews)
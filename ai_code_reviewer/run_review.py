@@ -1,47 +1,269 @@
 import asyncio
-from typing import Dict, List
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Union
 
+from pydantic import BaseModel
 from tqdm.asyncio import tqdm
 
+from ai_code_reviewer.diff_windows import DiffWindow, DiffChunker, split_diff_into_windows
+from ai_code_reviewer.metrics import RunMetrics, ReviewCallMetrics, track_llm_usage
 from ai_code_reviewer.review import FileDiffComments
-from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.reviewers.base import Reviewer, ReviewerBatcher
+from ai_code_reviewer.scheduler import ReviewScheduler
+from ai_code_reviewer.tokens import estimate_tokens
 
 
 class FileDiffReview(FileDiffComments):
     author: Reviewer
     file_name: str
+    error: Optional[str] = None
 
 
-async def run_principle_reviewer(
-        programming_principle_reviewer: Reviewer, file_name: str, file_diff: str
-) -> FileDiffReview:
+class ReviewTask(BaseModel):
+    reviewer: Reviewer
+    file_name: str
+    diff_window: DiffWindow
+    is_skipped: bool = False
+    project_context: str = ""
+
+
+def build_review_tasks(
+        per_file_diff: Dict[str, str],
+        reviewers: List[Reviewer],
+        context_lines: Optional[int] = None,
+        reviewer_batcher: Optional[ReviewerBatcher] = None,
+        diff_chunker: Optional[DiffChunker] = None,
+        reviewer_filter: Optional[Callable[[str, Reviewer], bool]] = None,
+        context_builder: Optional[Callable[[str, str], str]] = None,
+        is_diff: bool = True
+) -> List[ReviewTask]:
+    review_tasks = []
+    for file_name, file_diff in per_file_diff.items():
+        file_reviewers = reviewers if reviewer_filter is None \
+            else [reviewer for reviewer in reviewers if reviewer_filter(file_name, reviewer)]
+        if len(file_reviewers) == 0:
+            continue
+        project_context = context_builder(file_name, file_diff) if context_builder is not None else ""
+        diff_windows = split_diff_into_windows(file_diff, context_lines, is_diff)
+        if diff_chunker is not None:
+            diff_windows = [
+                chunk for diff_window in diff_windows for chunk in diff_chunker.split(diff_window, file_name)
+            ]
+        for diff_window in diff_windows:
+            relevant_reviewers, skipped_reviewers = [], []
+            for reviewer in file_reviewers:
+                if reviewer.is_relevant(file_name, diff_window.diff, is_diff=diff_window.is_diff):
+                    relevant_reviewers.append(reviewer)
+                else:
+                    skipped_reviewers.append(reviewer)
+            window_reviewers = relevant_reviewers if reviewer_batcher is None \
+                else reviewer_batcher.batch(relevant_reviewers, diff_window.diff)
+            review_tasks.extend(
+                ReviewTask(
+                    reviewer=reviewer, file_name=file_name, diff_window=diff_window, project_context=project_context)
+                for reviewer in window_reviewers
+            )
+            review_tasks.extend(
+                ReviewTask(
+                    reviewer=reviewer, file_name=file_name, diff_window=diff_window, is_skipped=True,
+                    project_context=project_context)
+                for reviewer in skipped_reviewers
+            )
+    return review_tasks
+
+
+async def run_review_task(
+        review_task: ReviewTask,
+        scheduler: ReviewScheduler,
+        metrics: Optional[RunMetrics] = None
+) -> List[FileDiffReview]:
+    if review_task.is_skipped:
+        return skip_review_task(review_task, metrics)
+    if metrics is None:
+        reviews, _ = await review_with_scheduler(review_task, scheduler)
+        return reviews
+    retries = 0
+
+    def count_retry(_: BaseException):
+        nonlocal retries
+        retries += 1
+
+    start_time = time.perf_counter()
+    with track_llm_usage() as usage:
+        reviews, llm_seconds = await review_with_scheduler(review_task, scheduler, count_retry)
+    metrics.add_call(ReviewCallMetrics(
+        file_name=review_task.file_name,
+        principle_names=[author.name for author in review_task.reviewer.authors],
+        first_line_number=review_task.diff_window.first_line_number,
+        latency_seconds=time.perf_counter() - start_time,
+        llm_seconds=llm_seconds,
+        retries=retries,
+        llm_requests=usage.successful_requests,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        cost=usage.total_cost,
+        error=reviews[0].error if reviews else None
+    ))
+    return reviews
+
+
+def skip_review_task(review_task: ReviewTask, metrics: Optional[RunMetrics] = None) -> List[FileDiffReview]:
+    if metrics is not None:
+        diff_window = review_task.diff_window
+        metrics.add_skipped_call(
+            estimate_tokens(review_task.reviewer.render_prompt(
+                diff_window.diff,
+                first_line_number=diff_window.first_line_number,
+                project_context=review_task.project_context
+            )))
+    return [
+        FileDiffReview(comments=[], author=author, file_name=review_task.file_name)
+        for author in review_task.reviewer.authors
+    ]
+
+
+async def review_with_scheduler(
+        review_task: ReviewTask,
+        scheduler: ReviewScheduler,
+        on_retry: Optional[Callable[[BaseException], None]] = None
+) -> Tuple[List[FileDiffReview], float]:
+    diff_window = review_task.diff_window
+    llm_seconds = 0.0
+
+    async def timed_review() -> FileDiffComments:
+        nonlocal llm_seconds
+        start_time = time.perf_counter()
+        try:
+            return await review_task.reviewer.review_diff_window(
+                diff_window.diff,
+                first_line_number=diff_window.first_line_number,
+                project_context=review_task.project_context
+            )
+        finally:
+            llm_seconds += time.perf_counter() - start_time
+
     try:
-        file_diff_comments = await programming_principle_reviewer.review_file_diff(file_diff)
-        review = FileDiffReview(
-            comments=file_diff_comments.comments,
-            author=programming_principle_reviewer,
-            file_name=file_name
-        )
-        return review
-    except Exception:  # noqa
-        return FileDiffReview(
-            comments=[],
-            author=programming_principle_reviewer,
-            file_name=file_name
+        file_diff_comments = await scheduler.run(
+            timed_review,
+            estimated_tokens=estimate_tokens(diff_window.diff) + estimate_tokens(review_task.project_context),
+            on_retry=on_retry,
+            route=review_task.reviewer.get_route(diff_window.diff)
         )
+        return [
+            FileDiffReview(
+                comments=[
+                    comment for comment in author_comments.comments if diff_window.owns_line(comment.line_number)
+                ],
+                author=author,
+                file_name=review_task.file_name
+            )
+            for author, author_comments in zip(
+                review_task.reviewer.authors, review_task.reviewer.split_comments(file_diff_comments))
+        ], llm_seconds
+    except Exception as error:  # noqa
+        return [
+            FileDiffReview(
+                comments=[],
+                author=author,
+                file_name=review_task.file_name,
+                error=f"{type(error).__name__}: {error}"
+            )
+            for author in review_task.reviewer.authors
+        ], llm_seconds
+
+
+def merge_reviews(reviews: List[FileDiffReview]) -> List[FileDiffReview]:
+    merged_reviews: Dict[Tuple[int, str], FileDiffReview] = {}
+    for review in reviews:
+        review_key = (id(review.author), review.file_name)
+        if review_key not in merged_reviews:
+            merged_reviews[review_key] = review
+            continue
+        merged_review = merged_reviews[review_key]
+        errors = [error for error in (merged_review.error, review.error) if error is not None]
+        merged_reviews[review_key] = merged_review.model_copy(update={
+            "comments": merged_review.comments + review.comments,
+            "error": "; ".join(errors) if errors else None
+        })
+    return list(merged_reviews.values())
 
 
 async def get_reviews(
         per_file_diff: Dict[str, str],
         reviewers: List[Reviewer],
-        report_progress: bool = True
+        report_progress: bool = True,
+        scheduler: Optional[ReviewScheduler] = None,
+        context_lines: Optional[int] = None,
+        reviewer_batcher: Optional[ReviewerBatcher] = None,
+        metrics: Optional[RunMetrics] = None,
+        diff_chunker: Optional[DiffChunker] = None,
+        reviewer_filter: Optional[Callable[[str, Reviewer], bool]] = None,
+        context_builder: Optional[Callable[[str, str], str]] = None,
+        is_diff: bool = True
 ) -> List[FileDiffReview]:
-    coroutines = []
-    for reviewer in reviewers:
-        for file_name, file_diff in per_file_diff.items():
-            coroutines.append(run_principle_reviewer(reviewer, file_name, file_diff))
+    scheduler = scheduler or ReviewScheduler()
+    review_tasks = await asyncio.to_thread(
+        build_review_tasks, per_file_diff, reviewers, context_lines, reviewer_batcher, diff_chunker, reviewer_filter,
+        context_builder, is_diff)
+    coroutines = [run_review_task(review_task, scheduler, metrics) for review_task in review_tasks]
     if report_progress:
-        per_file_reviews: List[FileDiffReview] = list(await tqdm.gather(*coroutines, desc="Review in progress"))
+        per_task_reviews: List[List[FileDiffReview]] = list(
+            await tqdm.gather(*coroutines, desc="Review in progress"))
     else:
-        per_file_reviews: List[FileDiffReview] = list(await asyncio.gather(*coroutines))
-    return per_file_reviews
+        per_task_reviews: List[List[FileDiffReview]] = list(await asyncio.gather(*coroutines))
+    return merge_reviews([review for task_reviews in per_task_reviews for review in task_reviews])
+
+
+async def iterate_file_diffs(per_file_diff: Dict[str, str]) -> AsyncIterator[Tuple[str, str]]:
+    for file_name, file_diff in per_file_diff.items():
+        yield file_name, file_diff
+
+
+async def iterate_reviews(
+        per_file_diff: Union[Dict[str, str], AsyncIterator[Tuple[str, str]]],
+        reviewers: List[Reviewer],
+        report_progress: bool = True,
+        scheduler: Optional[ReviewScheduler] = None,
+        context_lines: Optional[int] = None,
+        reviewer_batcher: Optional[ReviewerBatcher] = None,
+        metrics: Optional[RunMetrics] = None,
+        diff_chunker: Optional[DiffChunker] = None,
+        reviewer_filter: Optional[Callable[[str, Reviewer], bool]] = None,
+        context_builder: Optional[Callable[[str, str], str]] = None,
+        is_diff: bool = True
+) -> AsyncIterator[FileDiffReview]:
+    scheduler = scheduler or ReviewScheduler()
+    file_diffs = iterate_file_diffs(per_file_diff) if isinstance(per_file_diff, dict) else per_file_diff
+    next_file_diff: Optional[asyncio.Future] = asyncio.ensure_future(anext(file_diffs, None))
+    pending_tasks: Set[asyncio.Future] = set()
+    progress_bar = tqdm(total=0, desc="Review in progress", disable=not report_progress)
+    try:
+        while next_file_diff is not None or pending_tasks:
+            awaited_tasks = pending_tasks if next_file_diff is None else pending_tasks | {next_file_diff}
+            completed_tasks, _ = await asyncio.wait(awaited_tasks, return_when=asyncio.FIRST_COMPLETED)
+            if next_file_diff in completed_tasks:
+                completed_tasks.remove(next_file_diff)
+                file_diff_item = next_file_diff.result()
+                next_file_diff = None
+                if file_diff_item is not None:
+                    file_name, file_diff = file_diff_item
+                    review_tasks = await asyncio.to_thread(
+                        build_review_tasks, {file_name: file_diff}, reviewers, context_lines, reviewer_batcher,
+                        diff_chunker, reviewer_filter, context_builder, is_diff)
+                    pending_tasks.update(
+                        asyncio.ensure_future(run_review_task(review_task, scheduler, metrics))
+                        for review_task in review_tasks)
+                    progress_bar.total += len(review_tasks)
+                    progress_bar.refresh()
+                    next_file_diff = asyncio.ensure_future(anext(file_diffs, None))
+            for completed_task in completed_tasks:
+                pending_tasks.remove(completed_task)
+                progress_bar.update()
+                for review in completed_task.result():
+                    yield review
+    finally:
+        progress_bar.close()
+        cancelled_tasks = pending_tasks if next_file_diff is None else pending_tasks | {next_file_diff}
+        for pending_task in cancelled_tasks:
+            pending_task.cancel()
+        await asyncio.gather(*cancelled_tasks, return_exceptions=True)
@@ -0,0 +1,177 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from pydantic import BaseModel, PrivateAttr
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+RATE_LIMIT_WINDOW_SECONDS = 60.0
+STRONG_ROUTE = "strong"
+FAST_ROUTE = "fast"
+
+T = TypeVar("T")
+
+
+class NestedJobError(Exception):
+    pass
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    import openai
+    if isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        return False
+    return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+
+def get_retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenRateLimiter(BaseModel):
+    tokens_per_minute: int
+    _usage: Deque[Tuple[float, int]] = PrivateAttr(default_factory=deque)
+    _lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+
+    async def acquire(self, tokens: int):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._usage and now - self._usage[0][0] >= RATE_LIMIT_WINDOW_SECONDS:
+                    self._usage.popleft()
+                used_tokens = sum(usage_tokens for _, usage_tokens in self._usage)
+                if not self._usage or used_tokens + tokens <= self.tokens_per_minute:
+                    self._usage.append((now, tokens))
+                    return
+                await asyncio.sleep(self._usage[0][0] + RATE_LIMIT_WINDOW_SECONDS - now)
+
+
+class ReviewScheduler(BaseModel):
+    max_concurrency: int = 16
+    tokens_per_minute: Optional[int] = None
+    max_retries: int = 5
+    initial_backoff_seconds: float = 1.0
+    max_backoff_seconds: float = 60.0
+    route_concurrency: Dict[str, int] = {}
+    _semaphore: asyncio.Semaphore = PrivateAttr()
+    _route_semaphores: Dict[str, asyncio.Semaphore] = PrivateAttr(default_factory=dict)
+    _rate_limiter: Optional[TokenRateLimiter] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._route_semaphores = {
+            route: asyncio.Semaphore(concurrency) for route, concurrency in self.route_concurrency.items()
+        }
+        if self.tokens_per_minute is not None:
+            self._rate_limiter = TokenRateLimiter(tokens_per_minute=self.tokens_per_minute)
+
+    def get_backoff_seconds(self, attempt: int, error: BaseException) -> float:
+        exponential_backoff = min(self.max_backoff_seconds, self.initial_backoff_seconds * 2 ** attempt)
+        jittered_backoff = random.uniform(exponential_backoff / 2, exponential_backoff)
+        retry_after = get_retry_after_seconds(error)
+        if retry_after is None:
+            return jittered_backoff
+        return max(retry_after, jittered_backoff)
+
+    async def _run_in_slot(
+            self,
+            job: Callable[[], Awaitable[T]],
+            on_retry: Optional[Callable[[BaseException], None]],
+            route: Optional[str]
+    ) -> T:
+        context_token = SCHEDULED_JOB.set(ScheduledJob(scheduler=self, route=route, on_retry=on_retry))
+        try:
+            return await job()
+        finally:
+            SCHEDULED_JOB.reset(context_token)
+
+    async def _acquire_slot(self, route_semaphore: Optional[asyncio.Semaphore]):
+        if route_semaphore is not None:
+            await route_semaphore.acquire()
+        await self._semaphore.acquire()
+
+    async def run(
+            self,
+            job: Callable[[], Awaitable[T]],
+            estimated_tokens: int = 0,
+            on_retry: Optional[Callable[[BaseException], None]] = None,
+            route: Optional[str] = None
+    ) -> T:
+        route_semaphore = self._route_semaphores.get(route) if route is not None else None
+        attempt = 0
+        while True:
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire(estimated_tokens)
+            async with route_semaphore or nullcontext(), self._semaphore:
+                try:
+                    return await self._run_in_slot(job, on_retry, route)
+                except Exception as error:  # noqa
+                    if attempt >= self.max_retries or not is_retryable_error(error):
+                        raise
+                    backoff_seconds = self.get_backoff_seconds(attempt, error)
+                    if on_retry is not None:
+                        on_retry(error)
+            attempt += 1
+            await asyncio.sleep(backoff_seconds)
+
+    async def run_nested(
+            self,
+            jobs: List[Callable[[], Awaitable[T]]],
+            estimated_tokens: List[int],
+            on_retry: Optional[Callable[[BaseException], None]] = None,
+            route: Optional[str] = None
+    ) -> List[T]:
+        route_semaphore = self._route_semaphores.get(route) if route is not None else None
+        self._semaphore.release()
+        if route_semaphore is not None:
+            route_semaphore.release()
+        try:
+            results = await asyncio.gather(
+                *(self.run(job, job_tokens, on_retry, route) for job, job_tokens in zip(jobs, estimated_tokens)),
+                return_exceptions=True
+            )
+        finally:
+            await asyncio.shield(self._acquire_slot(route_semaphore))
+        for result in results:
+            if isinstance(result, BaseException):
+                raise NestedJobError(f"{type(result).__name__}: {result}") from result
+        return results
+
+
+class ScheduledJob(BaseModel):
+    scheduler: ReviewScheduler
+    route: Optional[str] = None
+    on_retry: Optional[Callable[[BaseException], None]] = None
+
+    async def run_nested(self, jobs: List[Callable[[], Awaitable[T]]], estimated_tokens: List[int]) -> List[T]:
+        return await self.scheduler.run_nested(jobs, estimated_tokens, self.on_retry, self.route)
+
+
+SCHEDULED_JOB: ContextVar[Optional[ScheduledJob]] = ContextVar("scheduled_job", default=None)
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Optional, TextIO
+
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+SOCKET_UMASK = 0o177
+PRIVATE_DIR_MODE = 0o700
+PATH_ARGUMENTS = (
+    "repo_path", "custom_principles_path", "cache_dir", "state_file", "metrics_out", "output_file", "shard_out"
+)
+
+
+def get_default_socket_path() -> Path:
+    return Path(tempfile.gettempdir()) / f"ai_code_reviewer_{os.getuid()}" / "server.sock"
+
+
+def is_private_dir(dir_path: Path) -> bool:
+    dir_stat = dir_path.stat()
+    return dir_stat.st_uid == os.getuid() and dir_stat.st_mode & 0o022 == 0
+
+
+async def is_server_running(socket_path: Path) -> bool:
+    try:
+        _, writer = await asyncio.open_unix_connection(str(socket_path))
+    except OSError:
+        return False
+    writer.close()
+    await writer.wait_closed()
+    return True
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+class StreamLogHandler(logging.Handler):
+    def __init__(self, writer: asyncio.StreamWriter):
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record: logging.LogRecord):
+        self.writer.write(encode_message({"level": record.levelno, "message": self.format(record)}))
+
+
+class MessageOutputStream:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    def write(self, text: str) -> int:
+        self.writer.write(encode_message({"output": text}))
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def build_request_logger(writer: asyncio.StreamWriter) -> logging.Logger:
+    logger = logging.Logger("ai_code_reviewer.request")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(StreamLogHandler(writer))
+    return logger
+
+
+async def handle_review_request(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        containers: Dict[str, Any],
+        logger: logging.Logger
+):
+    from ai_code_reviewer.cli import run_review
+
+    request_line = await reader.readline()
+    if not request_line:
+        writer.close()
+        await writer.wait_closed()
+        return
+    request_logger = build_request_logger(writer)
+    try:
+        args = argparse.Namespace(**json.loads(request_line)["args"])
+        logger.info(f"Reviewing {args.repo_path} against {args.compare_with}")
+        await run_review(
+            args, request_logger, containers, report_progress=False, output_stream=MessageOutputStream(writer))
+    except Exception as error:  # noqa
+        request_logger.error(f"Review failed on server: {type(error).__name__}: {error}")
+    finally:
+        writer.write(encode_message({"done": True}))
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+
+async def serve(socket_path: Path, logger: logging.Logger):
+    import ai_code_reviewer.containers  # noqa: F401, warm up imports before the first review
+
+    socket_path.parent.mkdir(mode=PRIVATE_DIR_MODE, parents=True, exist_ok=True)
+    if not is_private_dir(socket_path.parent):
+        logger.error(f"Can not listen on {socket_path}: its directory must be owned by the current user"
+                     f" and not writable by others.")
+        return
+    if await is_server_running(socket_path):
+        logger.error(f"Review server is already running on {socket_path}.")
+        return
+    socket_path.unlink(missing_ok=True)
+    containers: Dict[str, Any] = {}
+    previous_umask = os.umask(SOCKET_UMASK)
+    try:
+        server = await asyncio.start_unix_server(
+            partial(handle_review_request, containers=containers, logger=logger),
+            path=str(socket_path),
+            limit=MAX_MESSAGE_BYTES
+        )
+    finally:
+        os.umask(previous_umask)
+    logger.info(f"Review server is listening on {socket_path}")
+    async with server:
+        await server.serve_forever()
+
+
+async def request_review(
+        socket_path: Path,
+        args: argparse.Namespace,
+        logger: logging.Logger,
+        output_stream: Optional[TextIO] = None
+) -> bool:
+    output_stream = output_stream or sys.stdout
+    try:
+        reader, writer = await asyncio.open_unix_connection(str(socket_path), limit=MAX_MESSAGE_BYTES)
+    except OSError:
+        logger.info(f"No review server at {socket_path}, reviewing in this process.")
+        return False
+    request_args = {
+        key: os.path.abspath(value) if key in PATH_ARGUMENTS and value is not None else value
+        for key, value in vars(args).items()
+    }
+    writer.write(encode_message({"args": request_args}))
+    await writer.drain()
+    async for line in reader:
+        message = json.loads(line)
+        if message.get("done"):
+            break
+        if "output" in message:
+            output_stream.write(message["output"])
+            continue
+        logger.log(message["level"], message["message"])
+    output_stream.flush()
+    writer.close()
+    await writer.wait_closed()
+    return True
@@ -0,0 +1,177 @@
+import hashlib
+import heapq
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from ai_code_reviewer.review import FileDiffComments
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import FileDiffReview, merge_reviews
+from ai_code_reviewer.tokens import estimate_tokens
+
+
+class Shard(BaseModel):
+    index: int
+    count: int
+
+    @staticmethod
+    def parse(shard_text: str) -> "Shard":
+        try:
+            index, count = (int(part) for part in shard_text.split("/"))
+        except ValueError:
+            raise ValueError(f"Shard must be in i/N format, got {shard_text}")
+        if not 1 <= index <= count:
+            raise ValueError(f"Shard index must be between 1 and {count}, got {index}")
+        return Shard(index=index, count=count)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+class ShardWorkItem(BaseModel):
+    file_name: str
+    principle_name: str
+    tokens: int
+
+    @property
+    def stable_hash(self) -> str:
+        return hashlib.sha256(f"{self.file_name}\0{self.principle_name}".encode("utf-8")).hexdigest()
+
+
+class ShardAssignment(BaseModel):
+    shard: Shard
+    work: Set[Tuple[str, str]]
+    total_work_items: int
+    tokens: int
+
+    def includes(self, file_name: str, reviewer: Reviewer) -> bool:
+        return (file_name, reviewer.name) in self.work
+
+    def get_file_names(self) -> Set[str]:
+        return {file_name for file_name, _ in self.work}
+
+
+def build_work_items(per_file_diff: Dict[str, str], reviewers: List[Reviewer]) -> List[ShardWorkItem]:
+    principles_tokens = {reviewer.name: estimate_tokens(reviewer.render_prompt("")) for reviewer in reviewers}
+    return [
+        ShardWorkItem(file_name=file_name, principle_name=principle_name, tokens=estimate_tokens(file_diff) + tokens)
+        for file_name, file_diff in per_file_diff.items()
+        for principle_name, tokens in principles_tokens.items()
+    ]
+
+
+def assign_shards(work_items: List[ShardWorkItem], shard_count: int) -> List[List[ShardWorkItem]]:
+    shards: List[List[ShardWorkItem]] = [[] for _ in range(shard_count)]
+    shard_loads = [(0, shard_index) for shard_index in range(shard_count)]
+    for work_item in sorted(work_items, key=lambda item: (-item.tokens, item.stable_hash)):
+        shard_load, shard_index = heapq.heappop(shard_loads)
+        shards[shard_index].append(work_item)
+        heapq.heappush(shard_loads, (shard_load + work_item.tokens, shard_index))
+    return shards
+
+
+def select_shard_work(per_file_diff: Dict[str, str], reviewers: List[Reviewer], shard: Shard) -> ShardAssignment:
+    work_items = build_work_items(per_file_diff, reviewers)
+    shard_items = assign_shards(work_items, shard.count)[shard.index - 1]
+    return ShardAssignment(
+        shard=shard,
+        work={(work_item.file_name, work_item.principle_name) for work_item in shard_items},
+        total_work_items=len(work_items),
+        tokens=sum(work_item.tokens for work_item in shard_items)
+    )
+
+
+class NamedReviewer(Reviewer):
+    reviewer_name: str
+
+    @property
+    def name(self) -> str:
+        return self.reviewer_name
+
+
+class NamedReview(FileDiffComments):
+    file_name: str
+    reviewer_name: str
+    error: Optional[str] = None
+
+
+def dump_named_reviews(reviews: List[FileDiffReview]) -> List[NamedReview]:
+    return [
+        NamedReview(
+            comments=review.comments,
+            file_name=review.file_name,
+            reviewer_name=review.author.name,
+            error=review.error
+        )
+        for review in merge_reviews(reviews)
+    ]
+
+
+def load_named_reviews(
+        named_reviews: List[NamedReview],
+        reviewers: Optional[Dict[str, NamedReviewer]] = None
+) -> List[FileDiffReview]:
+    reviewers = {} if reviewers is None else reviewers
+    return [
+        FileDiffReview(
+            comments=named_review.comments,
+            author=reviewers.setdefault(
+                named_review.reviewer_name, NamedReviewer(reviewer_name=named_review.reviewer_name)),
+            file_name=named_review.file_name,
+            error=named_review.error
+        )
+        for named_review in named_reviews
+    ]
+
+
+class ShardResult(BaseModel):
+    shard: Shard
+    per_file_diff: Dict[str, str]
+    reviews: List[NamedReview]
+    is_diff: bool = True
+
+    @staticmethod
+    def load(result_path: Path) -> "ShardResult":
+        return ShardResult.model_validate_json(result_path.read_text(encoding="utf-8"))
+
+    def save(self, result_path: Path):
+        result_path.parent.mkdir(parents=True, exist_ok=True)
+        result_path.write_text(self.model_dump_json(), encoding="utf-8")
+
+
+def build_shard_result(
+        shard: Shard,
+        per_file_diff: Dict[str, str],
+        reviews: List[FileDiffReview],
+        is_diff: bool = True
+) -> ShardResult:
+    named_reviews = dump_named_reviews(reviews)
+    reviewed_files = {named_review.file_name for named_review in named_reviews}
+    return ShardResult(
+        shard=shard,
+        per_file_diff={
+            file_name: file_diff for file_name, file_diff in per_file_diff.items() if file_name in reviewed_files
+        },
+        reviews=named_reviews,
+        is_diff=is_diff
+    )
+
+
+def get_missing_shards(shard_results: List[ShardResult]) -> List[Shard]:
+    shard_counts = {shard_result.shard.count for shard_result in shard_results}
+    if len(shard_counts) != 1:
+        raise ValueError(f"Shard results come from different shard counts: {sorted(shard_counts)}")
+    shard_count = shard_counts.pop()
+    merged_indexes = {shard_result.shard.index for shard_result in shard_results}
+    return [Shard(index=index, count=shard_count) for index in range(1, shard_count + 1) if index not in merged_indexes]
+
+
+def merge_shard_results(shard_results: List[ShardResult]) -> Tuple[Dict[str, str], List[FileDiffReview]]:
+    per_file_diff: Dict[str, str] = {}
+    reviewers: Dict[str, NamedReviewer] = {}
+    reviews: List[FileDiffReview] = []
+    for shard_result in shard_results:
+        per_file_diff.update(shard_result.per_file_diff)
+        reviews.extend(load_named_reviews(shard_result.reviews, reviewers))
+    return per_file_diff, merge_reviews(reviews)
@@ -0,0 +1,71 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from pydantic import BaseModel
+
+from ai_code_reviewer.cache import hash_cache_key
+from ai_code_reviewer.run_review import FileDiffReview
+from ai_code_reviewer.sharding import NamedReview, dump_named_reviews, load_named_reviews
+from ai_code_reviewer.utils import FULL_FILE_CONTEXT_LINES, split_diff_by_file
+
+STAGED_STATE_FILE_NAME = "staged_review.json"
+BUNDLED_PROMPTS_DIR = Path(__file__).parent / "prompts"
+
+
+def get_staged_diff(repo_path: Path, allowed_extensions: Set[str]) -> Dict[str, str]:
+    try:
+        result = subprocess.run(
+            [
+                "git", "-C", str(repo_path), "diff", "--cached", f"--unified={FULL_FILE_CONTEXT_LINES}",
+                "--find-renames", "--src-prefix=a/", "--dst-prefix=b/", "--no-color", "--no-ext-diff",
+                "--", *(f"*{extension}" for extension in sorted(allowed_extensions))
+            ],
+            capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        raise ValueError(f"Can not read staged changes of {repo_path}, is it a git repository?")
+    per_file_diff = split_diff_by_file(result.stdout.decode("utf-8", errors="replace"))
+    return {
+        file_name: file_diff for file_name, file_diff in per_file_diff.items()
+        if os.path.splitext(file_name)[1] in allowed_extensions
+    }
+
+
+def get_staged_fingerprint(
+        per_file_diff: Dict[str, str],
+        principles_hashes: Dict[str, str],
+        review_settings: Dict[str, Any]
+) -> str:
+    return hash_cache_key(
+        per_file_diff=per_file_diff,
+        principles_hashes=principles_hashes,
+        prompts={path.name: path.read_text(encoding="utf-8") for path in sorted(BUNDLED_PROMPTS_DIR.glob("*.yaml"))},
+        review_settings=review_settings
+    )
+
+
+class StagedReviewState(BaseModel):
+    fingerprint: str
+    reviews: List[NamedReview]
+
+    @staticmethod
+    def load(state_path: Path) -> Optional["StagedReviewState"]:
+        try:
+            return StagedReviewState.model_validate_json(state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state_path: Path):
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = state_path.with_suffix(".tmp")
+        temporary_path.write_text(self.model_dump_json(), encoding="utf-8")
+        temporary_path.replace(state_path)
+
+    def get_reviews(self) -> List[FileDiffReview]:
+        return load_named_reviews(self.reviews)
+
+
+def build_staged_review_state(fingerprint: str, reviews: List[FileDiffReview]) -> StagedReviewState:
+    return StagedReviewState(fingerprint=fingerprint, reviews=dump_named_reviews(reviews))
@@ -0,0 +1,253 @@
+import ast
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+
+from ai_code_reviewer.diff_windows import PYTHON_FILE_SUFFIX, get_new_file_lines
+from ai_code_reviewer.repo_scan import DEFAULT_MAX_FILE_SIZE_BYTES, list_repo_files, read_text_file
+from ai_code_reviewer.tokens import estimate_tokens
+from ai_code_reviewer.triage import get_changed_new_file_lines, has_line_in_range
+
+SYMBOL_INDEX_VERSION = 1
+MAX_LISTED_CALLERS = 5
+PROJECT_CONTEXT_HEADER = "Symbols from other project files related to the reviewed file:"
+EMPTY_PROJECT_CONTEXT = "No related symbols found in other project files."
+
+
+class SymbolDefinition(BaseModel):
+    name: str
+    qualified_name: str
+    signature: str
+    line_number: int
+    end_line_number: int
+
+
+class FileSymbols(BaseModel):
+    mtime_ns: int = 0
+    size: int = 0
+    definitions: List[SymbolDefinition] = []
+    imported_names: List[str] = []
+    called_names: Dict[str, int] = {}
+
+
+def get_called_name(call: ast.Call) -> Optional[str]:
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+def get_signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(base) for base in node.bases)
+        return f"class {node.name}({bases})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def iterate_definitions(body: List[ast.stmt], scope: str = "") -> Iterator[SymbolDefinition]:
+    for node in body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        qualified_name = f"{scope}{node.name}"
+        yield SymbolDefinition(
+            name=node.name,
+            qualified_name=qualified_name,
+            signature=get_signature(node),
+            line_number=node.lineno,
+            end_line_number=node.end_lineno or node.lineno
+        )
+        if isinstance(node, ast.ClassDef):
+            yield from iterate_definitions(node.body, f"{qualified_name}.")
+
+
+def extract_file_symbols(source: str) -> Optional[FileSymbols]:
+    try:
+        module = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    imported_names: Set[str] = set()
+    called_names: Dict[str, int] = {}
+    for node in ast.walk(module):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imported_names.update(
+                (alias.name if isinstance(node, ast.ImportFrom) else alias.name.split(".")[0]) for alias in node.names)
+        elif isinstance(node, ast.Call):
+            called_name = get_called_name(node)
+            if called_name is not None:
+                called_names[called_name] = called_names.get(called_name, 0) + 1
+    return FileSymbols(
+        definitions=list(iterate_definitions(module.body)),
+        imported_names=sorted(imported_names),
+        called_names=called_names
+    )
+
+
+def get_referenced_names(source: str, line_numbers: Set[int]) -> Set[str]:
+    try:
+        module = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return set()
+    referenced_names = set()
+    for node in ast.walk(module):
+        if getattr(node, "lineno", None) not in line_numbers:
+            continue
+        if isinstance(node, ast.Name):
+            referenced_names.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            referenced_names.add(node.attr)
+    return referenced_names
+
+
+class SymbolIndex(BaseModel):
+    version: int = SYMBOL_INDEX_VERSION
+    files: Dict[str, FileSymbols] = {}
+    _definitions: Optional[Dict[str, List[Tuple[str, SymbolDefinition]]]] = PrivateAttr(default=None)
+    _callers: Optional[Dict[str, Dict[str, int]]] = PrivateAttr(default=None)
+
+    @staticmethod
+    def load(index_path: Path) -> Optional["SymbolIndex"]:
+        try:
+            index = SymbolIndex.model_validate_json(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return index if index.version == SYMBOL_INDEX_VERSION else None
+
+    def save(self, index_path: Path):
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = index_path.with_suffix(".tmp")
+        temporary_path.write_text(self.model_dump_json(), encoding="utf-8")
+        temporary_path.replace(index_path)
+
+    def _build_lookups(self):
+        self._definitions, self._callers = {}, {}
+        for file_name, file_symbols in self.files.items():
+            for definition in file_symbols.definitions:
+                self._definitions.setdefault(definition.name, []).append((file_name, definition))
+            for called_name, calls_count in file_symbols.called_names.items():
+                self._callers.setdefault(called_name, {})[file_name] = calls_count
+
+    def get_definitions(self, name: str) -> List[Tuple[str, SymbolDefinition]]:
+        if self._definitions is None:
+            self._build_lookups()
+        return self._definitions.get(name, [])
+
+    def get_callers(self, name: str) -> Dict[str, int]:
+        if self._callers is None:
+            self._build_lookups()
+        return self._callers.get(name, {})
+
+
+def update_symbol_index(
+        repo_path: Path,
+        index_path: Optional[Path] = None,
+        max_file_size_bytes: int = DEFAULT_MAX_FILE_SIZE_BYTES
+) -> SymbolIndex:
+    index = (SymbolIndex.load(index_path) if index_path is not None else None) or SymbolIndex()
+    files: Dict[str, FileSymbols] = {}
+    for file_path in list_repo_files(repo_path):
+        if file_path.suffix != PYTHON_FILE_SUFFIX:
+            continue
+        file_name = file_path.relative_to(repo_path).as_posix()
+        try:
+            stat = file_path.stat()
+        except OSError:
+            continue
+        file_symbols = index.files.get(file_name)
+        if file_symbols is None or file_symbols.mtime_ns != stat.st_mtime_ns or file_symbols.size != stat.st_size:
+            source = read_text_file(file_path, max_file_size_bytes)
+            file_symbols = (extract_file_symbols(source) if source is not None else None) or FileSymbols()
+            file_symbols.mtime_ns, file_symbols.size = stat.st_mtime_ns, stat.st_size
+        files[file_name] = file_symbols
+    is_changed = files != index.files
+    index = SymbolIndex(files=files)
+    if index_path is not None and is_changed:
+        index.save(index_path)
+    return index
+
+
+def format_callers(callers: Dict[str, int]) -> str:
+    listed_callers = sorted(callers, key=lambda file_name: (-callers[file_name], file_name))[:MAX_LISTED_CALLERS]
+    more_callers = f" and {len(callers) - len(listed_callers)} more files" if len(callers) > len(listed_callers) else ""
+    return ", ".join(listed_callers) + more_callers
+
+
+def get_repo_file_name(repo_path: Path, file_name: str) -> str:
+    file_path = Path(file_name)
+    if not file_path.is_absolute():
+        return file_path.as_posix()
+    try:
+        return file_path.relative_to(repo_path.absolute()).as_posix()
+    except ValueError:
+        return file_path.as_posix()
+
+
+def build_context_lines(index: SymbolIndex, file_name: str, diff: str, is_diff: bool = True) -> List[str]:
+    diff_lines = diff.splitlines()
+    source = "\n".join(line for _, line in get_new_file_lines(diff_lines, is_diff))
+    file_symbols = extract_file_symbols(source)
+    if file_symbols is None:
+        return []
+    changed_lines = get_changed_new_file_lines(diff_lines, is_diff)
+    changed_names = get_referenced_names(source, changed_lines)
+    sorted_changed_lines = sorted(changed_lines)
+    used_names = set(file_symbols.imported_names) | set(file_symbols.called_names)
+    own_names = {definition.name for definition in file_symbols.definitions}
+    changed_definitions = [
+        definition for definition in file_symbols.definitions
+        if has_line_in_range(sorted_changed_lines, definition.line_number, definition.end_line_number)
+    ]
+    prioritized_lines: List[Tuple[int, str]] = []
+    for definition in changed_definitions:
+        other_definitions = [
+            (other_file_name, other_definition)
+            for other_file_name, other_definition in index.get_definitions(definition.name)
+            if other_file_name != file_name
+        ]
+        is_method = definition.qualified_name != definition.name
+        if is_method and other_definitions:
+            continue
+        callers = {
+            caller: calls_count for caller, calls_count in index.get_callers(definition.name).items()
+            if caller != file_name
+        }
+        if callers:
+            prioritized_lines.append(
+                (0, f"{definition.qualified_name} (changed) is called from {format_callers(callers)}"))
+        for other_file_name, other_definition in other_definitions:
+            prioritized_lines.append((1, f"{definition.qualified_name} (changed) is also defined in"
+                                         f" {other_file_name}:{other_definition.line_number}:"
+                                         f" {other_definition.signature}"))
+    for name in sorted(used_names - own_names):
+        priority = 0 if name in changed_names else 2
+        for other_file_name, definition in index.get_definitions(name):
+            if other_file_name != file_name:
+                prioritized_lines.append(
+                    (priority, f"{other_file_name}:{definition.line_number}: {definition.signature}"))
+    return [line for _, line in sorted(prioritized_lines, key=lambda prioritized_line: prioritized_line[0])]
+
+
+def build_project_context(
+        index: SymbolIndex,
+        file_name: str,
+        diff: str,
+        max_tokens: int,
+        is_diff: bool = True,
+        repo_path: Optional[Path] = None
+) -> str:
+    if repo_path is not None:
+        file_name = get_repo_file_name(repo_path, file_name)
+    context_lines = [PROJECT_CONTEXT_HEADER]
+    tokens = estimate_tokens(PROJECT_CONTEXT_HEADER)
+    for context_line in dict.fromkeys(build_context_lines(index, file_name, diff, is_diff)):
+        line_tokens = estimate_tokens(context_line) + 1
+        if tokens + line_tokens > max_tokens:
+            break
+        context_lines.append(context_line)
+        tokens += line_tokens
+    if len(context_lines) == 1:
+        return EMPTY_PROJECT_CONTEXT
+    return "\n".join(context_lines)
@@ -0,0 +1,32 @@
+import math
+from functools import lru_cache
+from typing import Any, Optional
+
+CHARS_PER_TOKEN = 4
+DEFAULT_ENCODING_NAME = "cl100k_base"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: Optional[str]) -> Optional[Any]:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name) if model_name is not None \
+            else tiktoken.get_encoding(DEFAULT_ENCODING_NAME)
+    except KeyError:
+        return get_encoding(None) if model_name is not None else None
+    except Exception:  # noqa
+        return None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
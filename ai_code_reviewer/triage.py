@@ -0,0 +1,89 @@
+import ast
+import bisect
+from functools import lru_cache
+from pathlib import PurePath
+from typing import List, Optional, Set
+
+from ai_code_reviewer.diff_windows import (
+    CHANGED_LINE_PREFIXES, NO_NEWLINE_MARKER_PREFIX, PYTHON_FILE_SUFFIX, get_new_file_lines
+)
+
+ADDED_LINE_PREFIX = "+"
+
+
+def matches_file_globs(file_name: str, file_globs: List[str]) -> bool:
+    file_path = PurePath(file_name)
+    return any(file_path.match(file_glob) for file_glob in file_globs)
+
+
+def get_changed_text(diff: str, is_diff: bool = True) -> str:
+    if not is_diff:
+        return diff
+    diff_lines = diff.splitlines()
+    changed_lines = [line[1:] for line in diff_lines if line.startswith(CHANGED_LINE_PREFIXES)]
+    return "\n".join(changed_lines) if changed_lines else diff
+
+
+def contains_keywords(text: str, keywords: List[str]) -> bool:
+    lowered_text = text.lower()
+    return any(keyword.lower() in lowered_text for keyword in keywords)
+
+
+def get_changed_new_file_lines(diff_lines: List[str], is_diff: bool = True) -> Set[int]:
+    if not is_diff or not any(line.startswith(CHANGED_LINE_PREFIXES) for line in diff_lines):
+        return set(range(1, len(diff_lines) + 1))
+    changed_lines = set()
+    new_file_line_number = 1
+    for line in diff_lines:
+        if line.startswith(NO_NEWLINE_MARKER_PREFIX):
+            continue
+        if line.startswith(ADDED_LINE_PREFIX):
+            changed_lines.add(new_file_line_number)
+        elif line.startswith(CHANGED_LINE_PREFIXES):
+            changed_lines.update((new_file_line_number - 1, new_file_line_number))
+            continue
+        new_file_line_number += 1
+    return changed_lines
+
+
+def has_line_in_range(sorted_line_numbers: List[int], first_line: int, last_line: int) -> bool:
+    line_index = bisect.bisect_left(sorted_line_numbers, first_line)
+    return line_index < len(sorted_line_numbers) and sorted_line_numbers[line_index] <= last_line
+
+
+@lru_cache(maxsize=128)
+def get_touched_node_types(diff: str, is_diff: bool = True) -> Optional[Set[str]]:
+    diff_lines = diff.splitlines()
+    try:
+        module = ast.parse("\n".join(line for _, line in get_new_file_lines(diff_lines, is_diff)))
+    except (SyntaxError, ValueError):
+        return None
+    changed_lines = sorted(get_changed_new_file_lines(diff_lines, is_diff))
+    touched_node_types = set()
+    for node in ast.walk(module):
+        first_line = getattr(node, "lineno", None)
+        if first_line is None:
+            continue
+        last_line = getattr(node, "end_lineno", None) or first_line
+        if has_line_in_range(changed_lines, first_line, last_line):
+            touched_node_types.add(type(node).__name__)
+    return touched_node_types
+
+
+def is_diff_relevant(
+        file_name: str,
+        diff: str,
+        file_globs: Optional[List[str]] = None,
+        keywords: Optional[List[str]] = None,
+        node_types: Optional[List[str]] = None,
+        is_diff: bool = True
+) -> bool:
+    if file_globs and not matches_file_globs(file_name, file_globs):
+        return False
+    if keywords and not contains_keywords(get_changed_text(diff, is_diff), keywords):
+        return False
+    if node_types and file_name.endswith(PYTHON_FILE_SUFFIX):
+        touched_node_types = get_touched_node_types(diff, is_diff)
+        if touched_node_types is not None and touched_node_types.isdisjoint(node_types):
+            return False
+    return True
@@ -1,17 +1,15 @@
 import os
+import subprocess
 from pathlib import Path
-from typing import Dict, Set
-
-from git import Repo, GitCommandError
+from typing import Dict, List, Optional, Set
 
+from ai_code_reviewer.line_index import DiffLineIndex
 from ai_code_reviewer.run_review import FileDiffReview
 
 
-def add_line_numbers(diff: str) -> str:
-    result = ""
-    for line_number, line in enumerate(diff.splitlines()):
-        result += f"{line_number}: {line}\n"
-    return result
+def add_line_numbers(diff: str, first_line_number: int = 0) -> str:
+    return "".join(
+        f"{line_number}: {line}\n" for line_number, line in enumerate(diff.splitlines(), start=first_line_number))
 
 
 def strip_diff_header(diff_text: str) -> str:
@@ -26,23 +24,88 @@ def strip_diff_header(diff_text: str) -> str:
     return "\n".join(result_lines)
 
 
-def get_files_diff(repository_path: Path, other: str) -> Dict[str, str]:
-    repo = Repo(repository_path)
-    diffs = {}
+DIFF_FILE_HEADER_PREFIX = "diff --git "
+NEW_FILE_PATH_PREFIX = "+++ "
+SUBMODULE_MODE = "160000"
+BINARY_DIFF_MARKERS = ("Binary files ", "GIT binary patch")
+FULL_FILE_CONTEXT_LINES = 100000000
+
 
-    changed_files = repo.git.diff(other, name_only=True).split('\n')
-    for file in changed_files:
-        if not Path(file).is_file():
+def unquote_git_path(path: str) -> str:
+    if not path.startswith('"'):
+        return path
+    return path[1:-1].encode("utf-8").decode("unicode_escape").encode("latin-1").decode("utf-8")
+
+
+def parse_new_file_path(header_lines: List[str]) -> Optional[str]:
+    for line in header_lines:
+        if not line.startswith(NEW_FILE_PATH_PREFIX):
             continue
-        try:
-            file_diff = repo.git.diff(other, file, unified=100000000)  # noqa hack to get full file
-            file_diff = strip_diff_header(file_diff)
-        except GitCommandError:
-            raise ValueError(f"No diff with {other}. Introduce diff or provide different compare_with tag")
-        diffs[file] = file_diff
+        path = unquote_git_path(line[len(NEW_FILE_PATH_PREFIX):].rstrip("\t"))
+        if not path.startswith("b/"):
+            return None
+        return path[len("b/"):]
+    return None
+
+
+def is_reviewable_file_diff(header_lines: List[str]) -> bool:
+    for line in header_lines:
+        if line.startswith(BINARY_DIFF_MARKERS):
+            return False
+        if line.endswith(f" {SUBMODULE_MODE}"):
+            return False
+    return True
+
+
+def split_diff_by_file(diff_text: str) -> Dict[str, str]:
+    diffs = {}
+    file_blocks: List[List[str]] = []
+    for line in diff_text.splitlines():
+        if line.startswith(DIFF_FILE_HEADER_PREFIX):
+            file_blocks.append([])
+        if file_blocks:
+            file_blocks[-1].append(line)
+    for file_block in file_blocks:
+        first_hunk_line = next(
+            (line_number for line_number, line in enumerate(file_block) if line.startswith("@@")), len(file_block))
+        header_lines = file_block[:first_hunk_line]
+        file_path = parse_new_file_path(header_lines)
+        if file_path is None or not is_reviewable_file_diff(header_lines):
+            continue
+        diffs[file_path] = "\n".join(file_block[first_hunk_line + 1:])
     return diffs
 
 
+def get_git_dir(repository_path: Path) -> Optional[Path]:
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(repository_path), "rev-parse", "--absolute-git-dir"],
+            capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return Path(result.stdout.strip())
+
+
+def get_files_diff(repository_path: Path, other: str) -> Dict[str, str]:
+    from git import Repo, GitCommandError
+
+    repo = Repo(repository_path)
+    try:
+        diff_text = repo.git.diff(
+            other,
+            unified=FULL_FILE_CONTEXT_LINES,  # hack to get full file
+            find_renames=True,
+            src_prefix="a/",
+            dst_prefix="b/",
+            no_color=True,
+            no_ext_diff=True
+        )
+    except GitCommandError:
+        raise ValueError(f"No diff with {other}. Introduce diff or provide different compare_with tag")
+    return split_diff_by_file(diff_text)
+
+
 def get_repo_diff(
         repo_path: Path,
         compare_with: str,
@@ -56,18 +119,6 @@ def get_repo_diff(
     return per_file_diff
 
 
-def get_all_files(
-        repo_path: Path,
-        allowed_extensions: Set[str],
-) -> Dict[str, str]:
-    files_content = {}
-    for item in repo_path.rglob('*'):
-        if item.is_file() and item.suffix in allowed_extensions:
-            with open(item, 'r', encoding='utf-8') as file:
-                files_content[str(item.absolute())] = file.read()
-    return files_content
-
-
 def suppress_irrelevant_comments(
         review: FileDiffReview
 ) -> FileDiffReview:
@@ -77,25 +128,42 @@ def suppress_irrelevant_comments(
 
 def suppress_not_changed_lines_comments(
         review: FileDiffReview,
-        per_file_diff: Dict[str, str]
+        line_index: DiffLineIndex
 ) -> FileDiffReview:
-    filtered_comments = []
-    for comment in review.comments:
-        file_content = per_file_diff[review.file_name]
-        commented_line = file_content[comment.line_number]
-        if "+" in commented_line:
-            filtered_comments.append(comment)
+    filtered_comments = [comment for comment in review.comments if line_index.is_added(comment.line_number)]
     return review.model_copy(update={"comments": filtered_comments})
 
 
 def suppress_noqa_line_comments(
         review: FileDiffReview,
-        per_file_diff: Dict[str, str]
+        line_index: DiffLineIndex
 ) -> FileDiffReview:
-    filtered_comments = []
-    for comment in review.comments:
-        file_content = per_file_diff[review.file_name]
-        commented_line = file_content[comment.line_number]
-        if "noqa" not in commented_line:
-            filtered_comments.append(comment)
+    filtered_comments = [comment for comment in review.comments if not line_index.has_noqa(comment.line_number)]
     return review.model_copy(update={"comments": filtered_comments})
+
+
+def suppress_comments(
+        review: FileDiffReview,
+        line_index: DiffLineIndex,
+        allow_irrelevant: bool = False,
+        suppress_not_changed_lines: bool = False,
+        suppress_noqa_lines: bool = False
+) -> FileDiffReview:
+    if not allow_irrelevant:
+        review = suppress_irrelevant_comments(review)
+    if suppress_not_changed_lines:
+        review = suppress_not_changed_lines_comments(review, line_index)
+    if suppress_noqa_lines:
+        review = suppress_noqa_line_comments(review, line_index)
+    return review
+
+
+def map_comments_to_file_lines(
+        review: FileDiffReview,
+        line_index: DiffLineIndex
+) -> FileDiffReview:
+    mapped_comments = [
+        comment.model_copy(update={"line_number": line_index.get_new_file_line_number(comment.line_number)})
+        for comment in review.comments
+    ]
+    return review.model_copy(update={"comments": mapped_comments})
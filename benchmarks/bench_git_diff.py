@@ -0,0 +1,65 @@
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from git import Repo
+
+from ai_code_reviewer.utils import get_files_diff, strip_diff_header
+
+
+def get_files_diff_per_file_subprocess(repository_path: Path, other: str) -> Dict[str, str]:
+    repo = Repo(repository_path)
+    diffs = {}
+    changed_files = repo.git.diff(other, name_only=True).split('\n')
+    for file in changed_files:
+        if not (repository_path / file).is_file():
+            continue
+        file_diff = repo.git.diff(other, file, unified=100000000)
+        diffs[file] = strip_diff_header(file_diff)
+    return diffs
+
+
+def create_synthetic_repo(repo_path: Path, files_count: int, lines_per_file: int):
+    subprocess.run(["git", "init", "-q", str(repo_path)], check=True)
+    for file_index in range(files_count):
+        file_path = repo_path / f"package_{file_index % 20}" / f"module_{file_index}.py"
+        file_path.parent.mkdir(exist_ok=True)
+        file_path.write_text("".join(f"value_{line} = {line}\n" for line in range(lines_per_file)))
+    git_identity = ["-c", "user.name=benchmark", "-c", "user.email=benchmark@example.com"]
+    subprocess.run(["git", "-C", str(repo_path), "add", "-A"], check=True)
+    subprocess.run(["git", "-C", str(repo_path), *git_identity, "commit", "-q", "-m", "initial"], check=True)
+    for file_path in repo_path.glob("package_*/module_*.py"):
+        with open(file_path, "a") as file:
+            file.write("changed_value = 1\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-pass and per-file git diff extraction.")
+    parser.add_argument("--files_count", type=int, default=1000)
+    parser.add_argument("--lines_per_file", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        repo_path = Path(temporary_dir)
+        create_synthetic_repo(repo_path, args.files_count, args.lines_per_file)
+
+        start_time = time.perf_counter()
+        single_pass_diff = get_files_diff(repo_path, "HEAD")
+        single_pass_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        per_file_diff = get_files_diff_per_file_subprocess(repo_path, "HEAD")
+        per_file_time = time.perf_counter() - start_time
+
+    assert single_pass_diff == per_file_diff, "Single-pass diff differs from per-file diff"
+    print(f"{len(single_pass_diff)} changed files")
+    print(f"single git diff: {single_pass_time:.2f}s")
+    print(f"git diff per file: {per_file_time:.2f}s")
+    print(f"speedup: {per_file_time / single_pass_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
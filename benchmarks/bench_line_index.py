@@ -0,0 +1,84 @@
+import argparse
+import random
+import time
+
+from ai_code_reviewer.line_index import DiffLineIndex
+from ai_code_reviewer.review import FileDiffComment
+from ai_code_reviewer.run_review import FileDiffReview
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.utils import add_line_numbers, suppress_comments, map_comments_to_file_lines
+
+LINE_PREFIXES = (" ", " ", " ", "+", "-")
+
+
+class BenchmarkReviewer(Reviewer):
+    @property
+    def name(self) -> str:
+        return "benchmark"
+
+
+def add_line_numbers_concatenation(diff: str, first_line_number: int = 0) -> str:
+    result = ""
+    for line_number, line in enumerate(diff.splitlines(), start=first_line_number):
+        result += f"{line_number}: {line}\n"
+    return result
+
+
+def build_diff(lines_count: int) -> str:
+    return "\n".join(
+        f"{random.choice(LINE_PREFIXES)}value_{line} = {line}{'  # noqa' if line % 100 == 0 else ''}"
+        for line in range(lines_count)
+    )
+
+
+def build_review(lines_count: int, comments_count: int) -> FileDiffReview:
+    return FileDiffReview(
+        comments=[
+            FileDiffComment(
+                line_number=random.randrange(lines_count),
+                comment="comment",
+                suggestion="suggestion",
+                implementation="implementation",
+                citation_from_principle="citation",
+                how_citation_violated="violation",
+                on_the_other_hand="",
+                is_violating_principle=True
+            )
+            for _ in range(comments_count)
+        ],
+        author=BenchmarkReviewer(),
+        file_name="file.py"
+    )
+
+
+def measure(name: str, function, repeats: int):
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    print(f"{name}: {(time.perf_counter() - start_time) / repeats * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure diff line index, suppressors and line enumeration.")
+    parser.add_argument("--lines_count", type=int, default=50000)
+    parser.add_argument("--comments_count", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(0)
+    diff = build_diff(args.lines_count)
+    review = build_review(args.lines_count, args.comments_count)
+    line_index = DiffLineIndex.from_diff(diff)
+    assert add_line_numbers(diff) == add_line_numbers_concatenation(diff)
+
+    print(f"{args.lines_count} lines, {args.comments_count} comments")
+    measure("build line index", lambda: DiffLineIndex.from_diff(diff), args.repeats)
+    measure("suppress comments", lambda: suppress_comments(
+        review, line_index, suppress_not_changed_lines=True, suppress_noqa_lines=True), args.repeats)
+    measure("map comments to file lines", lambda: map_comments_to_file_lines(review, line_index), args.repeats)
+    measure("add line numbers (join)", lambda: add_line_numbers(diff), args.repeats)
+    measure("add line numbers (concatenation)", lambda: add_line_numbers_concatenation(diff), args.repeats)
+
+
+if __name__ == '__main__':
+    main()
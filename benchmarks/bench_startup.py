@@ -0,0 +1,54 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+CLI_MODULE = "ai_code_reviewer.cli"
+
+
+def parse_import_times(importtime_output: str) -> Dict[str, int]:
+    cumulative_microseconds = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module_name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            cumulative_microseconds[module_name.strip()] = int(cumulative)
+    return cumulative_microseconds
+
+
+def measure_import_milliseconds(module_name: str) -> float:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True, check=True
+    )
+    return parse_import_times(result.stderr)[module_name] / 1000
+
+
+def measure_help_milliseconds() -> float:
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, "-m", CLI_MODULE, "--help"], capture_output=True, check=True)
+    return (time.perf_counter() - start_time) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup time and fail on regression.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max_import_ms", type=float, default=500,
+                        help="Fail if median cumulative import time of the CLI module exceeds this threshold.")
+    args = parser.parse_args()
+
+    import_times: List[float] = [measure_import_milliseconds(CLI_MODULE) for _ in range(args.runs)]
+    help_times: List[float] = [measure_help_milliseconds() for _ in range(args.runs)]
+    median_import_ms = statistics.median(import_times)
+    print(f"import {CLI_MODULE}: median {median_import_ms:.0f}ms (threshold {args.max_import_ms:.0f}ms)")
+    print(f"ai_code_reviewer --help: median {statistics.median(help_times):.0f}ms")
+    if median_import_ms > args.max_import_ms:
+        print("Startup time regression detected")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+from langchain_community.callbacks import get_openai_callback
+
+from ai_code_reviewer.containers import Container, AppConfig
+from ai_code_reviewer.run_review import get_reviews
+from ai_code_reviewer.scheduler import ReviewScheduler
+
+
+def create_principles(principles_dir: Path, principles_count: int) -> List[Path]:
+    principles_path = []
+    for principle_index in range(principles_count):
+        principle_path = principles_dir / f"principle_{principle_index}.yaml"
+        principle_path.write_text(yaml.safe_dump({
+            "principle_name": f"Principle {principle_index}",
+            "principle_description": f"Synthetic principle number {principle_index}. " * 20,
+            "review_required_examples": "x = 1; y = 2",
+            "review_not_required_examples": "x = 1"
+        }))
+        principles_path.append(principle_path)
+    return principles_path
+
+
+def create_per_file_diff(files_count: int, lines_per_file: int) -> Dict[str, str]:
+    return {
+        f"package/module_{file_index}.py": "\n".join(
+            f"+value_{line} = {line}" if line % 10 == 0 else f" value_{line} = {line}"
+            for line in range(lines_per_file)
+        )
+        for file_index in range(files_count)
+    }
+
+
+def run_benchmark(
+        principles_path: List[Path],
+        per_file_diff: Dict[str, str],
+        args: argparse.Namespace
+) -> Dict[str, float]:
+    container = Container.from_config(AppConfig(
+        principles_path=principles_path,
+        llm_model_name="gpt-4-0125-preview",
+        llm_backend="fake",
+        fake_llm_latency_seconds=args.latency_seconds,
+        fake_llm_failure_rate=args.failure_rate,
+        max_principles_per_call=args.principles_per_call
+    ))
+    scheduler = ReviewScheduler(
+        max_concurrency=args.max_concurrent_reviews, initial_backoff_seconds=0.0, max_backoff_seconds=0.0)
+    tracemalloc.start()
+    with get_openai_callback() as callback:
+        start_time = time.perf_counter()
+        reviews = asyncio.run(get_reviews(
+            per_file_diff, container.reviewers(), report_progress=False, scheduler=scheduler,
+            reviewer_batcher=container.reviewer_batcher()
+        ))
+        wall_seconds = time.perf_counter() - start_time
+    _, peak_memory_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_seconds": wall_seconds,
+        "requests_per_second": callback.successful_requests / wall_seconds,
+        "requests": callback.successful_requests,
+        "prompt_tokens": callback.prompt_tokens,
+        "peak_memory_mb": peak_memory_bytes / 1024 / 1024,
+        "failed_reviews": sum(review.error is not None for review in reviews)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure end-to-end review throughput with the fake LLM backend.")
+    parser.add_argument("--files_counts", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--principles_counts", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--lines_per_file", type=int, default=200)
+    parser.add_argument("--latency_seconds", type=float, default=0.05)
+    parser.add_argument("--failure_rate", type=float, default=0.0)
+    parser.add_argument("--principles_per_call", type=int, default=1)
+    parser.add_argument("--max_concurrent_reviews", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'files':>6} {'principles':>10} {'wall, s':>8} {'req/s':>8} {'requests':>8} {'prompt tokens':>13}"
+          f" {'peak mem, MB':>12} {'failed':>6}")
+    with tempfile.TemporaryDirectory() as principles_dir:
+        for principles_count in args.principles_counts:
+            principles_path = create_principles(Path(principles_dir), principles_count)
+            for files_count in args.files_counts:
+                per_file_diff = create_per_file_diff(files_count, args.lines_per_file)
+                result = run_benchmark(principles_path, per_file_diff, args)
+                print(f"{files_count:>6} {principles_count:>10} {result['wall_seconds']:>8.2f}"
+                      f" {result['requests_per_second']:>8.1f} {result['requests']:>8} {result['prompt_tokens']:>13}"
+                      f" {result['peak_memory_mb']:>12.1f} {result['failed_reviews']:>6}")
+
+
+if __name__ == '__main__':
+    main()
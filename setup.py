@@ -9,6 +9,7 @@ setup(
     author='Dmitrii Rashchenko',
     author_email='dimitree54@gmail.com',
     packages=find_packages(),
+    package_data={'ai_code_reviewer': ['prompts/*.yaml']},
     description='Useful classes extending langchain library',
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown',
@@ -5,6 +5,7 @@ from ai_code_reviewer.containers import Container, AppConfig
 from ai_code_reviewer.review import FileDiffComments, \
     FileDiffComment
 from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import get_reviews
 from ai_code_reviewer.utils import add_line_numbers
 
 
@@ -53,6 +54,17 @@ class MyTestCase(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(review.comments[0].line_number, 3)
         self.assertEqual(review.comments[0].comment, "test_review")
 
+    async def test_reviewer_with_diff_only_interface_is_run(self):
+        test_diff = "\n".join(f"+line {line_number}" if line_number == 10 else f" line {line_number}"
+                              for line_number in range(20))
+        reviews = await get_reviews({"file.py": test_diff}, [self.test_reviewer], report_progress=False)
+        self.assertIsNone(reviews[0].error)
+        self.assertEqual([comment.line_number for comment in reviews[0].comments], [3])
+        reviews = await get_reviews(
+            {"file.py": test_diff}, [self.test_reviewer], report_progress=False, context_lines=2)
+        self.assertIsNone(reviews[0].error)
+        self.assertEqual([comment.line_number for comment in reviews[0].comments], [11])
+
 
 class TestProgrammingPrincipleReviewer(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
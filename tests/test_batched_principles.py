@@ -0,0 +1,102 @@
+import unittest
+from typing import List
+
+from langchain_core.runnables import RunnableLambda
+
+from ai_code_reviewer.review import FileDiffComments, PrincipleFileDiffComments, PrincipleFileDiffComment
+from ai_code_reviewer.reviewers.batched_principles import PrincipleBatcher, BatchedPrinciplesReviewer
+from ai_code_reviewer.reviewers.programming_principle import ProgrammingPrincipleReviewer, ProgrammingPrinciple
+from ai_code_reviewer.run_review import get_reviews
+
+
+def build_principle_reviewer(principle_name: str) -> ProgrammingPrincipleReviewer:
+    return ProgrammingPrincipleReviewer(
+        programming_principle=ProgrammingPrinciple(
+            principle_name=principle_name,
+            principle_description="test description",
+            review_required_examples="",
+            review_not_required_examples=""
+        ),
+        diff_review_chain=RunnableLambda(lambda _: FileDiffComments(comments=[]))
+    )
+
+
+def build_tagged_comment(principle_name: str, line_number: int) -> PrincipleFileDiffComment:
+    return PrincipleFileDiffComment(
+        principle_name=principle_name,
+        line_number=line_number,
+        comment="test_review",
+        suggestion="test suggestion",
+        implementation="test implementation",
+        citation_from_principle="test citation",
+        how_citation_violated="test violation",
+        on_the_other_hand="test opposition",
+        is_violating_principle=True
+    )
+
+
+class TestPrincipleBatcher(unittest.TestCase):
+    def setUp(self):
+        self.reviewers = [build_principle_reviewer(f"principle {index}") for index in range(5)]
+
+    def build_batcher(self, max_principles_per_call: int, max_prompt_tokens: int = 100000) -> PrincipleBatcher:
+        return PrincipleBatcher(
+            diff_review_chain=RunnableLambda(lambda _: PrincipleFileDiffComments(comments=[])),
+            max_principles_per_call=max_principles_per_call,
+            max_prompt_tokens=max_prompt_tokens
+        )
+
+    def test_batches_by_count(self):
+        batched_reviewers = self.build_batcher(2).batch(self.reviewers, "+ x = 1")
+        self.assertEqual([len(reviewer.authors) for reviewer in batched_reviewers], [2, 2, 1])
+        self.assertIs(batched_reviewers[-1], self.reviewers[-1])
+
+    def test_batches_shrink_for_large_diff(self):
+        batcher = self.build_batcher(5, max_prompt_tokens=1000)
+        small_diff_batches = batcher.batch(self.reviewers, "+ x = 1")
+        large_diff_batches = batcher.batch(self.reviewers, "+ x = 1\n" * 300)
+        self.assertEqual(len(small_diff_batches), 1)
+        self.assertGreater(len(large_diff_batches), 1)
+
+
+class TestBatchedReviews(unittest.IsolatedAsyncioTestCase):
+    async def test_comments_are_attributed_to_principles(self):
+        calls: List[dict] = []
+
+        def fake_batched_review(chain_input: dict) -> PrincipleFileDiffComments:
+            calls.append(chain_input)
+            return PrincipleFileDiffComments(comments=[
+                build_tagged_comment("principle 1", 1),
+                build_tagged_comment(" Principle 0 ", 2),
+                build_tagged_comment("unknown principle", 3),
+            ])
+
+        reviewers = [build_principle_reviewer(f"principle {index}") for index in range(2)]
+        batcher = PrincipleBatcher(
+            diff_review_chain=RunnableLambda(fake_batched_review),
+            max_principles_per_call=2,
+            max_prompt_tokens=100000
+        )
+        reviews = await get_reviews({"file.py": "+ x = 1"}, reviewers, report_progress=False, reviewer_batcher=batcher)
+        self.assertEqual(len(calls), 1)
+        self.assertIn("principle 0", calls[0]["principles"])
+        per_principle_lines = {review.author.name: [c.line_number for c in review.comments] for review in reviews}
+        self.assertEqual(per_principle_lines, {"principle 0": [2], "principle 1": [1]})
+
+    async def test_failure_is_reported_for_every_principle(self):
+        def failing_review(_: dict) -> PrincipleFileDiffComments:
+            raise ValueError("bad output")
+
+        reviewer = BatchedPrinciplesReviewer(
+            principle_reviewers=[build_principle_reviewer("a"), build_principle_reviewer("b")],
+            diff_review_chain=RunnableLambda(failing_review)
+        )
+        batcher = PrincipleBatcher(
+            diff_review_chain=reviewer.diff_review_chain,
+            max_principles_per_call=2,
+            max_prompt_tokens=100000
+        )
+        reviews = await get_reviews(
+            {"file.py": "+ x = 1"}, reviewer.principle_reviewers, report_progress=False, reviewer_batcher=batcher)
+        self.assertEqual(len(reviews), 2)
+        self.assertTrue(all(review.error is not None for review in reviews))
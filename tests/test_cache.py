@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from langchain_core.runnables import RunnableLambda
+
+from ai_code_reviewer.cache import ReviewCache, hash_cache_key
+from ai_code_reviewer.cli import CACHE_STATE_DIR_NAME
+from ai_code_reviewer.review import FileDiffComments, FileDiffComment
+from ai_code_reviewer.reviewers.programming_principle import ProgrammingPrincipleReviewer, ProgrammingPrinciple
+
+
+def build_test_comments(line_number: int = 3) -> FileDiffComments:
+    return FileDiffComments(
+        comments=[
+            FileDiffComment(
+                line_number=line_number,
+                comment="test_review",
+                suggestion="test suggestion",
+                implementation="test implementation",
+                citation_from_principle="test citation",
+                how_citation_violated="test violation",
+                on_the_other_hand="test opposition",
+                is_violating_principle=True
+            )
+        ]
+    )
+
+
+class TestReviewCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.cache = ReviewCache(cache_dir=Path(self.temporary_dir.name))
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def test_key_depends_on_all_parts(self):
+        key = hash_cache_key(namespace="a", enumerated_diff="b")
+        self.assertEqual(key, hash_cache_key(enumerated_diff="b", namespace="a"))
+        self.assertNotEqual(key, hash_cache_key(namespace="a", enumerated_diff="c"))
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.put("key", build_test_comments())
+        self.assertEqual(self.cache.get("key"), build_test_comments())
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_expired_entry_is_miss(self):
+        self.cache.put("key", build_test_comments())
+        old_time = time.time() - self.cache.max_age_seconds - 1
+        os.utime(Path(self.temporary_dir.name) / "key.json", (old_time, old_time))
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_evict_by_size_keeps_newest(self):
+        self.cache.put("old", build_test_comments())
+        old_time = time.time() - 10
+        os.utime(Path(self.temporary_dir.name) / "old.json", (old_time, old_time))
+        self.cache.put("new", build_test_comments())
+        self.cache.max_size_bytes = (Path(self.temporary_dir.name) / "new.json").stat().st_size
+        self.cache.evict()
+        self.assertIsNone(self.cache.get("old"))
+        self.assertIsNotNone(self.cache.get("new"))
+
+    def test_evict_keeps_state_files(self):
+        state_path = Path(self.temporary_dir.name) / CACHE_STATE_DIR_NAME / "symbol_index.json"
+        state_path.parent.mkdir()
+        state_path.write_text("{}" * 1000)
+        self.cache.put("entry", build_test_comments())
+        self.cache.max_size_bytes = (Path(self.temporary_dir.name) / "entry.json").stat().st_size
+        self.cache.evict()
+        self.assertTrue(state_path.is_file())
+        self.assertIsNotNone(self.cache.get("entry"))
+
+
+class TestCachedProgrammingPrincipleReviewer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.chain_calls = 0
+
+        def fake_review(_: dict) -> FileDiffComments:
+            self.chain_calls += 1
+            return build_test_comments()
+
+        self.principle = ProgrammingPrinciple(
+            principle_name="test principle",
+            principle_description="test description",
+            review_required_examples="",
+            review_not_required_examples=""
+        )
+        self.reviewer = ProgrammingPrincipleReviewer(
+            programming_principle=self.principle,
+            diff_review_chain=RunnableLambda(fake_review),
+            review_cache=ReviewCache(cache_dir=Path(self.temporary_dir.name)),
+            cache_namespace="test-model:0.0:1"
+        )
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    async def test_second_review_is_cached(self):
+        first_review = await self.reviewer.review_file_diff("+ x = 1")
+        second_review = await self.reviewer.review_file_diff("+ x = 1")
+        self.assertEqual(first_review, second_review)
+        self.assertEqual(self.chain_calls, 1)
+
+    async def test_namespace_change_invalidates(self):
+        await self.reviewer.review_file_diff("+ x = 1")
+        other_model_reviewer = self.reviewer.model_copy(update={"cache_namespace": "other-model:0.0:1"})
+        await other_model_reviewer.review_file_diff("+ x = 1")
+        self.assertEqual(self.chain_calls, 2)
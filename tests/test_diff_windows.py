@@ -0,0 +1,153 @@
+import unittest
+from typing import List
+
+from ai_code_reviewer.diff_windows import (
+    split_diff_into_windows, merge_line_ranges, get_chunk_boundaries, DiffChunker, DiffWindow
+)
+from ai_code_reviewer.review import FileDiffComments, FileDiffComment
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import get_reviews
+from ai_code_reviewer.utils import add_line_numbers
+
+
+def build_diff(changed_line_numbers: List[int], lines_count: int) -> str:
+    return "\n".join(
+        f"+line {line_number}" if line_number in changed_line_numbers else f" line {line_number}"
+        for line_number in range(lines_count)
+    )
+
+
+class FirstLineReviewer(Reviewer):
+    reviewed_windows: List[str] = []
+
+    def name(self) -> str:
+        return "first_line_reviewer"
+
+    async def review_file_diff(self, diff: str) -> FileDiffComments:
+        self.reviewed_windows.append(diff)
+        return FileDiffComments(comments=[
+            FileDiffComment(
+                line_number=0,
+                comment="test_review",
+                suggestion="test suggestion",
+                implementation="test implementation",
+                citation_from_principle="test citation",
+                how_citation_violated="test violation",
+                on_the_other_hand="test opposition",
+                is_violating_principle=True
+            )
+        ])
+
+
+def build_python_diff(functions_count: int, function_lines: int) -> str:
+    lines = []
+    for function_index in range(functions_count):
+        lines.append(f"+def function_{function_index}():")
+        lines.extend(f"+    value_{line} = {line}" for line in range(function_lines - 1))
+    return "\n".join(lines)
+
+
+class EveryLineReviewer(Reviewer):
+    def name(self) -> str:
+        return "every_line_reviewer"
+
+    async def review_diff_window(
+            self,
+            diff: str,
+            first_line_number: int = 0,
+            project_context: str = ""
+    ) -> FileDiffComments:
+        return FileDiffComments(comments=[
+            FileDiffComment(
+                line_number=line_number,
+                comment="test_review",
+                suggestion="test suggestion",
+                implementation="test implementation",
+                citation_from_principle="test citation",
+                how_citation_violated="test violation",
+                on_the_other_hand="test opposition",
+                is_violating_principle=True
+            )
+            for line_number in range(first_line_number, first_line_number + len(diff.splitlines()))
+        ])
+
+
+class TestSplitDiffIntoWindows(unittest.TestCase):
+    def test_no_context_lines_keeps_full_diff(self):
+        diff = build_diff([5], 10)
+        windows = split_diff_into_windows(diff, None)
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(windows[0].diff, diff)
+
+    def test_separate_hunks(self):
+        windows = split_diff_into_windows(build_diff([10, 50], 100), 2)
+        self.assertEqual([window.first_line_number for window in windows], [8, 48])
+        self.assertEqual(windows[0].diff.splitlines(), [f" line {n}" if n != 10 else "+line 10" for n in range(8, 13)])
+
+    def test_overlapping_hunks_are_merged(self):
+        windows = split_diff_into_windows(build_diff([10, 13], 100), 2)
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(windows[0].first_line_number, 8)
+        self.assertEqual(len(windows[0].diff.splitlines()), 8)
+
+    def test_merge_adjacent_ranges(self):
+        self.assertEqual(merge_line_ranges([(5, 8), (0, 5), (10, 12)]), [(0, 8), (10, 12)])
+
+    def test_enumeration_keeps_original_line_numbers(self):
+        window = split_diff_into_windows(build_diff([50], 100), 1)[0]
+        self.assertEqual(add_line_numbers(window.diff, window.first_line_number).splitlines()[0], "49:  line 49")
+
+
+class TestWindowedReviews(unittest.IsolatedAsyncioTestCase):
+    async def test_comments_are_merged_per_file(self):
+        reviewer = FirstLineReviewer(reviewed_windows=[])
+        reviews = await get_reviews(
+            {"file.py": build_diff([10, 50], 100)}, [reviewer], report_progress=False, context_lines=3)
+        self.assertEqual(len(reviews), 1)
+        self.assertEqual([comment.line_number for comment in reviews[0].comments], [7, 47])
+        self.assertEqual(len(reviewer.reviewed_windows), 2)
+
+
+class TestDiffChunker(unittest.TestCase):
+    def test_small_window_is_not_chunked(self):
+        window = DiffWindow(first_line_number=0, diff=build_python_diff(2, 5))
+        self.assertEqual(DiffChunker(max_tokens=1000).split(window, "file.py"), [window])
+
+    def test_python_chunks_start_at_top_level_definitions(self):
+        window = DiffWindow(first_line_number=100, diff=build_python_diff(10, 10))
+        chunks = DiffChunker(max_tokens=200, overlap_lines=2).split(window, "file.py")
+        self.assertGreater(len(chunks), 1)
+        owned_ranges = [chunk.owned_line_range for chunk in chunks]
+        self.assertEqual(owned_ranges[0][0], 100)
+        self.assertEqual(owned_ranges[-1][1], 200)
+        for (_, previous_end), (next_start, _) in zip(owned_ranges, owned_ranges[1:]):
+            self.assertEqual(previous_end, next_start)
+            self.assertEqual((next_start - 100) % 10, 0)
+        self.assertEqual(chunks[1].first_line_number, owned_ranges[1][0] - 2)
+        self.assertTrue(all(len(add_line_numbers(chunk.diff, chunk.first_line_number)) / 4 <= 200 for chunk in chunks))
+
+    def test_oversized_definition_is_split_by_lines(self):
+        window = DiffWindow(first_line_number=0, diff=build_python_diff(1, 200))
+        chunks = DiffChunker(max_tokens=200, overlap_lines=0).split(window, "file.py")
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("\n".join(chunk.diff for chunk in chunks), window.diff)
+
+    def test_not_changed_file_content_is_chunked(self):
+        content = "\n".join(line[1:] for line in build_python_diff(10, 10).splitlines())
+        window = DiffWindow(first_line_number=0, diff=content, is_diff=False)
+        chunks = DiffChunker(max_tokens=200, overlap_lines=0).split(window, "file.py")
+        self.assertTrue(all(chunk.diff.startswith("def ") for chunk in chunks))
+        self.assertTrue(all(not chunk.is_diff for chunk in chunks))
+
+    def test_no_newline_marker_is_not_part_of_file(self):
+        diff_lines = (build_python_diff(3, 10) + "\n\\ No newline at end of file").splitlines()
+        self.assertEqual(get_chunk_boundaries(diff_lines, "file.py"), [0, 10, 20])
+
+
+class TestChunkedReviews(unittest.IsolatedAsyncioTestCase):
+    async def test_overlapping_comments_are_reported_once(self):
+        diff = build_python_diff(10, 10)
+        reviews = await get_reviews(
+            {"file.py": diff}, [EveryLineReviewer()], report_progress=False,
+            diff_chunker=DiffChunker(max_tokens=200, overlap_lines=5))
+        self.assertEqual([comment.line_number for comment in reviews[0].comments], list(range(100)))
@@ -0,0 +1,52 @@
+import unittest
+
+from ai_code_reviewer.estimate import (
+    ReviewCostEstimate, ReviewTaskEstimate, estimate_review_tasks, select_files_to_drop
+)
+from ai_code_reviewer.run_review import build_review_tasks
+from ai_code_reviewer.tokens import count_tokens, estimate_tokens
+from tests.test_fake_llm import build_fake_container
+
+
+def build_task_estimate(file_name: str, input_tokens: int) -> ReviewTaskEstimate:
+    return ReviewTaskEstimate(file_name=file_name, principle_names=["principle"], input_tokens=input_tokens,
+                              output_tokens=0)
+
+
+class TestCountTokens(unittest.TestCase):
+    def test_counts_tokens_offline(self):
+        self.assertGreater(count_tokens("def function():\n    return 1\n", "gpt-4-0125-preview"), 0)
+        self.assertEqual(count_tokens("", "unknown-model"), 0)
+        self.assertEqual(estimate_tokens("12345"), 2)
+
+
+class TestEstimateReviewTasks(unittest.TestCase):
+    def test_estimate_covers_all_calls(self):
+        container = build_fake_container()
+        review_tasks = build_review_tasks({"first.py": "+x = 1", "second.py": "+y = 2\n z = 3"}, container.reviewers())
+        estimate = estimate_review_tasks(review_tasks, "gpt-4-0125-preview", call_overhead_tokens=10,
+                                         expected_output_tokens=100)
+        self.assertEqual(estimate.calls, 4)
+        self.assertEqual(estimate.output_tokens, 400)
+        self.assertGreater(estimate.input_tokens, 4 * 10 + count_tokens("Single responsibility principle") * 4)
+        self.assertGreater(estimate.cost, 0)
+
+    def test_unknown_model_has_no_cost(self):
+        estimate = estimate_review_tasks([], "unknown-model")
+        self.assertIsNone(estimate.cost)
+
+
+class TestSelectFilesToDrop(unittest.TestCase):
+    def test_drops_least_changed_largest_files_first(self):
+        estimate = ReviewCostEstimate(
+            model_name="test",
+            tasks=[build_task_estimate("changed.py", 1000), build_task_estimate("small.py", 100),
+                   build_task_estimate("large.py", 2000)],
+            input_token_price=1.0,
+            output_token_price=1.0
+        )
+        per_file_diff = {"changed.py": "+x = 1", "small.py": " x = 1", "large.py": " x = 1"}
+        self.assertEqual(select_files_to_drop(estimate, per_file_diff, max_cost=3.1), [])
+        self.assertEqual(select_files_to_drop(estimate, per_file_diff, max_cost=1.1), ["large.py"])
+        self.assertEqual(select_files_to_drop(estimate, per_file_diff, max_cost=0.5),
+                         ["large.py", "small.py", "changed.py"])
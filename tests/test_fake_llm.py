@@ -0,0 +1,71 @@
+import json
+import unittest
+from pathlib import Path
+
+from langchain_community.callbacks import get_openai_callback
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from ai_code_reviewer.containers import Container, AppConfig
+from ai_code_reviewer.run_review import get_reviews
+from ai_code_reviewer.scheduler import ReviewScheduler
+
+
+def build_fake_container(**config) -> Container:
+    principle_path = Path(__file__).parents[0] / "data" / "single_responsibility.yaml"
+    return Container.from_config(
+        AppConfig(
+            principles_path=[principle_path, principle_path],
+            llm_model_name="gpt-4-0125-preview",
+            llm_backend="fake",
+            **config
+        )
+    )
+
+
+class TestFakeReviewBackend(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        mock_diff_path = Path(__file__).parent / "data" / "mock_diff.txt"
+        with open(mock_diff_path) as f:
+            self.test_diff = f.read()
+
+    async def test_review_is_deterministic(self):
+        first_reviews = await build_fake_container(fake_llm_comments_per_review=3).reviewers()[0].review_file_diff(
+            self.test_diff)
+        second_reviews = await build_fake_container(fake_llm_comments_per_review=3).reviewers()[0].review_file_diff(
+            self.test_diff)
+        self.assertEqual(len(first_reviews.comments), 3)
+        self.assertEqual(first_reviews, second_reviews)
+        line_count = len(self.test_diff.splitlines())
+        self.assertTrue(all(0 <= comment.line_number < line_count for comment in first_reviews.comments))
+
+    def test_line_numbers_are_taken_only_from_diff(self):
+        fake_llm = build_fake_container(fake_llm_comments_per_review=10).llm()
+        review_tool = {"type": "function", "function": {
+            "name": "review", "parameters": {"properties": {"comments": {"items": {}}}}}}
+        result = fake_llm.invoke(
+            [SystemMessage(content="Example:\n100: +import os\n101: +import sys"), HumanMessage(content="3: +x = 1")],
+            tools=[review_tool])
+        arguments = json.loads(result.additional_kwargs["tool_calls"][0]["function"]["arguments"])
+        self.assertEqual([comment["line_number"] for comment in arguments["comments"]], [3])
+
+    async def test_empty_review(self):
+        reviews = await build_fake_container().reviewers()[0].review_file_diff("")
+        self.assertEqual(len(reviews.comments), 0)
+
+    async def test_batched_review(self):
+        container = build_fake_container(max_principles_per_call=2, fake_llm_comments_per_review=4)
+        reviews = await get_reviews(
+            {"file.py": self.test_diff}, container.reviewers(), report_progress=False,
+            reviewer_batcher=container.reviewer_batcher())
+        self.assertEqual(len(reviews), 2)
+        self.assertTrue(all(review.error is None for review in reviews))
+
+    async def test_failures_are_retried_and_usage_is_tracked(self):
+        container = build_fake_container(fake_llm_failure_rate=0.5)
+        scheduler = ReviewScheduler(max_retries=20, initial_backoff_seconds=0.0, max_backoff_seconds=0.0)
+        with get_openai_callback() as callback:
+            reviews = await get_reviews(
+                {"file.py": self.test_diff}, container.reviewers(), report_progress=False, scheduler=scheduler)
+        self.assertTrue(all(review.error is None for review in reviews))
+        self.assertGreater(callback.prompt_tokens, 0)
+        self.assertGreater(callback.total_cost, 0)
@@ -0,0 +1,71 @@
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.utils import get_files_diff, get_git_dir, split_diff_by_file, unquote_git_path
+
+GIT_IDENTITY = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+class TestSplitDiffByFile(unittest.TestCase):
+    def test_unquote_git_path(self):
+        self.assertEqual(unquote_git_path("b/plain.py"), "b/plain.py")
+        self.assertEqual(unquote_git_path('"b/sp ace/\\303\\251.py"'), "b/sp ace/é.py")
+
+    def test_skips_deleted_and_binary_files(self):
+        diff_text = "\n".join([
+            "diff --git a/deleted.py b/deleted.py",
+            "deleted file mode 100644",
+            "--- a/deleted.py",
+            "+++ /dev/null",
+            "@@ -1 +0,0 @@",
+            "-x = 1",
+            "diff --git a/image.png b/image.png",
+            "Binary files a/image.png and b/image.png differ",
+            "diff --git a/kept.py b/kept.py",
+            "--- a/kept.py",
+            "+++ b/kept.py",
+            "@@ -1 +1 @@",
+            "-x = 1",
+            "+x = 2",
+        ])
+        self.assertEqual(split_diff_by_file(diff_text), {"kept.py": "-x = 1\n+x = 2"})
+
+
+class TestGetFilesDiff(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.repo_path = Path(self.temporary_dir.name)
+        subprocess.run(["git", "init", "-q", str(self.repo_path)], check=True)
+        (self.repo_path / "changed.py").write_text("a = 1\nb = 2\n")
+        (self.repo_path / "renamed.py").write_text("c = 3\n")
+        (self.repo_path / "deleted.py").write_text("d = 4\n")
+        self.git("add", "-A")
+        self.git(*GIT_IDENTITY, "commit", "-q", "-m", "initial")
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def git(self, *args: str):
+        subprocess.run(["git", "-C", str(self.repo_path), *args], check=True)
+
+    def test_single_pass_diff(self):
+        (self.repo_path / "changed.py").write_text("a = 1\nb = 3\n")
+        self.git("mv", "renamed.py", "new name.py")
+        (self.repo_path / "deleted.py").unlink()
+        files_diff = get_files_diff(self.repo_path, "HEAD")
+        self.assertEqual(files_diff, {"changed.py": " a = 1\n-b = 2\n+b = 3"})
+
+    def test_unknown_revision(self):
+        with self.assertRaises(ValueError):
+            get_files_diff(self.repo_path, "not_existing_revision")
+
+    def test_git_dir_of_worktree(self):
+        worktree_path = Path(self.temporary_dir.name) / "worktree"
+        self.git("worktree", "add", "-q", str(worktree_path))
+        self.assertTrue((worktree_path / ".git").is_file())
+        self.assertEqual(get_git_dir(self.repo_path), (self.repo_path / ".git").resolve())
+        self.assertEqual(get_git_dir(worktree_path).parent, (self.repo_path / ".git" / "worktrees").resolve())
+        with tempfile.TemporaryDirectory() as not_repo_dir:
+            self.assertIsNone(get_git_dir(Path(not_repo_dir)))
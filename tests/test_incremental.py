@@ -0,0 +1,140 @@
+import logging
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.cli import build_parser, run_review
+from ai_code_reviewer.incremental import (
+    IncrementalState, compute_blob_hash, remap_line_numbers, split_reviewed_files, build_incremental_state
+)
+from ai_code_reviewer.review import FileDiffComments, FileDiffComment
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import FileDiffReview
+from ai_code_reviewer.utils import get_git_dir
+
+GIT_IDENTITY = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+class NamedReviewer(Reviewer):
+    reviewer_name: str
+    cache_namespace: str = ""
+
+    @property
+    def name(self) -> str:
+        return self.reviewer_name
+
+
+def build_comments(*line_numbers: int) -> FileDiffComments:
+    return FileDiffComments(comments=[
+        FileDiffComment(
+            line_number=line_number,
+            comment="test_review",
+            suggestion="test suggestion",
+            implementation="test implementation",
+            citation_from_principle="test citation",
+            how_citation_violated="test violation",
+            on_the_other_hand="test opposition",
+            is_violating_principle=True
+        )
+        for line_number in line_numbers
+    ])
+
+
+class TestRemapLineNumbers(unittest.TestCase):
+    def test_remap_through_new_base(self):
+        old_diff = " a\n-b\n+c\n d"
+        new_diff = "-x\n a\n-b\n+c\n d"
+        remapped = remap_line_numbers(old_diff, new_diff, build_comments(0, 1, 2, 3))
+        self.assertEqual([comment.line_number for comment in remapped.comments], [1, 2, 3, 4])
+
+    def test_drops_comments_on_vanished_removed_lines(self):
+        remapped = remap_line_numbers(" a\n-b\n+c", " a\n+c", build_comments(1, 2))
+        self.assertEqual([comment.line_number for comment in remapped.comments], [1])
+
+
+class TestIncrementalState(unittest.TestCase):
+    def setUp(self):
+        self.reviewer = NamedReviewer(reviewer_name="principle")
+        self.per_file_diff = {"unchanged.py": "+a", "changed.py": "+b"}
+        self.blob_hashes = {"unchanged.py": compute_blob_hash(b"a\n"), "changed.py": compute_blob_hash(b"b\n")}
+        reviews = [
+            FileDiffReview(comments=build_comments(0).comments, author=self.reviewer, file_name="unchanged.py"),
+            FileDiffReview(comments=[], author=self.reviewer, file_name="changed.py"),
+        ]
+        self.state = build_incremental_state(
+            "HEAD", "settings", self.per_file_diff, self.blob_hashes, reviews, [self.reviewer])
+
+    def test_blob_hash_matches_git(self):
+        self.assertEqual(compute_blob_hash(b""), "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391")
+
+    def test_reuses_only_unchanged_files(self):
+        new_blob_hashes = dict(self.blob_hashes, **{"changed.py": compute_blob_hash(b"b2\n")})
+        reused_reviews, files_to_review = split_reviewed_files(
+            self.state, self.per_file_diff, new_blob_hashes, [self.reviewer])
+        self.assertEqual(list(files_to_review.keys()), ["changed.py"])
+        self.assertEqual(len(reused_reviews), 1)
+        self.assertEqual(reused_reviews[0].file_name, "unchanged.py")
+        self.assertIs(reused_reviews[0].author, self.reviewer)
+        self.assertEqual(len(reused_reviews[0].comments), 1)
+
+    def test_new_reviewer_requires_review(self):
+        new_reviewer = NamedReviewer(reviewer_name="new principle")
+        _, files_to_review = split_reviewed_files(
+            self.state, self.per_file_diff, self.blob_hashes, [self.reviewer, new_reviewer])
+        self.assertEqual(set(files_to_review.keys()), {"unchanged.py", "changed.py"})
+
+    def test_reviewer_with_other_model_requires_review(self):
+        reviewer = NamedReviewer(reviewer_name="principle", cache_namespace="openai:gpt-4o:0.0:1")
+        state = build_incremental_state(
+            "HEAD", "settings", self.per_file_diff, self.blob_hashes,
+            [FileDiffReview(comments=[], author=reviewer, file_name=file_name) for file_name in self.per_file_diff],
+            [reviewer])
+        other_model_reviewer = NamedReviewer(reviewer_name="principle", cache_namespace="openai:gpt-4o-mini:0.0:1")
+        _, files_to_review = split_reviewed_files(state, self.per_file_diff, self.blob_hashes, [other_model_reviewer])
+        self.assertEqual(set(files_to_review.keys()), {"unchanged.py", "changed.py"})
+
+    def test_state_is_compatible_only_with_same_settings(self):
+        self.assertTrue(self.state.is_compatible("HEAD", "settings"))
+        self.assertFalse(self.state.is_compatible("main", "settings"))
+        self.assertFalse(self.state.is_compatible("HEAD", "other settings"))
+
+    def test_failed_reviews_are_not_stored(self):
+        failed_review = FileDiffReview(comments=[], author=self.reviewer, file_name="changed.py", error="429")
+        state = build_incremental_state(
+            "HEAD", "settings", self.per_file_diff, self.blob_hashes, [failed_review], [self.reviewer])
+        self.assertEqual(state.files, {})
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            state_path = Path(temporary_dir) / "state.json"
+            self.state.save(state_path)
+            self.assertEqual(IncrementalState.load(state_path), self.state)
+            self.assertIsNone(IncrementalState.load(Path(temporary_dir) / "missing.json"))
+
+
+class TestIncrementalReviewInWorktree(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        repo_path = Path(self.temporary_dir.name) / "repo"
+        subprocess.run(["git", "init", "-q", str(repo_path)], check=True)
+        principles_path = repo_path / ".coding_principles"
+        principles_path.mkdir()
+        shutil.copy(Path(__file__).parent / "data" / "single_responsibility.yaml", principles_path)
+        (repo_path / "module.py").write_text("x = 1\n")
+        subprocess.run(["git", "-C", str(repo_path), "add", "-A"], check=True)
+        subprocess.run(["git", "-C", str(repo_path), *GIT_IDENTITY, "commit", "-q", "-m", "initial"], check=True)
+        self.worktree_path = Path(self.temporary_dir.name) / "worktree"
+        subprocess.run(["git", "-C", str(repo_path), "worktree", "add", "-q", str(self.worktree_path)], check=True)
+        (self.worktree_path / "module.py").write_text("x = 1\ny = 2\n")
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    async def test_state_is_saved_in_worktree_git_dir(self):
+        args = build_parser().parse_args(
+            ["--repo_path", str(self.worktree_path), "--llm_backend", "fake", "--no_cache", "--incremental"])
+        await run_review(args, logging.Logger("test"), {}, report_progress=False)
+        state = IncrementalState.load(get_git_dir(self.worktree_path) / "ai_code_reviewer_state.json")
+        self.assertEqual(list(state.files), ["module.py"])
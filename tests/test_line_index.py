@@ -0,0 +1,76 @@
+import unittest
+
+from ai_code_reviewer.line_index import DiffLineIndex, LineKind
+from ai_code_reviewer.review import FileDiffComment
+from ai_code_reviewer.run_review import FileDiffReview
+from ai_code_reviewer.utils import suppress_comments, map_comments_to_file_lines
+from tests.test_metrics import NamedFlakyReviewer
+
+TEST_DIFF = "\n".join([
+    " import os",
+    "-x = 1",
+    "+x = 2",
+    "+y = os.sep  # noqa",
+    " ",
+    "-z = 3",
+    " print(x)",
+])
+
+
+def build_review(line_numbers) -> FileDiffReview:
+    return FileDiffReview(
+        comments=[
+            FileDiffComment(
+                line_number=line_number,
+                comment="problem",
+                suggestion="fix it",
+                implementation="pass",
+                citation_from_principle="citation",
+                how_citation_violated="violated",
+                on_the_other_hand="",
+                is_violating_principle=True
+            )
+            for line_number in line_numbers
+        ],
+        author=NamedFlakyReviewer(),
+        file_name="file.py"
+    )
+
+
+class TestDiffLineIndex(unittest.TestCase):
+    def test_diff_index(self):
+        line_index = DiffLineIndex.from_diff(TEST_DIFF)
+        self.assertEqual(line_index.lines_count, 7)
+        self.assertEqual(line_index.line_kinds[:3], [LineKind.CONTEXT, LineKind.REMOVED, LineKind.ADDED])
+        self.assertEqual(line_index.noqa_line_numbers, {3})
+        self.assertEqual(line_index.new_file_positions, [0, 1, 1, 2, 3, 4, 4])
+        self.assertEqual(line_index.old_file_positions, [0, 1, 2, 2, 2, 3, 4])
+        self.assertEqual([line_index.get_line(line_number) for line_number in range(7)], TEST_DIFF.splitlines())
+
+    def test_no_newline_marker_has_no_file_position(self):
+        line_index = DiffLineIndex.from_diff(" a = 1\n+c = 3\n b = 2\n\\ No newline at end of file")
+        self.assertEqual(
+            line_index.line_kinds, [LineKind.CONTEXT, LineKind.ADDED, LineKind.CONTEXT, LineKind.MARKER])
+        self.assertTrue(line_index.is_added(1))
+        self.assertEqual(line_index.new_file_positions, [0, 1, 2, 3])
+        self.assertEqual(line_index.old_file_positions, [0, 1, 1, 2])
+
+    def test_raw_file_index(self):
+        line_index = DiffLineIndex.from_diff("import os\r\n\r\n-1\n", is_diff=False)
+        self.assertEqual(line_index.line_kinds, [LineKind.CONTEXT] * 3)
+        self.assertEqual(line_index.new_file_positions, [0, 1, 2])
+        self.assertEqual(line_index.get_line(2), "-1")
+
+    def test_suppress_not_changed_lines(self):
+        review = suppress_comments(
+            build_review([0, 1, 2, 3, 100]), DiffLineIndex.from_diff(TEST_DIFF), suppress_not_changed_lines=True)
+        self.assertEqual([comment.line_number for comment in review.comments], [2, 3])
+
+    def test_suppress_noqa_lines(self):
+        review = suppress_comments(
+            build_review([0, 2, 3, 100]), DiffLineIndex.from_diff(TEST_DIFF), suppress_noqa_lines=True)
+        self.assertEqual([comment.line_number for comment in review.comments], [0, 2, 100])
+
+    def test_comments_are_mapped_to_file_lines(self):
+        review = map_comments_to_file_lines(build_review([0, 2, 5, 6, 100]), DiffLineIndex.from_diff(TEST_DIFF))
+        self.assertEqual([comment.line_number for comment in review.comments], [0, 1, 4, 4, 100])
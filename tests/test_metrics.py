@@ -0,0 +1,75 @@
+import csv
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.metrics import RunMetrics, ReviewCallMetrics
+from ai_code_reviewer.run_review import get_reviews
+from ai_code_reviewer.scheduler import ReviewScheduler
+from tests.test_fake_llm import build_fake_container
+from tests.test_scheduler import FlakyReviewer
+
+
+class NamedFlakyReviewer(FlakyReviewer):
+    @property
+    def name(self) -> str:
+        return "flaky_reviewer"
+
+
+def build_call(file_name: str, principle_names: list, cost: float) -> ReviewCallMetrics:
+    return ReviewCallMetrics(
+        file_name=file_name, principle_names=principle_names, latency_seconds=1.0, llm_seconds=1.0, retries=0,
+        llm_requests=1, prompt_tokens=100, completion_tokens=10, cost=cost
+    )
+
+
+class TestRunMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = RunMetrics()
+        self.metrics.add_call(build_call("cheap.py", ["first", "second"], 0.2))
+        self.metrics.add_call(build_call("expensive.py", ["second"], 1.0))
+
+    def test_batched_call_usage_is_shared_between_principles(self):
+        principles_usage = self.metrics.get_principles_usage()
+        self.assertAlmostEqual(principles_usage["first"].cost, 0.1)
+        self.assertAlmostEqual(principles_usage["second"].cost, 1.1)
+        self.assertAlmostEqual(principles_usage["second"].prompt_tokens, 150)
+
+    def test_summary_ranks_most_expensive_first(self):
+        summary = self.metrics.format_summary()
+        self.assertLess(summary.index("expensive.py"), summary.index("cheap.py"))
+        self.assertLess(summary.index("second"), summary.index("first"))
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            json_path = Path(temporary_dir) / "metrics.json"
+            csv_path = Path(temporary_dir) / "metrics.csv"
+            self.metrics.save(json_path)
+            self.metrics.save(csv_path)
+            self.assertEqual(len(json.loads(json_path.read_text())["calls"]), 2)
+            with open(csv_path) as file:
+                rows = list(csv.DictReader(file))
+        self.assertEqual(rows[0]["principle_names"], "first;second")
+
+
+class TestReviewCallsInstrumentation(unittest.IsolatedAsyncioTestCase):
+    async def test_tokens_are_tracked_per_call(self):
+        container = build_fake_container()
+        metrics = RunMetrics()
+        await get_reviews(
+            {"first.py": "+x = 1", "second.py": "+y = 2"}, container.reviewers(), report_progress=False,
+            metrics=metrics)
+        self.assertEqual(len(metrics.calls), 4)
+        self.assertTrue(all(call.llm_requests == 1 and call.prompt_tokens > 0 for call in metrics.calls))
+        self.assertEqual(set(metrics.get_files_usage().keys()), {"first.py", "second.py"})
+
+    async def test_retries_are_counted(self):
+        metrics = RunMetrics()
+        scheduler = ReviewScheduler(initial_backoff_seconds=0.0)
+        await get_reviews(
+            {"file.py": "+x = 1"}, [NamedFlakyReviewer(failures_left=2)], report_progress=False, scheduler=scheduler,
+            metrics=metrics)
+        self.assertEqual(metrics.calls[0].retries, 2)
+        self.assertEqual(metrics.calls[0].llm_requests, 0)
+        self.assertIsNone(metrics.calls[0].error)
@@ -0,0 +1,91 @@
+import io
+import json
+import logging
+import unittest
+
+from ai_code_reviewer.output import (
+    GithubReviewWriter, JsonlReviewWriter, SarifReviewWriter, TextReviewWriter, format_github_annotation
+)
+from ai_code_reviewer.review import FileDiffComment
+from ai_code_reviewer.run_review import FileDiffReview
+from tests.test_metrics import NamedFlakyReviewer
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes_count = 0
+
+    def write(self, text: str) -> int:
+        self.writes_count += 1
+        return super().write(text)
+
+
+def build_comment(line_number: int, comment: str = "problem") -> FileDiffComment:
+    return FileDiffComment(
+        line_number=line_number,
+        comment=comment,
+        suggestion="fix it",
+        implementation="pass",
+        citation_from_principle="citation",
+        how_citation_violated="violated",
+        on_the_other_hand="",
+        is_violating_principle=True
+    )
+
+
+def build_review(file_name: str, comments_count: int) -> FileDiffReview:
+    return FileDiffReview(
+        comments=[build_comment(line_number) for line_number in range(comments_count)],
+        author=NamedFlakyReviewer(),
+        file_name=file_name
+    )
+
+
+class TestReviewWriters(unittest.TestCase):
+    def test_jsonl_is_written_once_per_review(self):
+        stream = CountingStream()
+        writer = JsonlReviewWriter(stream)
+        writer.write(build_review("a.py", 3))
+        writer.write(build_review("b.py", 0))
+        writer.write(build_review("c.py", 2))
+        writer.close()
+        self.assertEqual(stream.writes_count, 2)
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([record["file_name"] for record in records], ["a.py"] * 3 + ["c.py"] * 2)
+        self.assertEqual(records[0]["line_number"], 1)
+        self.assertEqual(records[0]["principle_name"], NamedFlakyReviewer().name)
+        self.assertEqual(records[0]["suggestion"], "fix it")
+
+    def test_github_annotation_is_escaped(self):
+        annotation = format_github_annotation("dir/a,b.py", "Rule: one", build_comment(4, "100% wrong\nreally"))
+        self.assertTrue(annotation.startswith("::warning file=dir/a%2Cb.py,line=5,title=Rule%3A one::100%25 wrong%0A"))
+        self.assertTrue(annotation.endswith("\n"))
+        self.assertEqual(annotation.count("\n"), 1)
+        stream = CountingStream()
+        GithubReviewWriter(stream).write(build_review("a.py", 3))
+        self.assertEqual(stream.writes_count, 1)
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+
+    def test_sarif_document(self):
+        stream = io.StringIO()
+        writer = SarifReviewWriter(stream)
+        writer.write(build_review("a.py", 2))
+        writer.write(build_review("/repo/b.py", 1))
+        writer.close()
+        sarif = json.loads(stream.getvalue())
+        self.assertEqual(sarif["version"], "2.1.0")
+        run = sarif["runs"][0]
+        self.assertEqual([rule["id"] for rule in run["tool"]["driver"]["rules"]], [NamedFlakyReviewer().name])
+        self.assertEqual(len(run["results"]), 3)
+        locations = [result["locations"][0]["physicalLocation"] for result in run["results"]]
+        self.assertEqual(locations[1]["artifactLocation"]["uri"], "a.py")
+        self.assertEqual(locations[1]["region"]["startLine"], 2)
+        self.assertEqual(locations[2]["artifactLocation"]["uri"], "file:///repo/b.py")
+
+    def test_text_is_logged_once_per_review(self):
+        logger = logging.Logger("test")
+        with self.assertLogs(logger, level=logging.WARNING) as logs:
+            TextReviewWriter(logger).write(build_review("a.py", 2))
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].getMessage().count("./a.py:"), 2)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.principles import (
+    PrincipleValidationError, PrinciplesBundle, list_principle_paths, load_principles
+)
+from ai_code_reviewer.tokens import count_tokens
+from tests.test_fake_llm import build_fake_container
+
+PRINCIPLE_PATH = Path(__file__).parent / "data" / "single_responsibility.yaml"
+
+
+class TestPrinciplesRegistry(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.principles_dir = Path(self.temporary_dir.name) / "principles"
+        self.principles_dir.mkdir()
+        self.principle_path = self.principles_dir / "single_responsibility.yaml"
+        shutil.copy(PRINCIPLE_PATH, self.principle_path)
+        (self.principles_dir / "notes.txt").write_text("not a principle")
+        self.bundle_path = Path(self.temporary_dir.name) / "cache" / "principles_bundle.json"
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def test_bundle_is_reused_while_files_are_not_changed(self):
+        principle_paths = list_principle_paths(self.principles_dir)
+        self.assertEqual(principle_paths, [self.principle_path])
+        compiled_principles = load_principles(principle_paths, self.bundle_path)
+        self.assertEqual(compiled_principles[0].principle.name, "Single responsibility principle")
+
+        bundle = PrinciplesBundle.load(self.bundle_path)
+        self.assertEqual(bundle.principles, compiled_principles)
+        bundle.principles[0].principle.description = "from bundle"
+        bundle.save(self.bundle_path)
+        self.assertEqual(load_principles(principle_paths, self.bundle_path)[0].principle.description, "from bundle")
+
+        os.utime(self.principle_path, ns=(0, 0))
+        self.assertEqual(load_principles(principle_paths, self.bundle_path)[0].principle.description, "from bundle")
+        self.assertEqual(PrinciplesBundle.load(self.bundle_path).principles[0].mtime_ns, 0)
+
+        self.principle_path.write_text(PRINCIPLE_PATH.read_text() + "\n# changed\n")
+        self.assertNotEqual(
+            load_principles(principle_paths, self.bundle_path)[0].principle.description, "from bundle")
+
+    def test_all_invalid_principles_are_reported(self):
+        (self.principles_dir / "malformed.yaml").write_text("principle_name: [unclosed")
+        (self.principles_dir / "incomplete.yaml").write_text("principle_name: incomplete")
+        (self.principles_dir / "node_types.yaml").write_text(
+            PRINCIPLE_PATH.read_text().replace("Single responsibility principle", "Other") + "\nnode_types: [Klass]\n")
+        shutil.copy(PRINCIPLE_PATH, self.principles_dir / "duplicate.yaml")
+        with self.assertRaises(PrincipleValidationError) as context:
+            load_principles(list_principle_paths(self.principles_dir), self.bundle_path)
+        errors = {Path(path).name: error for path, error in context.exception.errors.items()}
+        self.assertEqual(
+            set(errors), {"malformed.yaml", "incomplete.yaml", "node_types.yaml", "single_responsibility.yaml"})
+        self.assertIn("malformed yaml", errors["malformed.yaml"])
+        self.assertIn("principle_description", errors["incomplete.yaml"])
+        self.assertIn("Klass", errors["node_types.yaml"])
+        self.assertIn("duplicate.yaml", errors["single_responsibility.yaml"])
+        self.assertFalse(self.bundle_path.exists())
+
+
+class TestPrecomputedPrompt(unittest.TestCase):
+    def test_prompt_is_rendered_from_precomputed_parts(self):
+        reviewer = build_fake_container().reviewers()[0]
+        diff = "+first line\n second line"
+        prompt = reviewer.render_prompt(diff, 5)
+        self.assertIn("5: +first line\n6:  second line", prompt)
+        self.assertIn(reviewer.programming_principle.description, prompt)
+        self.assertAlmostEqual(reviewer.count_prompt_tokens(diff, 5), count_tokens(prompt), delta=2)
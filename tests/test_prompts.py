@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from langchain_core.load import dumps
+from langchain_core.prompts import ChatPromptTemplate
+
+from ai_code_reviewer.prompts import (
+    PromptSource, PRINCIPLE_CHECKING_PROMPT_NAME, REASONING_PROMPT_NAME, BATCHED_PRINCIPLES_PROMPT_NAME,
+    CANDIDATE_PROMPT_NAME, VERIFICATION_PROMPT_NAME
+)
+from ai_code_reviewer.prompts.loading import load_prompt, get_hub_prompt_cache_path
+
+
+class TestLocalPrompts(unittest.TestCase):
+    def test_principle_checking_prompt_variables(self):
+        prompt = load_prompt(PromptSource.LOCAL, PRINCIPLE_CHECKING_PROMPT_NAME)
+        self.assertEqual(set(prompt.input_variables), {
+            "enumerated_diff", "principle_name", "principle_description",
+            "review_required_examples", "review_not_required_examples"
+        })
+
+    def test_reasoning_prompt_variables(self):
+        prompt = load_prompt(PromptSource.LOCAL, REASONING_PROMPT_NAME)
+        self.assertEqual(set(prompt.input_variables), {"messages", "thought_tool_name"})
+
+    def test_batched_prompt_variables(self):
+        prompt = load_prompt(PromptSource.LOCAL, BATCHED_PRINCIPLES_PROMPT_NAME)
+        self.assertEqual(set(prompt.input_variables), {"enumerated_diff", "principles"})
+
+    def test_two_stage_prompt_variables(self):
+        principle_variables = {
+            "enumerated_diff", "principle_name", "principle_description",
+            "review_required_examples", "review_not_required_examples"
+        }
+        self.assertEqual(
+            set(load_prompt(PromptSource.LOCAL, CANDIDATE_PROMPT_NAME).input_variables), principle_variables)
+        self.assertEqual(
+            set(load_prompt(PromptSource.LOCAL, VERIFICATION_PROMPT_NAME).input_variables),
+            principle_variables | {"line_number", "candidate_reason"}
+        )
+
+    def test_hub_without_name_falls_back_to_local(self):
+        prompt = load_prompt(PromptSource.HUB, REASONING_PROMPT_NAME, hub_prompt_name=None)
+        self.assertIn("thought_tool_name", prompt.input_variables)
+
+
+class TestHubPromptCache(unittest.TestCase):
+    def test_pinned_prompt_is_loaded_from_cache(self):
+        cached_prompt = ChatPromptTemplate.from_messages([("human", "cached {enumerated_diff}")])
+        with tempfile.TemporaryDirectory() as cache_dir:
+            hub_prompt_name = "owner/prompt:0123abcd"
+            cache_path = get_hub_prompt_cache_path(hub_prompt_name, Path(cache_dir))
+            cache_path.parent.mkdir(parents=True)
+            cache_path.write_text(dumps(cached_prompt))
+            prompt = load_prompt(PromptSource.HUB, PRINCIPLE_CHECKING_PROMPT_NAME, hub_prompt_name, Path(cache_dir))
+        self.assertEqual(prompt, cached_prompt)
@@ -0,0 +1,79 @@
+import asyncio
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.repo_scan import iterate_repo_files, iterate_in_thread
+from ai_code_reviewer.review import FileDiffComments
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import iterate_reviews
+
+
+class NamedReviewer(Reviewer):
+    @property
+    def name(self) -> str:
+        return "test_reviewer_name"
+
+    async def review_file_diff(self, diff: str) -> FileDiffComments:
+        return FileDiffComments(comments=[])
+
+
+class TestIterateRepoFiles(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.repo_path = Path(self.temporary_dir.name)
+        self.write_file("main.py", "x = 1\n")
+        self.write_file("package/module.py", "y = 2\n")
+        self.write_file("README.md", "readme\n")
+        self.write_file("binary.py", "z = 3\0\n")
+        self.write_file("large.py", "w = 4\n" * 100)
+        self.write_file("node_modules/dependency.py", "ignored = 1\n")
+        self.write_file("build/generated.py", "ignored = 2\n")
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def write_file(self, file_name: str, content: str):
+        file_path = self.repo_path / file_name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+
+    def scan(self) -> dict:
+        return {
+            str(Path(file_name).relative_to(self.repo_path.absolute())): content
+            for file_name, content in iterate_repo_files(self.repo_path, {".py"}, max_file_size_bytes=100)
+        }
+
+    def test_git_repo_respects_gitignore(self):
+        subprocess.run(["git", "init", "-q", str(self.repo_path)], check=True)
+        self.write_file(".gitignore", "build/\n")
+        self.write_file("node_modules/.gitignore", "*\n")
+        self.assertEqual(self.scan(), {"main.py": "x = 1\n", "package/module.py": "y = 2\n"})
+
+    def test_not_git_repo_skips_known_dirs(self):
+        self.assertEqual(self.scan(), {"main.py": "x = 1\n", "package/module.py": "y = 2\n"})
+
+
+class TestStreamScannedFiles(unittest.IsolatedAsyncioTestCase):
+    async def test_reviews_scanned_files(self):
+        scanned_files = iter([("a.py", "x = 1"), ("b.py", "y = 2")])
+        reviews = [
+            review async for review in iterate_reviews(
+                iterate_in_thread(scanned_files), [NamedReviewer()], report_progress=False)
+        ]
+        self.assertEqual(sorted(review.file_name for review in reviews), ["a.py", "b.py"])
+
+    async def test_review_starts_before_scan_is_finished(self):
+        scan_finished = asyncio.Event()
+
+        async def slow_scan():
+            yield "a.py", "x = 1"
+            await scan_finished.wait()
+            yield "b.py", "y = 2"
+
+        review_stream = iterate_reviews(slow_scan(), [NamedReviewer()], report_progress=False)
+        first_review = await review_stream.__anext__()
+        self.assertEqual(first_review.file_name, "a.py")
+        scan_finished.set()
+        self.assertEqual([review.file_name async for review in review_stream], ["b.py"])
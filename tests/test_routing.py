@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ai_code_reviewer.llms.backends import LLM_BACKENDS, LlmSettings, build_llm
+from ai_code_reviewer.reviewers.routing import PrinciplePriority
+from ai_code_reviewer.scheduler import ReviewScheduler, FAST_ROUTE, STRONG_ROUTE
+from ai_code_reviewer.utils import add_line_numbers
+from tests.test_fake_llm import build_fake_container
+
+SMALL_DIFF = "+x = 1\n+y = 2"
+
+
+class TestLlmBackends(unittest.TestCase):
+    def test_registry(self):
+        self.assertTrue({"openai", "azure", "local", "fake"}.issubset(LLM_BACKENDS))
+        self.assertEqual(LLM_BACKENDS["openai"].api_key_env_var, "OPENAI_API_KEY")
+        self.assertIsNone(LLM_BACKENDS["local"].api_key_env_var)
+
+    def test_local_backend_uses_base_url(self):
+        llm = build_llm(LlmSettings(backend="local", model_name="llama", base_url="http://localhost:8080/v1"))
+        self.assertEqual(llm.openai_api_base, "http://localhost:8080/v1")
+        with self.assertRaises(ValueError):
+            build_llm(LlmSettings(backend="local", model_name="llama"))
+
+    def test_local_backend_does_not_send_openai_key(self):
+        settings = LlmSettings(backend="local", model_name="llama", base_url="http://localhost:8080/v1")
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "sk-openai"}):
+            os.environ.pop("LOCAL_LLM_API_KEY", None)
+            self.assertEqual(build_llm(settings).openai_api_key.get_secret_value(), "EMPTY")
+            os.environ["LOCAL_LLM_API_KEY"] = "local-key"
+            self.assertEqual(build_llm(settings).openai_api_key.get_secret_value(), "local-key")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            build_llm(LlmSettings(backend="unknown", model_name="model"))
+
+
+class TestReviewRouting(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.container = build_fake_container(
+            fast_llm_backend="fake", fast_llm_model_name="fast-model", max_fast_diff_tokens=100,
+            cache_dir=Path(self.temporary_dir.name))
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def test_routing_policy(self):
+        router = self.container.review_router()
+        large_diff = SMALL_DIFF * 200
+        self.assertEqual(router.select_route(SMALL_DIFF, [PrinciplePriority.NORMAL]), FAST_ROUTE)
+        self.assertEqual(router.select_route(large_diff, [PrinciplePriority.NORMAL]), STRONG_ROUTE)
+        self.assertEqual(router.select_route(large_diff, [PrinciplePriority.LOW]), FAST_ROUTE)
+        self.assertEqual(router.select_route(SMALL_DIFF, [PrinciplePriority.LOW, PrinciplePriority.HIGH]), STRONG_ROUTE)
+
+    def test_no_router_without_fast_backend(self):
+        reviewer = build_fake_container().reviewers()[0]
+        self.assertIsNone(reviewer.review_router)
+        self.assertIsNone(reviewer.get_route(SMALL_DIFF))
+
+    async def test_routes_are_cached_in_separate_namespaces(self):
+        reviewer = self.container.reviewers()[0]
+        router = self.container.review_router()
+        self.assertNotEqual(reviewer.cache_namespace, router.fast_cache_namespace)
+        large_diff = "\n".join(f"+value_{line} = {line}" for line in range(200))
+        await reviewer.review_file_diff(SMALL_DIFF)
+        await reviewer.review_file_diff(large_diff)
+        review_cache = self.container.review_cache()
+        self.assertIsNotNone(review_cache.get(
+            reviewer._get_cache_key(add_line_numbers(SMALL_DIFF), router.fast_cache_namespace)))
+        self.assertIsNone(review_cache.get(reviewer._get_cache_key(add_line_numbers(SMALL_DIFF))))
+        self.assertIsNotNone(review_cache.get(reviewer._get_cache_key(add_line_numbers(large_diff))))
+
+    async def test_batched_reviewer_is_routed(self):
+        container = build_fake_container(
+            fast_llm_backend="fake", fast_llm_model_name="fast-model", max_principles_per_call=2)
+        reviewers = container.reviewers()
+        batched_reviewer = container.reviewer_batcher().batch(reviewers, SMALL_DIFF)[0]
+        self.assertEqual(batched_reviewer.get_route(SMALL_DIFF), FAST_ROUTE)
+        reviewers[1].programming_principle.priority = PrinciplePriority.HIGH
+        self.assertEqual(batched_reviewer.get_route(SMALL_DIFF), STRONG_ROUTE)
+
+
+class TestRouteConcurrency(unittest.IsolatedAsyncioTestCase):
+    async def test_route_concurrency_is_limited(self):
+        scheduler = ReviewScheduler(max_concurrency=10, route_concurrency={FAST_ROUTE: 2})
+        running = {FAST_ROUTE: 0, STRONG_ROUTE: 0}
+        max_running = {FAST_ROUTE: 0, STRONG_ROUTE: 0}
+
+        async def job(route: str):
+            running[route] += 1
+            max_running[route] = max(max_running[route], running[route])
+            await asyncio.sleep(0.01)
+            running[route] -= 1
+
+        await asyncio.gather(*(
+            scheduler.run(lambda route=route: job(route), route=route)
+            for route in [FAST_ROUTE, STRONG_ROUTE] * 6
+        ))
+        self.assertEqual(max_running[FAST_ROUTE], 2)
+        self.assertEqual(max_running[STRONG_ROUTE], 6)
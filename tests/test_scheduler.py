@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from ai_code_reviewer.review import FileDiffComments
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import get_reviews
+from ai_code_reviewer.scheduler import ReviewScheduler, get_retry_after_seconds, is_retryable_error
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int, headers: dict = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FlakyReviewer(Reviewer):
+    failures_left: int = 0
+    status_code: int = 429
+
+    def name(self) -> str:
+        return "flaky_reviewer"
+
+    async def review_file_diff(self, diff: str) -> FileDiffComments:
+        if self.failures_left > 0:
+            self.failures_left -= 1
+            raise FakeStatusError(self.status_code)
+        return FileDiffComments(comments=[])
+
+
+class TestRetryClassification(unittest.TestCase):
+    def test_retryable_status_codes(self):
+        self.assertTrue(is_retryable_error(FakeStatusError(429)))
+        self.assertTrue(is_retryable_error(FakeStatusError(503)))
+        self.assertFalse(is_retryable_error(FakeStatusError(400)))
+        self.assertFalse(is_retryable_error(ValueError("bad output")))
+
+    def test_retry_after_headers(self):
+        self.assertEqual(get_retry_after_seconds(FakeStatusError(429, {"retry-after": "3"})), 3.0)
+        self.assertEqual(get_retry_after_seconds(FakeStatusError(429, {"retry-after-ms": "1500"})), 1.5)
+        self.assertIsNone(get_retry_after_seconds(FakeStatusError(429)))
+
+
+class TestReviewScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_is_bounded(self):
+        scheduler = ReviewScheduler(max_concurrency=2)
+        in_flight = 0
+        max_in_flight = 0
+
+        async def job() -> int:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return 1
+
+        results = await asyncio.gather(*[scheduler.run(job) for _ in range(10)])
+        self.assertEqual(sum(results), 10)
+        self.assertEqual(max_in_flight, 2)
+
+    async def test_retries_rate_limited_review(self):
+        scheduler = ReviewScheduler(initial_backoff_seconds=0.001)
+        reviewer = FlakyReviewer(failures_left=2)
+        reviews = await get_reviews({"file.py": "+ x = 1"}, [reviewer], report_progress=False, scheduler=scheduler)
+        self.assertIsNone(reviews[0].error)
+
+    async def test_reports_permanent_failure(self):
+        scheduler = ReviewScheduler(initial_backoff_seconds=0.001, max_retries=1)
+        reviewer = FlakyReviewer(failures_left=5)
+        reviews = await get_reviews({"file.py": "+ x = 1"}, [reviewer], report_progress=False, scheduler=scheduler)
+        self.assertIn("FakeStatusError", reviews[0].error)
+        self.assertEqual(reviewer.failures_left, 3)
+
+    async def test_does_not_retry_client_errors(self):
+        scheduler = ReviewScheduler(initial_backoff_seconds=0.001)
+        reviewer = FlakyReviewer(failures_left=5, status_code=400)
+        reviews = await get_reviews({"file.py": "+ x = 1"}, [reviewer], report_progress=False, scheduler=scheduler)
+        self.assertIsNotNone(reviews[0].error)
+        self.assertEqual(reviewer.failures_left, 4)
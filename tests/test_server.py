@@ -0,0 +1,138 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.cli import build_parser, get_container
+from ai_code_reviewer.containers import AppConfig
+from ai_code_reviewer.server import serve, request_review
+
+GIT_IDENTITY = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+
+class TestReviewServer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.repo_path = Path(self.temporary_dir.name) / "repo"
+        self.socket_path = Path(self.temporary_dir.name) / "server.sock"
+        subprocess.run(["git", "init", "-q", str(self.repo_path)], check=True)
+        principles_path = self.repo_path / ".coding_principles"
+        principles_path.mkdir()
+        shutil.copy(Path(__file__).parent / "data" / "single_responsibility.yaml", principles_path)
+        (self.repo_path / "module.py").write_text("x = 1\n")
+        subprocess.run(["git", "-C", str(self.repo_path), "add", "-A"], check=True)
+        subprocess.run(["git", "-C", str(self.repo_path), *GIT_IDENTITY, "commit", "-q", "-m", "initial"], check=True)
+        (self.repo_path / "module.py").write_text("x = 1\ny = 2\n")
+        self.handler = ListHandler()
+        self.logger = logging.Logger("test")
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    async def test_reviews_are_streamed_from_server(self):
+        server_task = asyncio.create_task(serve(self.socket_path, logging.Logger("server")))
+        while not self.socket_path.exists():
+            await asyncio.sleep(0.01)
+        args = build_parser().parse_args([
+            "--repo_path", str(self.repo_path), "--llm_backend", "fake", "--no_cache", "--use_server",
+            "--socket_path", str(self.socket_path)
+        ])
+        try:
+            self.assertTrue(await request_review(self.socket_path, args, self.logger))
+            self.assertTrue(await request_review(self.socket_path, args, self.logger))
+        finally:
+            server_task.cancel()
+            await asyncio.gather(server_task, return_exceptions=True)
+        warnings = [message for message in self.handler.messages if "principle warning" in message]
+        self.assertEqual(len(warnings), 2)
+        self.assertEqual(len([message for message in self.handler.messages if "Review completed" in message]), 2)
+
+    async def wait_for_server(self, server_task: asyncio.Task):
+        while not self.socket_path.exists() and not server_task.done():
+            await asyncio.sleep(0.01)
+
+    async def test_running_server_is_not_replaced(self):
+        server_task = asyncio.create_task(serve(self.socket_path, logging.Logger("server")))
+        await self.wait_for_server(server_task)
+        try:
+            self.assertEqual(self.socket_path.stat().st_mode & 0o777, 0o600)
+            await serve(self.socket_path, self.logger)
+            self.assertIn(f"Review server is already running on {self.socket_path}.", self.handler.messages)
+            self.assertFalse(server_task.done())
+        finally:
+            server_task.cancel()
+            await asyncio.gather(server_task, return_exceptions=True)
+
+    async def test_stale_socket_is_replaced(self):
+        stale_socket = socket.socket(socket.AF_UNIX)
+        stale_socket.bind(str(self.socket_path))
+        stale_socket.close()
+        server_task = asyncio.create_task(serve(self.socket_path, self.logger))
+        while not any("is listening" in message for message in self.handler.messages) and not server_task.done():
+            await asyncio.sleep(0.01)
+        try:
+            self.assertFalse(server_task.done())
+        finally:
+            server_task.cancel()
+            await asyncio.gather(server_task, return_exceptions=True)
+
+    async def test_shared_socket_dir_is_refused(self):
+        shared_dir = Path(self.temporary_dir.name) / "shared"
+        shared_dir.mkdir()
+        os.chmod(shared_dir, 0o777)
+        await serve(shared_dir / "server.sock", self.logger)
+        self.assertFalse((shared_dir / "server.sock").exists())
+        self.assertTrue(any("not writable by others" in message for message in self.handler.messages))
+
+    async def test_falls_back_without_server(self):
+        args = build_parser().parse_args(["--repo_path", str(self.repo_path)])
+        self.assertFalse(await request_review(self.socket_path, args, self.logger))
+
+    async def test_machine_readable_output_is_streamed_from_server(self):
+        server_task = asyncio.create_task(serve(self.socket_path, logging.Logger("server")))
+        while not self.socket_path.exists():
+            await asyncio.sleep(0.01)
+        args = build_parser().parse_args([
+            "--repo_path", str(self.repo_path), "--llm_backend", "fake", "--no_cache", "--use_server",
+            "--socket_path", str(self.socket_path), "--output_format", "jsonl"
+        ])
+        output_stream = io.StringIO()
+        try:
+            self.assertTrue(await request_review(self.socket_path, args, self.logger, output_stream))
+        finally:
+            server_task.cancel()
+            await asyncio.gather(server_task, return_exceptions=True)
+        comments = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+        self.assertEqual(len(comments), 1)
+        self.assertEqual(comments[0]["file_name"], "module.py")
+
+
+class TestContainerCache(unittest.TestCase):
+    def test_container_is_replaced_after_principle_change(self):
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            principle_path = Path(temporary_dir) / "single_responsibility.yaml"
+            shutil.copy(Path(__file__).parent / "data" / "single_responsibility.yaml", principle_path)
+            app_config = AppConfig(principles_path=[principle_path], llm_model_name="gpt-4o", llm_backend="fake")
+            containers = {}
+            first_container = get_container(app_config, containers)
+            self.assertIs(get_container(app_config, containers), first_container)
+            os.utime(principle_path, ns=(0, 0))
+            self.assertIsNot(get_container(app_config, containers), first_container)
+            self.assertEqual(len(containers), 1)
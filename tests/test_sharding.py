@@ -0,0 +1,132 @@
+import io
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.cli import build_merge_parser, build_parser, merge_shards, run_review
+from ai_code_reviewer.sharding import Shard, ShardResult, ShardWorkItem, assign_shards, get_missing_shards
+
+GIT_IDENTITY = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+def build_work_items(count: int):
+    return [
+        ShardWorkItem(file_name=f"module_{index}.py", principle_name="principle", tokens=100 + index * 7 % 31)
+        for index in range(count)
+    ]
+
+
+class TestShardAssignment(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(Shard.parse("2/3"), Shard(index=2, count=3))
+        for shard_text in ("0/3", "4/3", "1", "a/b"):
+            with self.assertRaises(ValueError):
+                Shard.parse(shard_text)
+
+    def test_partition_is_complete_disjoint_and_balanced(self):
+        work_items = build_work_items(50)
+        shards = assign_shards(work_items, 4)
+        assigned_items = [(item.file_name, item.principle_name) for shard in shards for item in shard]
+        self.assertEqual(len(assigned_items), len(set(assigned_items)))
+        self.assertEqual(set(assigned_items), {(item.file_name, item.principle_name) for item in work_items})
+        shard_tokens = [sum(item.tokens for item in shard) for shard in shards]
+        self.assertLessEqual(max(shard_tokens) - min(shard_tokens), max(item.tokens for item in work_items))
+
+    def test_partition_does_not_depend_on_order(self):
+        work_items = build_work_items(20)
+        shards = assign_shards(work_items, 3)
+        reversed_shards = assign_shards(list(reversed(work_items)), 3)
+        self.assertEqual(shards, reversed_shards)
+
+    def test_missing_shards(self):
+        shard_results = [ShardResult(shard=Shard(index=2, count=3), per_file_diff={}, reviews=[])]
+        self.assertEqual(get_missing_shards(shard_results), [Shard(index=1, count=3), Shard(index=3, count=3)])
+        other_count_result = ShardResult(shard=Shard(index=1, count=2), per_file_diff={}, reviews=[])
+        with self.assertRaises(ValueError):
+            get_missing_shards(shard_results + [other_count_result])
+
+
+class TestShardedReview(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.repo_path = Path(self.temporary_dir.name) / "repo"
+        subprocess.run(["git", "init", "-q", str(self.repo_path)], check=True)
+        principles_path = self.repo_path / ".coding_principles"
+        principles_path.mkdir()
+        principle_path = Path(__file__).parent / "data" / "single_responsibility.yaml"
+        shutil.copy(principle_path, principles_path)
+        (principles_path / "other.yaml").write_text(
+            principle_path.read_text().replace("Single responsibility principle", "Other principle"))
+        for index in range(5):
+            (self.repo_path / f"module_{index}.py").write_text("x = 1\n")
+        subprocess.run(["git", "-C", str(self.repo_path), "add", "-A"], check=True)
+        subprocess.run(["git", "-C", str(self.repo_path), *GIT_IDENTITY, "commit", "-q", "-m", "initial"], check=True)
+        for index in range(5):
+            (self.repo_path / f"module_{index}.py").write_text("x = 1\n" + "y = 2\n" * (index + 1))
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    async def review(self, *arguments: str) -> list:
+        output_stream = io.StringIO()
+        args = build_parser().parse_args([
+            "--repo_path", str(self.repo_path), "--llm_backend", "fake", "--no_cache", "--output_format", "jsonl",
+            *arguments
+        ])
+        await run_review(args, logging.Logger("test"), {}, report_progress=False, output_stream=output_stream)
+        return [json.loads(line) for line in output_stream.getvalue().splitlines()]
+
+    async def test_merged_shards_match_unsharded_review(self):
+        expected_comments = await self.review()
+        self.assertGreater(len(expected_comments), 0)
+        shard_paths = [Path(self.temporary_dir.name) / f"shard_{index}.json" for index in range(1, 4)]
+        sharded_comments = []
+        for index, shard_path in enumerate(shard_paths, start=1):
+            sharded_comments.extend(await self.review("--shard", f"{index}/3", "--shard_out", str(shard_path)))
+        output_stream = io.StringIO()
+        merge_shards(
+            build_merge_parser().parse_args([*map(str, shard_paths), "--output_format", "jsonl"]),
+            logging.Logger("test"),
+            output_stream
+        )
+        merged_comments = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+
+        def sort_key(comment: dict):
+            return comment["file_name"], comment["principle_name"], comment["line_number"]
+        self.assertEqual(sorted(sharded_comments, key=sort_key), sorted(expected_comments, key=sort_key))
+        self.assertEqual(sorted(merged_comments, key=sort_key), sorted(expected_comments, key=sort_key))
+
+    async def test_ignored_flags_are_reported(self):
+        args = build_parser().parse_args([
+            "--repo_path", str(self.repo_path), "--llm_backend", "fake", "--no_cache", "--dry_run", "--incremental",
+            "--include_not_changed_files", "--context_lines", "3"
+        ])
+        with self.assertLogs("test", level="WARNING") as logs:
+            await run_review(args, logging.getLogger("test"), {}, report_progress=False)
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("--incremental is ignored", logs.output[0])
+        self.assertIn("--context_lines is ignored", logs.output[1])
+
+    def test_unreadable_shard_results_are_reported(self):
+        shard_path = Path(self.temporary_dir.name) / "shard_1.json"
+        ShardResult(shard=Shard(index=1, count=2), per_file_diff={}, reviews=[]).save(shard_path)
+        invalid_path = Path(self.temporary_dir.name) / "invalid.json"
+        invalid_path.write_text("{}")
+        other_count_path = Path(self.temporary_dir.name) / "other_count.json"
+        ShardResult(shard=Shard(index=1, count=3), per_file_diff={}, reviews=[]).save(other_count_path)
+        with self.assertLogs("test", level="WARNING") as logs:
+            merge_shards(
+                build_merge_parser().parse_args([str(shard_path), "missing.json", str(invalid_path)]),
+                logging.getLogger("test"), io.StringIO())
+        self.assertIn("Can not read shard result missing.json", logs.output[0])
+        self.assertIn(f"Can not read shard result {invalid_path}", logs.output[1])
+        self.assertIn("Results of shards 2/2 are missing", logs.output[2])
+        with self.assertLogs("test", level="ERROR") as logs:
+            merge_shards(
+                build_merge_parser().parse_args([str(shard_path), str(other_count_path)]),
+                logging.getLogger("test"), io.StringIO())
+        self.assertIn("different shard counts", logs.output[0])
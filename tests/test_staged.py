@@ -0,0 +1,85 @@
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.cache import ReviewCache
+from ai_code_reviewer.cli import CACHE_STATE_DIR_NAME, PRINCIPLES_BUNDLE_FILE_NAME, build_parser, run_review
+from ai_code_reviewer.incremental import read_index_blob_hashes
+from ai_code_reviewer.staged import get_staged_diff
+from tests.test_startup import HEAVY_MODULES, get_imported_top_level_modules
+
+GIT_IDENTITY = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+class TestStagedReview(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.repo_path = Path(self.temporary_dir.name) / "repo"
+        subprocess.run(["git", "init", "-q", str(self.repo_path)], check=True)
+        principles_path = self.repo_path / ".coding_principles"
+        principles_path.mkdir()
+        shutil.copy(Path(__file__).parent / "data" / "single_responsibility.yaml", principles_path)
+        (self.repo_path / "module.py").write_text("x = 1\n")
+        (self.repo_path / "other.py").write_text("z = 1\n")
+        self.git("add", "-A")
+        self.git(*GIT_IDENTITY, "commit", "-q", "-m", "initial")
+        (self.repo_path / "module.py").write_text("x = 1\nstaged = 2\n")
+        self.git("add", "module.py")
+        (self.repo_path / "module.py").write_text("x = 1\nstaged = 2\nnot_staged = 3\n")
+        (self.repo_path / "other.py").write_text("z = 2\n")
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def git(self, *arguments: str):
+        subprocess.run(["git", "-C", str(self.repo_path), *arguments], check=True)
+
+    def test_staged_diff_is_read_from_index(self):
+        per_file_diff = get_staged_diff(self.repo_path, {".py"})
+        self.assertEqual(list(per_file_diff), ["module.py"])
+        self.assertIn("+staged = 2", per_file_diff["module.py"])
+        self.assertNotIn("not_staged", per_file_diff["module.py"])
+        self.assertEqual(get_staged_diff(self.repo_path, {".js"}), {})
+        staged_blob_hash = subprocess.run(
+            ["git", "-C", str(self.repo_path), "rev-parse", ":module.py"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        self.assertEqual(read_index_blob_hashes(self.repo_path, ["module.py"]), {"module.py": staged_blob_hash})
+
+    async def test_repeated_review_is_reported_without_llm_setup(self):
+        review_arguments = ["--repo_path", str(self.repo_path), "--llm_backend", "fake", "--staged",
+                            "--output_format", "jsonl"]
+        output_stream = io.StringIO()
+        containers = {}
+        await run_review(
+            build_parser().parse_args(review_arguments), logging.Logger("test"), containers,
+            report_progress=False, output_stream=output_stream)
+        self.assertEqual(len(containers), 1)
+        comments = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+        self.assertEqual([comment["file_name"] for comment in comments], ["module.py"])
+        cache_dir = self.repo_path / ".git" / "ai_code_reviewer_cache"
+        ReviewCache(cache_dir=cache_dir, max_size_bytes=0).evict()
+        self.assertTrue((cache_dir / CACHE_STATE_DIR_NAME / PRINCIPLES_BUNDLE_FILE_NAME).is_file())
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "ai_code_reviewer.cli", *review_arguments],
+            capture_output=True, text=True,
+            env={"PYTHONPATH": str(Path(__file__).parents[1]), "PATH": os.environ["PATH"]}
+        )
+        self.assertIn("Staged changes were already reviewed", result.stderr)
+        self.assertEqual(get_imported_top_level_modules(result.stderr).intersection(HEAVY_MODULES), set())
+        self.assertEqual([json.loads(line) for line in result.stdout.splitlines()], comments)
+
+        (self.repo_path / ".coding_principles" / "single_responsibility.yaml").write_text(
+            (Path(__file__).parent / "data" / "single_responsibility.yaml").read_text() + "\n# changed\n")
+        containers = {}
+        await run_review(
+            build_parser().parse_args(review_arguments), logging.Logger("test"), containers,
+            report_progress=False, output_stream=io.StringIO())
+        self.assertEqual(len(containers), 1)
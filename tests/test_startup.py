@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_community", "langchain_openai", "openai",
+                 "dependency_injector", "yid_langchain_extensions", "git")
+
+
+def get_imported_top_level_modules(importtime_output: str) -> set:
+    return {
+        line.split("|")[-1].strip().split(".")[0]
+        for line in importtime_output.splitlines() if line.startswith("import time:")
+    }
+
+
+class TestLazyStartup(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = Path(__file__).parents[1]
+        self.env = {
+            "PYTHONPATH": str(self.repo_path),
+            "PATH": os.environ["PATH"]
+        }
+
+    def run_cli(self, *cli_args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "ai_code_reviewer.cli", *cli_args],
+            capture_output=True, text=True, cwd=str(self.repo_path), env=self.env
+        )
+
+    def assert_no_heavy_imports(self, result: subprocess.CompletedProcess):
+        imported_modules = get_imported_top_level_modules(result.stderr)
+        self.assertEqual(imported_modules.intersection(HEAVY_MODULES), set())
+
+    def test_help(self):
+        result = self.run_cli("--help")
+        self.assertIn("Review code against programming principles", result.stdout)
+        self.assert_no_heavy_imports(result)
+
+    def test_missing_api_key(self):
+        result = self.run_cli("--repo_path", str(self.repo_path))
+        self.assertIn("No OPENAI_API_KEY found", result.stderr)
+        self.assert_no_heavy_imports(result)
+
+    def test_empty_principles(self):
+        with tempfile.TemporaryDirectory() as principles_dir:
+            self.env["OPENAI_API_KEY"] = "test-key"
+            result = self.run_cli("--repo_path", str(self.repo_path), "--custom_principles_path", principles_dir)
+        self.assertIn("No review principles found", result.stderr)
+        self.assert_no_heavy_imports(result)
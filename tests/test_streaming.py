@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from ai_code_reviewer.review import FileDiffComments
+from ai_code_reviewer.reviewers.base import Reviewer
+from ai_code_reviewer.run_review import iterate_reviews
+
+
+class DelayedReviewer(Reviewer):
+    reviewer_name: str
+    delay_seconds: float
+    finished: bool = False
+    cancelled: bool = False
+
+    @property
+    def name(self) -> str:
+        return self.reviewer_name
+
+    async def review_file_diff(self, diff: str) -> FileDiffComments:
+        try:
+            await asyncio.sleep(self.delay_seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        self.finished = True
+        return FileDiffComments(comments=[])
+
+
+class TestIterateReviews(unittest.IsolatedAsyncioTestCase):
+    async def test_reviews_are_yielded_as_completed(self):
+        slow_reviewer = DelayedReviewer(reviewer_name="slow", delay_seconds=0.05)
+        fast_reviewer = DelayedReviewer(reviewer_name="fast", delay_seconds=0.0)
+        reviews = [
+            review async for review in iterate_reviews(
+                {"file.py": "+ x = 1"}, [slow_reviewer, fast_reviewer], report_progress=False)
+        ]
+        self.assertEqual([review.author.name for review in reviews], ["fast", "slow"])
+
+    async def test_closing_stream_cancels_pending_reviews(self):
+        slow_reviewer = DelayedReviewer(reviewer_name="slow", delay_seconds=10)
+        fast_reviewer = DelayedReviewer(reviewer_name="fast", delay_seconds=0.0)
+        review_stream = iterate_reviews(
+            {"file.py": "+ x = 1"}, [slow_reviewer, fast_reviewer], report_progress=False)
+        first_review = await review_stream.__anext__()
+        await review_stream.aclose()
+        self.assertEqual(first_review.author.name, "fast")
+        self.assertTrue(slow_reviewer.cancelled)
+        self.assertFalse(slow_reviewer.finished)
@@ -0,0 +1,125 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.symbol_index import (
+    EMPTY_PROJECT_CONTEXT, SymbolIndex, build_project_context, extract_file_symbols, update_symbol_index
+)
+from ai_code_reviewer.tokens import estimate_tokens
+from tests.test_fake_llm import build_fake_container
+
+LIBRARY_SOURCE = """import os
+
+
+def load_config(path: str) -> dict:
+    return {"path": os.path.abspath(path)}
+
+
+class Parser:
+    def parse(self, text):
+        return text.split()
+"""
+APP_SOURCE = """from library import load_config
+
+
+def parse(text):
+    return text.split()
+
+
+def run():
+    return load_config("config.yaml")
+"""
+APP_DIFF = """ from library import load_config
+
+
++def parse(text):
++    return text.split()
++
++
+ def run():
+-    return {}
++    return load_config("config.yaml")"""
+
+
+class TestSymbolIndex(unittest.TestCase):
+    def setUp(self):
+        self.temporary_dir = tempfile.TemporaryDirectory()
+        self.repo_path = Path(self.temporary_dir.name) / "repo"
+        self.repo_path.mkdir()
+        (self.repo_path / "library.py").write_text(LIBRARY_SOURCE)
+        (self.repo_path / "app.py").write_text(APP_SOURCE)
+        (self.repo_path / "notes.txt").write_text("def not_python(): pass")
+        self.index_path = Path(self.temporary_dir.name) / "cache" / "symbol_index.json"
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    def test_symbols_are_extracted(self):
+        file_symbols = extract_file_symbols(LIBRARY_SOURCE)
+        self.assertEqual(
+            [(definition.qualified_name, definition.line_number) for definition in file_symbols.definitions],
+            [("load_config", 4), ("Parser", 8), ("Parser.parse", 9)])
+        self.assertEqual(file_symbols.definitions[0].signature, "def load_config(path: str) -> dict")
+        self.assertEqual(file_symbols.imported_names, ["os"])
+        self.assertEqual(file_symbols.called_names, {"abspath": 1, "split": 1})
+        self.assertIsNone(extract_file_symbols("def broken("))
+
+    def test_index_is_updated_incrementally(self):
+        index = update_symbol_index(self.repo_path, self.index_path)
+        self.assertEqual(set(index.files), {"library.py", "app.py"})
+
+        cached_index = SymbolIndex.load(self.index_path)
+        cached_index.files["library.py"].imported_names = ["from_cache"]
+        cached_index.save(self.index_path)
+        index = update_symbol_index(self.repo_path, self.index_path)
+        self.assertEqual(index.files["library.py"].imported_names, ["from_cache"])
+
+        (self.repo_path / "library.py").write_text(LIBRARY_SOURCE + "\nimport sys\n")
+        (self.repo_path / "app.py").unlink()
+        index = update_symbol_index(self.repo_path, self.index_path)
+        self.assertEqual(index.files["library.py"].imported_names, ["os", "sys"])
+        self.assertEqual(set(SymbolIndex.load(self.index_path).files), {"library.py"})
+
+    def test_project_context_describes_related_symbols(self):
+        index = update_symbol_index(self.repo_path)
+        project_context = build_project_context(index, "app.py", APP_DIFF, max_tokens=1000)
+        self.assertIn("library.py:4: def load_config(path: str) -> dict", project_context)
+        self.assertIn("parse (changed) is also defined in library.py:9: def parse(self, text)", project_context)
+        self.assertNotIn("app.py", project_context)
+
+        library_diff = "\n".join(
+            f"+{line}" if "abspath" in line else f" {line}" for line in LIBRARY_SOURCE.splitlines())
+        self.assertIn("load_config (changed) is called from app.py",
+                      build_project_context(index, "library.py", library_diff, max_tokens=1000))
+
+    def test_absolute_file_name_is_not_reported_as_other_file(self):
+        index = update_symbol_index(self.repo_path)
+        file_content = "\n".join(LIBRARY_SOURCE.splitlines())
+        project_context = build_project_context(
+            index, str((self.repo_path / "library.py").absolute()), file_content, max_tokens=1000, is_diff=False,
+            repo_path=self.repo_path)
+        self.assertIn("load_config (changed) is called from app.py", project_context)
+        self.assertNotIn("also defined in library.py", project_context)
+
+    def test_project_context_fits_into_budget(self):
+        index = update_symbol_index(self.repo_path)
+        max_tokens = estimate_tokens(build_project_context(index, "app.py", APP_DIFF, max_tokens=1000)) - 1
+        project_context = build_project_context(index, "app.py", APP_DIFF, max_tokens=max_tokens)
+        self.assertLessEqual(estimate_tokens(project_context), max_tokens)
+        self.assertIn("load_config", project_context)
+        self.assertEqual(build_project_context(index, "app.py", APP_DIFF, max_tokens=1), EMPTY_PROJECT_CONTEXT)
+
+
+class TestProjectContextPrompt(unittest.TestCase):
+    def test_project_context_is_added_to_prompt_and_cache_key(self):
+        reviewer = build_fake_container(project_context_tokens=500).reviewers()[0]
+        prompt = reviewer.render_prompt("+x = 1", 0, "library.py:4: def load_config(path)")
+        self.assertIn("library.py:4: def load_config(path)", prompt)
+        self.assertIn("0: +x = 1", prompt)
+        self.assertNotEqual(
+            reviewer._get_cache_key("0: +x = 1", project_context="library.py:4: def load_config(path)"),
+            reviewer._get_cache_key("0: +x = 1"))
+
+        disabled_reviewer = build_fake_container().reviewers()[0]
+        self.assertNotIn("library.py", disabled_reviewer.render_prompt("+x = 1", 0, "library.py:4: def load_config"))
+        self.assertNotEqual(reviewer.cache_namespace, disabled_reviewer.cache_namespace)
@@ -0,0 +1,113 @@
+import unittest
+from pathlib import Path
+
+from ai_code_reviewer.estimate import estimate_review_tasks
+from ai_code_reviewer.metrics import RunMetrics
+from ai_code_reviewer.run_review import build_review_tasks, get_reviews
+from ai_code_reviewer.triage import get_touched_node_types, has_line_in_range, is_diff_relevant
+from tests.test_fake_llm import build_fake_container
+
+CONSTANT_CHANGE_DIFF = "\n".join([
+    "-LIMIT = 1",
+    "+LIMIT = 2",
+    " ",
+    " ",
+    " class Limiter:",
+    "     def check(self, value):",
+    "         return value < LIMIT",
+])
+CLASS_CHANGE_DIFF = "\n".join([
+    " LIMIT = 1",
+    " ",
+    " ",
+    " class Limiter:",
+    "     def check(self, value):",
+    "-        return value < LIMIT",
+    "+        return value <= LIMIT",
+])
+
+
+class TestTriageHeuristics(unittest.TestCase):
+    def test_file_globs(self):
+        self.assertTrue(is_diff_relevant("src/app/models.py", CLASS_CHANGE_DIFF, file_globs=["*.py"]))
+        self.assertTrue(is_diff_relevant("/repo/tests/test_app.py", CLASS_CHANGE_DIFF, file_globs=["tests/*.py"]))
+        self.assertFalse(is_diff_relevant("src/app/models.py", CLASS_CHANGE_DIFF, file_globs=["tests/*.py"]))
+
+    def test_keywords_are_searched_in_changed_lines(self):
+        self.assertTrue(is_diff_relevant("limits.py", CONSTANT_CHANGE_DIFF, keywords=["limit"]))
+        self.assertFalse(is_diff_relevant("limits.py", CONSTANT_CHANGE_DIFF, keywords=["return"]))
+        self.assertTrue(is_diff_relevant("limits.py", "import os\nprint(os.sep)", keywords=["print"]))
+
+    def test_touched_node_types(self):
+        self.assertNotIn("ClassDef", get_touched_node_types(CONSTANT_CHANGE_DIFF))
+        self.assertIn("ClassDef", get_touched_node_types(CLASS_CHANGE_DIFF))
+        self.assertFalse(is_diff_relevant("limits.py", CONSTANT_CHANGE_DIFF, node_types=["ClassDef"]))
+        self.assertTrue(is_diff_relevant("limits.py", CLASS_CHANGE_DIFF, node_types=["ClassDef"]))
+        self.assertIn(
+            "ClassDef", get_touched_node_types(CLASS_CHANGE_DIFF + "\n\\ No newline at end of file"))
+
+    def test_line_range_lookup(self):
+        self.assertTrue(has_line_in_range([3, 10], 3, 3))
+        self.assertTrue(has_line_in_range([3, 10], 5, 10))
+        self.assertFalse(has_line_in_range([3, 10], 4, 9))
+        self.assertFalse(has_line_in_range([3, 10], 11, 20))
+        self.assertFalse(has_line_in_range([], 1, 1))
+
+    def test_file_content_is_not_read_as_diff(self):
+        content = "values = [\n-1,\n+2,\n]"
+        self.assertIn("Assign", get_touched_node_types(content, is_diff=False))
+        self.assertTrue(is_diff_relevant("values.py", content, keywords=["values"], is_diff=False))
+        self.assertFalse(is_diff_relevant("values.py", content, keywords=["values"]))
+
+    def test_node_types_keep_unparsable_and_not_python_files(self):
+        self.assertIsNone(get_touched_node_types("+def broken(:"))
+        self.assertTrue(is_diff_relevant("limits.py", "+def broken(:", node_types=["ClassDef"]))
+        self.assertTrue(is_diff_relevant("limits.js", CONSTANT_CHANGE_DIFF, node_types=["ClassDef"]))
+
+
+class TestTriageStage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        mock_diff_path = Path(__file__).parent / "data" / "mock_diff.txt"
+        with open(mock_diff_path) as f:
+            self.test_diff = f.read()
+
+    @staticmethod
+    def build_reviewers(container, skipped_principle_globs):
+        reviewers = container.reviewers()
+        skipped_reviewer = reviewers[1]
+        skipped_reviewer.programming_principle = skipped_reviewer.programming_principle.model_copy(
+            update={"file_globs": skipped_principle_globs})
+        return reviewers
+
+    async def test_skipped_reviews_are_empty_and_reported(self):
+        container = build_fake_container(fake_llm_comments_per_review=2)
+        reviewers = self.build_reviewers(container, ["*.md"])
+        metrics = RunMetrics()
+        reviews = await get_reviews(
+            {"file.py": self.test_diff}, reviewers, report_progress=False, metrics=metrics)
+        self.assertEqual(len(reviews), 2)
+        self.assertEqual(len(reviews[0].comments), 2)
+        self.assertEqual(len(reviews[1].comments), 0)
+        self.assertIs(reviews[1].author, reviewers[1])
+        self.assertEqual(len(metrics.calls), 1)
+        self.assertEqual(metrics.triage_skipped_calls, 1)
+        self.assertGreater(metrics.triage_saved_prompt_tokens, 0)
+        self.assertIn("Triage skipped 1 of 2 review calls", metrics.format_summary())
+
+    def test_skipped_principles_are_not_batched_or_estimated(self):
+        container = build_fake_container(max_principles_per_call=2)
+        reviewers = self.build_reviewers(container, ["*.md"])
+        review_tasks = build_review_tasks(
+            {"file.py": self.test_diff}, reviewers, reviewer_batcher=container.reviewer_batcher())
+        self.assertEqual([review_task.is_skipped for review_task in review_tasks], [False, True])
+        self.assertIs(review_tasks[0].reviewer, reviewers[0])
+        estimate = estimate_review_tasks(review_tasks, "gpt-4-0125-preview")
+        self.assertEqual(estimate.calls, 1)
+        self.assertEqual(estimate.skipped_calls, 1)
+
+    def test_triage_fields_do_not_change_cache_key(self):
+        container = build_fake_container()
+        reviewers = container.reviewers()
+        cache_key = reviewers[0]._get_cache_key("0: +x = 1")
+        reviewers = self.build_reviewers(container, ["*.py"])
+        self.assertEqual(reviewers[1]._get_cache_key("0: +x = 1"), cache_key)
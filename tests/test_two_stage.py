@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_community.callbacks import get_openai_callback
+from langchain_core.runnables import RunnableLambda
+
+from ai_code_reviewer.review import CandidateComment, CandidateComments, FileDiffComments
+from ai_code_reviewer.reviewers.two_stage import TwoStageReviewChain
+from ai_code_reviewer.scheduler import ReviewScheduler
+from ai_code_reviewer.utils import add_line_numbers
+from tests.test_fake_llm import build_fake_container
+from tests.test_output import build_comment
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class TestTwoStageReviewChain(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.verification_inputs: List[Dict[str, str]] = []
+        self.chain_input = {
+            "enumerated_diff": add_line_numbers("\n".join(f"+line {index}" for index in range(30))),
+            "principle_name": "principle"
+        }
+
+    def build_chain(self, candidates: List[CandidateComment]) -> TwoStageReviewChain:
+        def verify(verification_input: Dict[str, str]) -> FileDiffComments:
+            self.verification_inputs.append(verification_input)
+            line_number = int(verification_input["line_number"])
+            return FileDiffComments(comments=[build_comment(line_number), build_comment(line_number + 100)])
+
+        return TwoStageReviewChain(
+            candidate_review_chain=RunnableLambda(lambda _: CandidateComments(comments=candidates)),
+            verification_chain=RunnableLambda(verify),
+            window_lines=2
+        )
+
+    async def test_only_candidates_are_verified(self):
+        chain = self.build_chain([
+            CandidateComment(line_number=10, reason="first"),
+            CandidateComment(line_number=10, reason="duplicate"),
+            CandidateComment(line_number=0, reason="second"),
+            CandidateComment(line_number=500, reason="not in diff")
+        ])
+        review = await chain.ainvoke(self.chain_input)
+        self.assertEqual([comment.line_number for comment in review.comments], [10, 0])
+        self.assertEqual(len(self.verification_inputs), 2)
+        self.assertEqual(self.verification_inputs[0]["candidate_reason"], "first")
+        self.assertEqual(self.verification_inputs[0]["principle_name"], "principle")
+        self.assertEqual(
+            self.verification_inputs[0]["enumerated_diff"].splitlines(),
+            [f"{index}: +line {index}" for index in range(8, 13)]
+        )
+        self.assertEqual(len(self.verification_inputs[1]["enumerated_diff"].splitlines()), 3)
+        self.assertEqual(chain.invoke(self.chain_input), review)
+
+    async def test_verifications_are_scheduled_separately(self):
+        candidate_calls, in_flight, max_in_flight, retries = 0, 0, 0, []
+        failed_line_numbers = set()
+
+        def find_candidates(_: Dict[str, str]) -> CandidateComments:
+            nonlocal candidate_calls
+            candidate_calls += 1
+            return CandidateComments(comments=[
+                CandidateComment(line_number=10, reason="first"), CandidateComment(line_number=0, reason="second")])
+
+        async def verify(verification_input: Dict[str, str]) -> FileDiffComments:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if verification_input["line_number"] not in failed_line_numbers:
+                failed_line_numbers.add(verification_input["line_number"])
+                raise RateLimitError()
+            return FileDiffComments(comments=[build_comment(int(verification_input["line_number"]))])
+
+        chain = TwoStageReviewChain(
+            candidate_review_chain=RunnableLambda(find_candidates),
+            verification_chain=RunnableLambda(verify),
+            window_lines=2
+        )
+        scheduler = ReviewScheduler(max_concurrency=1, initial_backoff_seconds=0.0)
+        review = await scheduler.run(lambda: chain.ainvoke(self.chain_input), on_retry=retries.append)
+        self.assertEqual([comment.line_number for comment in review.comments], [10, 0])
+        self.assertEqual(candidate_calls, 1)
+        self.assertEqual(max_in_flight, 1)
+        self.assertEqual(len(retries), 2)
+
+    async def test_clean_diff_is_not_verified(self):
+        review = await self.build_chain([]).ainvoke(self.chain_input)
+        self.assertEqual(review.comments, [])
+        self.assertEqual(self.verification_inputs, [])
+
+
+class TestTwoStageFakeReview(unittest.IsolatedAsyncioTestCase):
+    async def test_review(self):
+        test_diff = (Path(__file__).parent / "data" / "mock_diff.txt").read_text()
+        container = build_fake_container(review_mode="two_stage", fake_llm_comments_per_review=2)
+        self.assertIsInstance(container.reviewers()[0].diff_review_chain, TwoStageReviewChain)
+        self.assertNotEqual(container.cache_namespace(), build_fake_container().cache_namespace())
+        with get_openai_callback() as callback:
+            review = await container.reviewers()[0].review_file_diff(test_diff)
+        self.assertEqual(callback.successful_requests, 3)
+        self.assertGreater(len(review.comments), 0)
+        self.assertTrue(all(comment.suggestion for comment in review.comments))